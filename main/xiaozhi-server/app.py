@@ -9,6 +9,18 @@ from core.utils.util import get_local_ip, validate_mcp_endpoint
 from core.http_server import SimpleHttpServer
 from core.websocket_server import WebSocketServer
 from core.utils.util import check_ffmpeg_installed
+from core.utils.turn_trace import trace_recorder
+from core.utils.tts_cache import tts_cache
+from core.utils.opus_encoder_utils import encoder_pool
+from core.utils.encoder_policy import encoder_policy
+from core.utils.silence import silence_settings
+from core.utils.audio_pacer import audio_pacer
+from core.utils.link_quality import link_quality
+from core.utils.upstream_pool import upstream_pool
+from core.utils.first_segment import first_segment_policy
+from core.utils.audio_assets import audio_assets
+from core.utils.wakeup_responses import wakeup_responses
+from core.utils.latency_masker import latency_masker
 
 TAG = __name__
 logger = setup_logging()
@@ -54,6 +66,32 @@ async def main():
         auth_key = str(uuid.uuid4().hex)
     config["server"]["auth_key"] = auth_key
 
+    # 初始化对话耗时追踪
+    trace_recorder.configure(config.get("turn_trace", {}))
+    # 初始化Opus编码器池
+    encoder_pool.configure(config.get("opus_encoder", {}))
+    # 启动按负载调整编码复杂度的策略
+    encoder_policy.configure(config.get("encoder_policy", {}))
+    encoder_policy.start()
+    # 初始化出站音频静音裁剪
+    silence_settings.configure(config.get("silence_trim", {}))
+    # 初始化音频发送节拍器
+    audio_pacer.configure(config.get("audio_pacer", {}))
+    # 初始化链路质量估计
+    link_quality.configure(config.get("link_quality", {}))
+    # 初始化流式TTS上游连接池
+    upstream_pool.configure(config.get("upstream_pool", {}))
+    # 初始化TTS音频缓存
+    tts_cache.configure(config.get("tts_cache", {}))
+    # 初始化首段切分策略
+    first_segment_policy.configure(config.get("first_segment", {}))
+    # 预加载音频素材（提示音、绑定码数字等）
+    audio_assets.configure(config.get("audio_assets", {}))
+    # 预加载各音色的唤醒词回复
+    wakeup_responses.configure(config)
+    # 初始化首token延迟掩蔽（语气词）
+    latency_masker.configure(config.get("latency_masker", {}))
+
     # 添加 stdin 监控任务
     stdin_task = asyncio.create_task(monitor_stdin())
 
@@ -77,6 +115,16 @@ async def main():
         get_local_ip(),
         port,
     )
+    logger.bind(tag=TAG).info(
+        "耗时追踪接口是\thttp://{}:{}/xiaozhi/trace/",
+        get_local_ip(),
+        port,
+    )
+    logger.bind(tag=TAG).info(
+        "运行指标接口是\thttp://{}:{}/xiaozhi/metrics/",
+        get_local_ip(),
+        port,
+    )
     mcp_endpoint = config.get("mcp_endpoint", None)
     if mcp_endpoint is not None and "你" not in mcp_endpoint:
         # 校验MCP接入点格式
@@ -1,11 +1,29 @@
+from typing import Tuple, Optional
 from aiohttp import web
 from config.logger import setup_logging
+from core.utils.auth import AuthToken
 
 
 class BaseHandler:
     def __init__(self, config: dict):
         self.config = config
         self.logger = setup_logging()
+        # 认证工具，需要认证的接口首次使用时创建
+        self.auth = None
+
+    def _create_error_response(self, message: str) -> dict:
+        """创建统一的错误响应格式"""
+        return {"success": False, "message": message}
+
+    def _verify_auth_token(self, request) -> Tuple[bool, Optional[str]]:
+        """验证Authorization: Bearer token，返回(是否有效, token对应的设备ID)"""
+        auth_header = request.headers.get("Authorization", "")
+        if not auth_header.startswith("Bearer "):
+            return False, None
+        if self.auth is None:
+            self.auth = AuthToken(self.config["server"]["auth_key"])
+        token = auth_header[7:]  # 移除"Bearer "前缀
+        return self.auth.verify_token(token)
 
     def _add_cors_headers(self, response):
         """添加CORS头信息"""
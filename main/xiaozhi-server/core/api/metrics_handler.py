@@ -0,0 +1,46 @@
+import json
+from aiohttp import web
+from core.api.base_handler import BaseHandler
+from core.utils.metrics import metrics
+
+TAG = __name__
+
+
+class MetricsHandler(BaseHandler):
+    """运行指标查询接口，默认返回JSON，format=prometheus时返回Prometheus文本格式"""
+
+    def __init__(self, config: dict):
+        super().__init__(config)
+
+    async def handle_get(self, request):
+        """处理指标查询 GET 请求，需要Authorization: Bearer token认证"""
+        try:
+            is_valid, _ = self._verify_auth_token(request)
+            if not is_valid:
+                response = web.Response(
+                    text=json.dumps(
+                        self._create_error_response("无效的认证token或token已过期")
+                    ),
+                    content_type="application/json",
+                    status=401,
+                )
+            elif request.query.get("format") == "prometheus":
+                response = web.Response(
+                    text=metrics.to_prometheus(), content_type="text/plain"
+                )
+            else:
+                response = web.Response(
+                    text=json.dumps(
+                        {"success": True, "metrics": metrics.snapshot()},
+                        ensure_ascii=False,
+                    ),
+                    content_type="application/json",
+                )
+        except Exception as e:
+            self.logger.bind(tag=TAG).error(f"指标查询请求异常: {e}")
+            response = web.Response(
+                text=json.dumps({"success": False, "message": "request error."}),
+                content_type="application/json",
+            )
+        self._add_cors_headers(response)
+        return response
@@ -0,0 +1,52 @@
+import json
+from aiohttp import web
+from core.api.base_handler import BaseHandler
+from core.utils.turn_trace import trace_recorder
+
+TAG = __name__
+
+
+class TraceHandler(BaseHandler):
+    """对话耗时追踪查询接口，返回最近若干轮的各阶段时间线"""
+
+    def __init__(self, config: dict):
+        super().__init__(config)
+
+    async def handle_get(self, request):
+        """
+        处理追踪查询 GET 请求，支持limit、session_id参数。
+        需要Authorization: Bearer token认证，只返回token对应设备的记录
+        """
+        try:
+            is_valid, token_device_id = self._verify_auth_token(request)
+            if not is_valid:
+                response = web.Response(
+                    text=json.dumps(
+                        self._create_error_response("无效的认证token或token已过期")
+                    ),
+                    content_type="application/json",
+                    status=401,
+                )
+                self._add_cors_headers(response)
+                return response
+            limit = int(request.query.get("limit", 50))
+            traces = trace_recorder.recent(
+                limit=limit,
+                session_id=request.query.get("session_id"),
+                device_id=token_device_id,
+            )
+            return_json = {
+                "success": True,
+                "count": len(traces),
+                "summary": trace_recorder.summary(traces),
+                "traces": traces,
+            }
+        except Exception as e:
+            self.logger.bind(tag=TAG).error(f"追踪查询请求异常: {e}")
+            return_json = {"success": False, "message": "request error."}
+        response = web.Response(
+            text=json.dumps(return_json, ensure_ascii=False),
+            content_type="application/json",
+        )
+        self._add_cors_headers(response)
+        return response
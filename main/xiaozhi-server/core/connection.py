@@ -38,7 +38,12 @@ from core.providers.tts.dto.dto import ContentType, TTSMessageDTO, SentenceType
 from config.logger import setup_logging, build_module_string, create_connection_logger
 from config.manage_api_client import DeviceNotFoundException, DeviceBindException
 from core.utils.prompt_manager import PromptManager
+from core.utils import turn_trace
+from core.utils.link_quality import link_quality
 from core.utils.voiceprint_provider import VoiceprintProvider
+from core.utils.wakeup_responses import wakeup_responses
+from core.utils.latency_masker import latency_masker
+from core.utils.llm_latency import ttft_tracker
 from core.utils import textUtils
 
 TAG = __name__
@@ -84,6 +89,8 @@ class ConnectionHandler:
 
         # 客户端状态相关
         self.client_abort = False
+        # 链路质量估计，决定音频预缓冲深度
+        self.link_estimator = link_quality.create()
         self.client_is_speaking = False
         self.client_listen_mode = "auto"
 
@@ -133,9 +140,17 @@ class ConnectionHandler:
         # tts相关变量
         self.sentence_id = None
 
+        # 当前这一轮对话的耗时追踪
+        self.turn_trace = None
+        # 首token较慢时播放语气词的状态，以及上一次播放的语气词（避免重复）
+        self.masker_turn = None
+        self.last_filler = None
+
         # iot相关变量
         self.iot_descriptors = {}
         self.func_handler = None
+        # 本轮对话经工具检索选中的函数描述，工具调用后的递归请求沿用
+        self.turn_functions = None
 
         self.cmd_exit = self.config["exit_commands"]
         self.max_cmd_length = 0
@@ -155,6 +170,8 @@ class ConnectionHandler:
 
         # {"mcp":true} 表示启用MCP功能
         self.features = None
+        # 协商的多帧打包帧数，0表示每帧单独发送
+        self.audio_packing = 0
 
         # 初始化提示词管理器
         self.prompt_manager = PromptManager(config, self.logger)
@@ -378,6 +395,9 @@ class ConnectionHandler:
             asyncio.run_coroutine_threadsafe(
                 self.tts.open_audio_channels(self), self.loop
             )
+            # 新音色提前生成唤醒词回复和语气词
+            wakeup_responses.ensure(self)
+            latency_masker.ensure(self)
 
             """加载记忆"""
             self._initialize_memory()
@@ -692,7 +712,12 @@ class ConnectionHandler:
         # Define intent functions
         functions = None
         if self.intent_type == "function_call" and hasattr(self, "func_handler"):
-            functions = self.func_handler.get_functions()
+            if tool_call and self.turn_functions is not None:
+                functions = self.turn_functions
+            else:
+                # 只注入与用户输入相关的工具，减少prompt token
+                functions = self.func_handler.get_functions_for_query(query)
+                self.turn_functions = functions
         response_message = []
 
         try:
@@ -704,6 +729,8 @@ class ConnectionHandler:
                 )
                 memory_str = future.result()
 
+            llm_start_time = time.time()
+            turn_trace.mark(self, "llm_request", depth=depth)
             if self.intent_type == "function_call" and functions is not None:
                 # 使用支持functions的streaming接口
                 llm_responses = self.llm.response_with_functions(
@@ -732,9 +759,23 @@ class ConnectionHandler:
         content_arguments = ""
         self.client_abort = False
         emotion_flag = True
+        first_token_logged = False
         for response in llm_responses:
             if self.client_abort:
                 break
+            if not first_token_logged:
+                first_token_logged = True
+                turn_trace.mark(self, "llm_first_token", depth=depth)
+                if depth == 0:
+                    # 按LLM统计首token耗时分布，用于调整语气词的触发阈值
+                    ttft_tracker.record(
+                        self.config["selected_module"].get("LLM"),
+                        time.time() - llm_start_time,
+                    )
+                self.logger.bind(tag=TAG).info(
+                    f"LLM首token耗时: {time.time() - llm_start_time:.3f}s，"
+                    f"注入工具数: {len(functions) if functions is not None else 0}"
+                )
             if self.intent_type == "function_call" and functions is not None:
                 content, tools_call = response
                 if "content" in response:
@@ -777,6 +818,7 @@ class ConnectionHandler:
                             content_detail=content,
                         )
                     )
+        turn_trace.mark(self, "llm_last_token", depth=depth)
         # 处理function call
         if tool_call_flag:
             bHasError = False
@@ -815,6 +857,7 @@ class ConnectionHandler:
                     "id": function_id,
                     "arguments": function_arguments,
                 }
+                self.func_handler.tool_retriever.mark_used(function_name)
 
                 # 使用统一工具处理器处理所有工具调用
                 result = asyncio.run_coroutine_threadsafe(
@@ -1,16 +1,30 @@
 import json
+import time
+from core.utils import turn_trace
+from core.utils.latency_masker import latency_masker
 
 TAG = __name__
 
 
 async def handleAbortMessage(conn):
     conn.logger.bind(tag=TAG).info("Abort message received")
+    started = time.monotonic()
     # 设置成打断状态，会自动打断llm、tts任务
     conn.client_abort = True
-    conn.clear_queues()
+    latency_masker.disarm(conn)
+    if conn.tts:
+        # 停止发送音频、清空队列并取消正在进行的合成
+        await conn.tts.abort(started)
+    else:
+        conn.clear_queues()
+    turn_trace.abort_turn(conn)
     # 打断客户端说话状态
     await conn.websocket.send(
         json.dumps({"type": "tts", "state": "stop", "session_id": conn.session_id})
     )
     conn.clearSpeakStatus()
+    if conn.close_after_chat and not conn.stop_event.is_set():
+        # 结束语被打断时结束标记已随队列清空，在这里按约定关闭连接
+        await conn.close()
+        return
     conn.logger.bind(tag=TAG).info("Abort message received-end")
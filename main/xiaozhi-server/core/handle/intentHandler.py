@@ -80,6 +80,33 @@ async def process_intent_result(conn, intent_result, original_text):
         # 尝试将结果解析为JSON
         intent_data = json.loads(intent_result)
 
+        # 检查是否有多个function_call（如"打开灯并且调高音量"），交给工具处理器并发执行
+        if "function_calls" in intent_data:
+            function_calls = []
+            for call in intent_data["function_calls"] or []:
+                if not isinstance(call, dict) or not call.get("name"):
+                    continue
+                if call["name"] == "continue_chat":
+                    continue
+                function_calls.append(
+                    {"name": call["name"], "arguments": call.get("arguments") or {}}
+                )
+            if not function_calls:
+                return False
+            conn.logger.bind(tag=TAG).debug(
+                f"检测到function_calls格式的意图结果: {[c['name'] for c in function_calls]}"
+            )
+            await send_stt_message(conn, original_text)
+            conn.client_abort = False
+            conn.executor.submit(
+                _process_function_call,
+                conn,
+                {"function_calls": function_calls},
+                None,
+                original_text,
+            )
+            return True
+
         # 检查是否有function_call
         if "function_call" in intent_data:
             # 直接从意图识别获取了function_call
@@ -108,54 +135,14 @@ async def process_intent_result(conn, intent_result, original_text):
             await send_stt_message(conn, original_text)
             conn.client_abort = False
 
-            # 使用executor执行函数调用和结果处理
-            def process_function_call():
-                conn.dialogue.put(Message(role="user", content=original_text))
-
-                # 使用统一工具处理器处理所有工具调用
-                try:
-                    result = asyncio.run_coroutine_threadsafe(
-                        conn.func_handler.handle_llm_function_call(
-                            conn, function_call_data
-                        ),
-                        conn.loop,
-                    ).result()
-                except Exception as e:
-                    conn.logger.bind(tag=TAG).error(f"工具调用失败: {e}")
-                    result = ActionResponse(
-                        action=Action.ERROR, result=str(e), response=str(e)
-                    )
-
-                if result:
-                    if result.action == Action.RESPONSE:  # 直接回复前端
-                        text = result.response
-                        if text is not None:
-                            speak_txt(conn, text)
-                    elif result.action == Action.REQLLM:  # 调用函数后再请求llm生成回复
-                        text = result.result
-                        conn.dialogue.put(Message(role="tool", content=text))
-                        llm_result = conn.intent.replyResult(text, original_text)
-                        if llm_result is None:
-                            llm_result = text
-                        speak_txt(conn, llm_result)
-                    elif (
-                        result.action == Action.NOTFOUND
-                        or result.action == Action.ERROR
-                    ):
-                        text = result.result
-                        if text is not None:
-                            speak_txt(conn, text)
-                    elif function_name != "play_music":
-                        # For backward compatibility with original code
-                        # 获取当前最新的文本索引
-                        text = result.response
-                        if text is None:
-                            text = result.result
-                        if text is not None:
-                            speak_txt(conn, text)
-
             # 将函数执行放在线程池中
-            conn.executor.submit(process_function_call)
+            conn.executor.submit(
+                _process_function_call,
+                conn,
+                function_call_data,
+                function_name,
+                original_text,
+            )
             return True
         return False
     except json.JSONDecodeError as e:
@@ -163,6 +150,46 @@ async def process_intent_result(conn, intent_result, original_text):
         return False
 
 
+def _process_function_call(conn, function_call_data, function_name, original_text):
+    """在线程池中执行函数调用并处理结果"""
+    conn.dialogue.put(Message(role="user", content=original_text))
+
+    # 使用统一工具处理器处理所有工具调用
+    try:
+        result = asyncio.run_coroutine_threadsafe(
+            conn.func_handler.handle_llm_function_call(conn, function_call_data),
+            conn.loop,
+        ).result()
+    except Exception as e:
+        conn.logger.bind(tag=TAG).error(f"工具调用失败: {e}")
+        result = ActionResponse(action=Action.ERROR, result=str(e), response=str(e))
+
+    if result:
+        if result.action == Action.RESPONSE:  # 直接回复前端
+            text = result.response
+            if text is not None:
+                speak_txt(conn, text)
+        elif result.action == Action.REQLLM:  # 调用函数后再请求llm生成回复
+            text = result.result
+            conn.dialogue.put(Message(role="tool", content=text))
+            llm_result = conn.intent.replyResult(text, original_text)
+            if llm_result is None:
+                llm_result = text
+            speak_txt(conn, llm_result)
+        elif result.action == Action.NOTFOUND or result.action == Action.ERROR:
+            text = result.result
+            if text is not None:
+                speak_txt(conn, text)
+        elif function_name != "play_music":
+            # For backward compatibility with original code
+            # 获取当前最新的文本索引
+            text = result.response
+            if text is None:
+                text = result.result
+            if text is not None:
+                speak_txt(conn, text)
+
+
 def speak_txt(conn, text):
     conn.tts.tts_text_queue.put(
         TTSMessageDTO(
@@ -6,7 +6,9 @@ import time
 import asyncio
 import json
 from core.handle.sendAudioHandle import SentenceType
-from core.utils.util import audio_to_data
+from core.utils.audio_assets import audio_assets
+from core.utils import turn_trace
+from core.utils.latency_masker import latency_masker
 
 TAG = __name__
 
@@ -78,8 +80,12 @@ async def startToChat(conn, text):
     if conn.client_is_speaking:
         await handleAbortMessage(conn)
 
+    turn_trace.ensure_turn(conn).mark("chat_start")
+
     # 首先进行意图分析，使用实际文本内容
+    turn_trace.mark(conn, "intent_start")
     intent_handled = await handle_user_intent(conn, actual_text)
+    turn_trace.mark(conn, "intent_done", handled=bool(intent_handled))
 
     if intent_handled:
         # 如果意图已被处理，不再进行聊天
@@ -87,6 +93,8 @@ async def startToChat(conn, text):
 
     # 意图未被处理，继续常规聊天流程，使用实际文本内容
     await send_stt_message(conn, actual_text)
+    # 首token较慢时先播放语气词
+    latency_masker.arm(conn)
     conn.executor.submit(conn.chat, actual_text)
 
 
@@ -104,6 +112,9 @@ async def no_voice_close_connect(conn, have_voice):
             not conn.close_after_chat
             and no_voice_time > 1000 * close_connection_no_voice_time
         ):
+            if conn.client_is_speaking:
+                # 先打断正在播报的内容，再标记说完结束语后关闭，避免打断时直接关闭连接
+                await handleAbortMessage(conn)
             conn.close_after_chat = True
             conn.client_abort = False
             end_prompt = conn.config.get("end_prompt", {})
@@ -120,9 +131,7 @@ async def no_voice_close_connect(conn, have_voice):
 async def max_out_size(conn):
     text = "不好意思，我现在有点事情要忙，明天这个时候我们再聊，约好了哦！明天不见不散，拜拜！"
     await send_stt_message(conn, text)
-    file_path = "config/assets/max_output_size.wav"
-    opus_packets, _ = audio_to_data(file_path)
-    conn.tts.tts_audio_queue.put((SentenceType.LAST, opus_packets, text))
+    audio_assets.enqueue(conn, "max_output_size", SentenceType.LAST, text)
     conn.close_after_chat = True
 
 
@@ -139,24 +148,13 @@ async def check_bind_device(conn):
         await send_stt_message(conn, text)
 
         # 播放提示音
-        music_path = "config/assets/bind_code.wav"
-        opus_packets, _ = audio_to_data(music_path)
-        conn.tts.tts_audio_queue.put((SentenceType.FIRST, opus_packets, text))
+        audio_assets.enqueue(conn, "bind_code", SentenceType.FIRST, text)
 
         # 逐个播放数字
-        for i in range(6):  # 确保只播放6位数字
-            try:
-                digit = conn.bind_code[i]
-                num_path = f"config/assets/bind_code/{digit}.wav"
-                num_packets, _ = audio_to_data(num_path)
-                conn.tts.tts_audio_queue.put((SentenceType.MIDDLE, num_packets, None))
-            except Exception as e:
-                conn.logger.bind(tag=TAG).error(f"播放数字音频失败: {e}")
-                continue
+        for digit in conn.bind_code[:6]:  # 确保只播放6位数字
+            audio_assets.enqueue(conn, f"bind_code/{digit}", SentenceType.MIDDLE)
         conn.tts.tts_audio_queue.put((SentenceType.LAST, [], None))
     else:
         text = f"没有找到该设备的版本信息，请正确配置 OTA地址，然后重新编译固件。"
         await send_stt_message(conn, text)
-        music_path = "config/assets/bind_not_found.wav"
-        opus_packets, _ = audio_to_data(music_path)
-        conn.tts.tts_audio_queue.put((SentenceType.LAST, opus_packets, text))
+        audio_assets.enqueue(conn, "bind_not_found", SentenceType.LAST, text)
@@ -1,8 +1,10 @@
 import json
-import asyncio
-import time
 from core.providers.tts.dto.dto import SentenceType
 from core.utils import textUtils
+from core.utils import turn_trace
+from core.utils.audio_assets import audio_assets
+from core.utils.audio_pacer import audio_pacer
+from core.utils.latency_masker import latency_masker
 
 TAG = __name__
 
@@ -11,6 +13,10 @@ async def sendAudioMessage(conn, sentenceType, audios, text):
     # 发送句子开始消息
     conn.logger.bind(tag=TAG).info(f"发送音频消息: {sentenceType}, {text}")
 
+    if audios or sentenceType == SentenceType.LAST:
+        # 正在播放的语气词淡出后再播放真正的音频
+        await latency_masker.handoff(conn)
+
     pre_buffer = False
     if conn.tts.tts_audio_first_sentence and text is not None:
         conn.logger.bind(tag=TAG).info(f"发送第一段语音: {text}")
@@ -20,14 +26,21 @@ async def sendAudioMessage(conn, sentenceType, audios, text):
     await send_tts_message(conn, "sentence_start", text)
 
     await sendAudio(conn, audios, pre_buffer)
-
-    await send_tts_message(conn, "sentence_end", text)
+    aborted = conn.client_abort
+    if not aborted:
+        await send_tts_message(conn, "sentence_end", text)
 
     # 发送结束消息（如果是最后一个文本）
     if conn.llm_finish_task and sentenceType == SentenceType.LAST:
-        await send_tts_message(conn, "stop", None)
+        if aborted:
+            # 被打断时停止消息已由打断处理发送，只结束追踪
+            turn_trace.finish_turn(conn, "abort")
+        else:
+            turn_trace.mark(conn, "tts_stop")
+            turn_trace.finish_turn(conn)
+            await send_tts_message(conn, "stop", None)
         conn.client_is_speaking = False
-        if conn.close_after_chat:
+        if conn.close_after_chat and not conn.stop_event.is_set():
             await conn.close()
 
 
@@ -35,38 +48,8 @@ async def sendAudioMessage(conn, sentenceType, audios, text):
 async def sendAudio(conn, audios, pre_buffer=True):
     if audios is None or len(audios) == 0:
         return
-    # 流控参数优化
-    frame_duration = 60  # 帧时长（毫秒），匹配 Opus 编码
-    start_time = time.perf_counter()
-    play_position = 0
-
-    # 仅当第一句话时执行预缓冲
-    if pre_buffer:
-        pre_buffer_frames = min(3, len(audios))
-        for i in range(pre_buffer_frames):
-            await conn.websocket.send(audios[i])
-        remaining_audios = audios[pre_buffer_frames:]
-    else:
-        remaining_audios = audios
-
-    # 播放剩余音频帧
-    for opus_packet in remaining_audios:
-        if conn.client_abort:
-            break
-
-        # 重置没有声音的状态
-        conn.last_activity_time = time.time() * 1000
-
-        # 计算预期发送时间
-        expected_time = start_time + (play_position / 1000)
-        current_time = time.perf_counter()
-        delay = expected_time - current_time
-        if delay > 0:
-            await asyncio.sleep(delay)
-
-        await conn.websocket.send(opus_packet)
-
-        play_position += frame_duration
+    # 由全局节拍器按60ms一帧的节奏发送，pre_buffer时先立即发送几帧
+    await audio_pacer.play(conn, audios, pre_buffer)
 
 
 async def send_tts_message(conn, state, text=None):
@@ -83,8 +66,7 @@ async def send_tts_message(conn, state, text=None):
             stop_tts_notify_voice = conn.config.get(
                 "stop_tts_notify_voice", "config/assets/tts_notify.mp3"
             )
-            audios, _ = conn.tts.audio_to_opus_data(stop_tts_notify_voice)
-            await sendAudio(conn, audios)
+            await sendAudio(conn, audio_assets.get(stop_tts_notify_voice))
         # 清除服务端讲话状态
         conn.clearSpeakStatus()
 
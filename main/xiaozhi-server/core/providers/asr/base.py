@@ -17,6 +17,7 @@ from core.handle.receiveAudioHandle import startToChat
 from core.handle.reportHandle import enqueue_asr_report
 from core.utils.util import remove_punctuation_and_length
 from core.handle.receiveAudioHandle import handleAudioMessage
+from core.utils import turn_trace
 
 TAG = __name__
 logger = setup_logging()
@@ -76,6 +77,8 @@ class ASRProviderBase(ABC):
         """并行处理ASR和声纹识别"""
         try:
             total_start_time = time.monotonic()
+            # 语音结束，开始新一轮耗时追踪
+            turn_trace.start_turn(conn).mark("voice_stop", frames=len(asr_audio_task))
             
             # 准备音频数据
             if conn.audio_format == "pcm":
@@ -163,6 +166,7 @@ class ASRProviderBase(ABC):
             # 性能监控
             total_time = time.monotonic() - total_start_time
             logger.bind(tag=TAG).info(f"总处理耗时: {total_time:.3f}s")
+            turn_trace.mark(conn, "asr_done", text_len=len(raw_text or ""))
             
             # 检查文本长度
             text_len, _ = remove_punctuation_and_length(raw_text)
@@ -175,6 +179,8 @@ class ASRProviderBase(ABC):
                 # 使用自定义模块进行上报
                 await startToChat(conn, enhanced_text)
                 enqueue_asr_report(conn, enhanced_text, asr_audio_task)
+            else:
+                turn_trace.finish_turn(conn, "empty_asr")
                 
         except Exception as e:
             logger.bind(tag=TAG).error(f"处理语音停止失败: {e}")
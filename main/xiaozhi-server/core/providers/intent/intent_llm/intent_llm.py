@@ -1,7 +1,12 @@
+import asyncio
 from typing import List, Dict
 from ..base import IntentProviderBase
-from plugins_func.functions.play_music import initialize_music_handler
+from plugins_func.functions.play_music import (
+    MUSIC_CACHE,
+    prepare_music_index,
+)
 from config.logger import setup_logging
+from core.utils.llm_scheduler import Priority, use_priority
 import re
 import json
 import hashlib
@@ -22,6 +27,7 @@ class IntentProvider(IntentProviderBase):
         self.cache_manager = cache_manager
         self.CacheType = CacheType
         self.history_count = 4  # 默认使用最近4条对话记录
+        self.music_candidates = int(config.get("music_candidates", 10))
 
     def get_intent_system_prompt(self, functions_list: str) -> str:
         """
@@ -104,11 +110,12 @@ class IntentProvider(IntentProviderBase):
         return prompt
 
     def replyResult(self, text: str, original_text: str):
-        llm_result = self.llm.response_no_stream(
-            system_prompt=text,
-            user_prompt="请根据以上内容，像人类一样说话的口吻回复用户，要求简洁，请直接返回结果。用户现在说："
-            + original_text,
-        )
+        with use_priority(Priority.INTENT):
+            llm_result = self.llm.response_no_stream(
+                system_prompt=text,
+                user_prompt="请根据以上内容，像人类一样说话的口吻回复用户，要求简洁，请直接返回结果。用户现在说："
+                + original_text,
+            )
         return llm_result
 
     async def detect_intent(self, conn, dialogue_history: List[Dict], text: str) -> str:
@@ -147,8 +154,9 @@ class IntentProvider(IntentProviderBase):
 
             self.promot = self.get_intent_system_prompt(functions)
 
-        music_config = initialize_music_handler(conn)
-        music_file_names = music_config["music_file_names"]
+        await prepare_music_index(conn)
+        # 只提供这句话可能提到的歌名，不把整个曲库放进提示词
+        music_file_names = MUSIC_CACHE["index"].suggest(text, self.music_candidates)
         prompt_music = f"{self.promot}\n<musicNames>{music_file_names}\n</musicNames>"
 
         home_assistant_cfg = conn.config["plugins"].get("home_assistant")
@@ -183,9 +191,13 @@ class IntentProvider(IntentProviderBase):
         llm_start_time = time.time()
         logger.bind(tag=TAG).debug(f"开始LLM意图识别调用, 模型: {model_info}")
 
-        intent = self.llm.response_no_stream(
-            system_prompt=prompt_music, user_prompt=user_prompt
-        )
+        # 配额调度可能排队等待，在线程中调用，不阻塞事件循环（to_thread会带上优先级上下文）
+        with use_priority(Priority.INTENT):
+            intent = await asyncio.to_thread(
+                self.llm.response_no_stream,
+                system_prompt=prompt_music,
+                user_prompt=user_prompt,
+            )
 
         # 记录LLM调用完成时间
         llm_time = time.time() - llm_start_time
@@ -1,9 +1,22 @@
+import contextvars
 from abc import ABC, abstractmethod
 from config.logger import setup_logging
 
 TAG = __name__
 logger = setup_logging()
 
+# 当前请求正在读取的上游流式响应，由对冲LLM等调用方设置，取消请求时关闭它们以中断阻塞的读取
+active_streams = contextvars.ContextVar("llm_active_streams", default=None)
+
+
+def track_stream(stream):
+    """登记流式响应（需有close方法），调用方未设置登记表时不做任何事"""
+    streams = active_streams.get()
+    if streams is not None:
+        streams.append(stream)
+    return stream
+
+
 class LLMProviderBase(ABC):
     @abstractmethod
     def response(self, session_id, dialogue):
@@ -1,7 +1,7 @@
 import json
 from config.logger import setup_logging
 import requests
-from core.providers.llm.base import LLMProviderBase
+from core.providers.llm.base import LLMProviderBase, track_stream
 from core.providers.llm.system_prompt import get_system_prompt_for_function
 from core.utils.util import check_model_key
 
@@ -53,6 +53,7 @@ class LLMProvider(LLMProviderBase):
                 json=request_json,
                 stream=True,
             ) as r:
+                track_stream(r)
                 if self.mode == "chat-messages":
                     for line in r.iter_lines():
                         if line.startswith(b"data: "):
@@ -1,7 +1,7 @@
 import json
 from config.logger import setup_logging
 import requests
-from core.providers.llm.base import LLMProviderBase
+from core.providers.llm.base import LLMProviderBase, track_stream
 from core.utils.util import check_model_key
 
 TAG = __name__
@@ -36,6 +36,7 @@ class LLMProvider(LLMProviderBase):
                 },
                 stream=True,
             ) as r:
+                track_stream(r)
                 for line in r.iter_lines():
                     if line:
                         try:
@@ -0,0 +1,247 @@
+import contextvars
+import queue
+import threading
+import time
+
+from config.logger import setup_logging
+from core.providers.llm.base import LLMProviderBase, active_streams
+from core.utils.llm_latency import ttft_tracker
+
+TAG = __name__
+logger = setup_logging()
+
+
+class _Attempt:
+    """一次对子provider的请求，在独立线程中消费其生成器"""
+
+    def __init__(self, index, name, generator, out_queue):
+        self.index = index
+        self.name = name
+        self.generator = generator
+        self.out_queue = out_queue
+        self.start_time = time.time()
+        self.cancelled = threading.Event()
+        self.finished = False
+        self.ttft_recorded = False
+        # 子provider登记的上游流式响应，取消时关闭以中断阻塞中的读取
+        self.streams = []
+        # 复制上下文，使调度优先级等上下文变量在子线程中仍然生效
+        context = contextvars.copy_context()
+        self.thread = threading.Thread(
+            target=context.run, args=(self._run,), daemon=True
+        )
+
+    def start(self):
+        self.thread.start()
+
+    def cancel(self):
+        if self.cancelled.is_set():
+            return
+        self.cancelled.set()
+        for stream in list(self.streams):
+            try:
+                stream.close()
+            except Exception:
+                pass
+
+    def record_ttft(self):
+        """记录首token耗时；被取消时还没有首token的，记录取消时已等待的时长（实际耗时的下限）"""
+        if self.ttft_recorded:
+            return
+        self.ttft_recorded = True
+        ttft_tracker.record(self.name, time.time() - self.start_time)
+
+    def _run(self):
+        active_streams.set(self.streams)
+        try:
+            for item in self.generator:
+                if self.cancelled.is_set():
+                    break
+                self.out_queue.put((self.index, "item", item))
+            else:
+                self.out_queue.put((self.index, "end", None))
+                return
+        except Exception as e:
+            self.out_queue.put((self.index, "error", e))
+            return
+        finally:
+            if self.cancelled.is_set():
+                try:
+                    # 关闭生成器，释放上游的流式连接
+                    self.generator.close()
+                except Exception:
+                    pass
+        self.out_queue.put((self.index, "end", None))
+
+
+class LLMProvider(LLMProviderBase):
+    """
+    对冲请求的路由LLM：按顺序包装多个已配置的LLM。
+    主provider在截止时间内没有返回首token时，向下一个provider发起对冲请求，
+    谁先返回首token就使用谁的输出，并取消另一路请求。
+    """
+
+    def __init__(self, config):
+        self.hedge_delay = float(config.get("hedge_delay", 1.5))
+        self.auto_delay = config.get("auto_delay", True)
+        self.percentile = float(config.get("percentile", 95))
+        self.min_delay = float(config.get("min_delay", 0.3))
+        self.max_delay = float(config.get("max_delay", 5))
+        self.providers = self._create_providers(config)
+        if not self.providers:
+            raise ValueError("hedge类型的LLM至少需要在llms中配置一个可用的LLM")
+        logger.bind(tag=TAG).info(
+            f"对冲LLM初始化完成，provider顺序: {[name for name, _ in self.providers]}"
+        )
+
+    def _create_providers(self, config):
+        from core.utils import llm as llm_utils
+
+        llm_configs = config.get("llm_configs")
+        if llm_configs is None:
+            from config.config_loader import load_config
+
+            llm_configs = load_config().get("LLM", {})
+
+        providers = []
+        for name in config.get("llms", []):
+            llm_config = llm_configs.get(name)
+            if not llm_config:
+                logger.bind(tag=TAG).error(f"对冲LLM找不到配置: {name}，已跳过")
+                continue
+            llm_type = llm_config.get("type", name)
+            if llm_type == "hedge":
+                logger.bind(tag=TAG).error(f"对冲LLM不能嵌套hedge类型: {name}，已跳过")
+                continue
+            try:
+                providers.append((name, llm_utils.create_instance(llm_type, llm_config)))
+            except Exception as e:
+                logger.bind(tag=TAG).error(f"对冲LLM初始化{name}失败: {e}")
+        return providers
+
+    def _get_delay(self, name):
+        """获取某个provider的对冲等待时间，优先使用TTFT分位数"""
+        if self.auto_delay:
+            value = ttft_tracker.percentile(name, self.percentile)
+            if value is not None:
+                return min(self.max_delay, max(self.min_delay, value))
+        return self.hedge_delay
+
+    @staticmethod
+    def _is_error_text(text):
+        # 各provider出错时会返回形如【xxx服务响应异常】的文本
+        return isinstance(text, str) and text.startswith("【") and "异常" in text
+
+    def _hedged_stream(self, make_generator, is_meaningful, is_error):
+        out_queue = queue.Queue()
+        attempts = []
+        winner = None
+        last_error_item = None
+
+        def start_next():
+            index = len(attempts)
+            name, provider = self.providers[index]
+            attempt = _Attempt(index, name, make_generator(provider), out_queue)
+            attempts.append(attempt)
+            attempt.start()
+            if index > 0:
+                logger.bind(tag=TAG).info(f"首token超时或失败，发起对冲请求: {name}")
+            return attempt
+
+        def has_next():
+            return len(attempts) < len(self.providers)
+
+        try:
+            start_next()
+            while True:
+                timeout = None
+                if winner is None and has_next():
+                    last = attempts[-1]
+                    deadline = last.start_time + self._get_delay(last.name)
+                    timeout = max(0, deadline - time.time())
+                try:
+                    index, kind, payload = out_queue.get(timeout=timeout)
+                except queue.Empty:
+                    start_next()
+                    continue
+
+                if winner is not None and index != winner:
+                    continue
+                attempt = attempts[index]
+
+                if kind == "item":
+                    if winner is None:
+                        if not is_meaningful(payload):
+                            continue
+                        if is_error(payload):
+                            # 出错文本不作为首token，视作该provider失败
+                            last_error_item = payload
+                            attempt.cancel()
+                            attempt.finished = True
+                        else:
+                            winner = index
+                            attempt.record_ttft()
+                            for other in attempts:
+                                if other.index != index:
+                                    # 落败的请求也计入耗时分布，避免分位数只反映较快的请求
+                                    if not other.finished:
+                                        other.record_ttft()
+                                    other.cancel()
+                            if index > 0:
+                                logger.bind(tag=TAG).info(
+                                    f"对冲请求胜出: {attempt.name}"
+                                )
+                            yield payload
+                            continue
+                    else:
+                        yield payload
+                        continue
+                else:
+                    if kind == "error":
+                        logger.bind(tag=TAG).error(
+                            f"对冲LLM子provider {attempt.name} 异常: {payload}"
+                        )
+                    if winner is not None:
+                        return
+                    attempt.finished = True
+
+                # 当前所有请求都已失败，立即尝试下一个provider
+                if winner is None and all(a.finished for a in attempts):
+                    if has_next():
+                        start_next()
+                    else:
+                        logger.bind(tag=TAG).error("对冲LLM所有provider均未返回有效内容")
+                        if last_error_item is not None:
+                            yield last_error_item
+                        return
+        finally:
+            for attempt in attempts:
+                attempt.cancel()
+
+    def response(self, session_id, dialogue, **kwargs):
+        def make_generator(provider):
+            if kwargs:
+                return provider.response(session_id, dialogue, **kwargs)
+            return provider.response(session_id, dialogue)
+
+        yield from self._hedged_stream(
+            make_generator,
+            is_meaningful=lambda item: bool(item),
+            is_error=self._is_error_text,
+        )
+
+    def response_with_functions(self, session_id, dialogue, functions=None):
+        def make_generator(provider):
+            return provider.response_with_functions(
+                session_id, dialogue, functions=functions
+            )
+
+        def is_meaningful(item):
+            content, tool_calls = item
+            return bool(content) or bool(tool_calls)
+
+        def is_error(item):
+            content, tool_calls = item
+            return not tool_calls and self._is_error_text(content)
+
+        yield from self._hedged_stream(make_generator, is_meaningful, is_error)
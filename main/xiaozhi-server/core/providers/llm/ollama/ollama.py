@@ -1,7 +1,7 @@
 from config.logger import setup_logging
 from openai import OpenAI
 import json
-from core.providers.llm.base import LLMProviderBase
+from core.providers.llm.base import LLMProviderBase, track_stream
 
 TAG = __name__
 logger = setup_logging()
@@ -44,8 +44,10 @@ class LLMProvider(LLMProviderBase):
                 # 使用修改后的对话
                 dialogue = dialogue_copy
 
-            responses = self.client.chat.completions.create(
-                model=self.model_name, messages=dialogue, stream=True
+            responses = track_stream(
+                self.client.chat.completions.create(
+                    model=self.model_name, messages=dialogue, stream=True
+                )
             )
             is_active = True
             # 用于处理跨chunk的标签
@@ -113,11 +115,13 @@ class LLMProvider(LLMProviderBase):
                 # 使用修改后的对话
                 dialogue = dialogue_copy
 
-            stream = self.client.chat.completions.create(
-                model=self.model_name,
-                messages=dialogue,
-                stream=True,
-                tools=functions,
+            stream = track_stream(
+                self.client.chat.completions.create(
+                    model=self.model_name,
+                    messages=dialogue,
+                    stream=True,
+                    tools=functions,
+                )
             )
 
             is_active = True
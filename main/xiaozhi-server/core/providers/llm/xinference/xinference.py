@@ -1,7 +1,7 @@
 from config.logger import setup_logging
 from openai import OpenAI
 import json
-from core.providers.llm.base import LLMProviderBase
+from core.providers.llm.base import LLMProviderBase, track_stream
 
 TAG = __name__
 logger = setup_logging()
@@ -35,8 +35,10 @@ class LLMProvider(LLMProviderBase):
             logger.bind(tag=TAG).debug(
                 f"Sending request to Xinference with model: {self.model_name}, dialogue length: {len(dialogue)}"
             )
-            responses = self.client.chat.completions.create(
-                model=self.model_name, messages=dialogue, stream=True
+            responses = track_stream(
+                self.client.chat.completions.create(
+                    model=self.model_name, messages=dialogue, stream=True
+                )
             )
             is_active = True
             for chunk in responses:
@@ -73,11 +75,13 @@ class LLMProvider(LLMProviderBase):
                     f"Function calls enabled with: {[f.get('function', {}).get('name') for f in functions]}"
                 )
 
-            stream = self.client.chat.completions.create(
-                model=self.model_name,
-                messages=dialogue,
-                stream=True,
-                tools=functions,
+            stream = track_stream(
+                self.client.chat.completions.create(
+                    model=self.model_name,
+                    messages=dialogue,
+                    stream=True,
+                    tools=functions,
+                )
             )
 
             for chunk in stream:
@@ -6,6 +6,7 @@ import yaml
 from config.config_loader import get_project_dir
 from config.manage_api_client import save_mem_local_short
 from core.utils.util import check_model_key
+from core.utils.llm_scheduler import Priority, use_priority
 
 
 short_term_memory_prompt = """
@@ -173,12 +174,14 @@ class MemoryProvider(MemoryProviderBase):
         msgStr += f"当前时间：{time_str}"
 
         if self.save_to_file:
-            result = self.llm.response_no_stream(
-                short_term_memory_prompt,
-                msgStr,
-                max_tokens=2000,
-                temperature=0.2,
-            )
+            # 记忆总结属于后台任务，配额紧张时让位于用户对话
+            with use_priority(Priority.BACKGROUND):
+                result = self.llm.response_no_stream(
+                    short_term_memory_prompt,
+                    msgStr,
+                    max_tokens=2000,
+                    temperature=0.2,
+                )
             json_str = extract_json_data(result)
             try:
                 json.loads(json_str)  # 检查json格式是否正确
@@ -187,12 +190,14 @@ class MemoryProvider(MemoryProviderBase):
             except Exception as e:
                 print("Error:", e)
         else:
-            result = self.llm.response_no_stream(
-                short_term_memory_prompt_only_content,
-                msgStr,
-                max_tokens=2000,
-                temperature=0.2,
-            )
+            # 记忆总结属于后台任务，配额紧张时让位于用户对话
+            with use_priority(Priority.BACKGROUND):
+                result = self.llm.response_no_stream(
+                    short_term_memory_prompt_only_content,
+                    msgStr,
+                    max_tokens=2000,
+                    temperature=0.2,
+                )
             save_mem_local_short(self.role_id, result)
         logger.bind(tag=TAG).info(f"Save memory successful - Role: {self.role_id}")
 
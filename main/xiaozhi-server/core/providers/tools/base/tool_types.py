@@ -25,3 +25,4 @@ class ToolDefinition:
     description: Dict[str, Any]  # 工具描述（OpenAI函数调用格式）
     tool_type: ToolType  # 工具类型
     parameters: Optional[Dict[str, Any]] = None  # 额外参数
+    serial: bool = False  # 是否有副作用需要串行执行（多函数调用时不与其他工具并发）
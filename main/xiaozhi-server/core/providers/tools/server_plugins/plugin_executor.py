@@ -1,5 +1,6 @@
 """服务端插件工具执行器"""
 
+import asyncio
 from typing import Dict, Any
 from ..base import ToolType, ToolDefinition, ToolExecutor
 from plugins_func.register import all_function_registry, Action, ActionResponse
@@ -27,16 +28,20 @@ class ServerPluginExecutor(ToolExecutor):
             if hasattr(func_item, "type"):
                 func_type = func_item.type
                 if func_type.code in [4, 5]:  # SYSTEM_CTL, IOT_CTL (需要conn参数)
-                    result = func_item.func(conn, **arguments)
+                    args = (conn,)
                 elif func_type.code == 2:  # WAIT
-                    result = func_item.func(**arguments)
+                    args = ()
                 elif func_type.code == 3:  # CHANGE_SYS_PROMPT
-                    result = func_item.func(conn, **arguments)
+                    args = (conn,)
                 else:
-                    result = func_item.func(**arguments)
+                    args = ()
             else:
                 # 默认不传conn参数
-                result = func_item.func(**arguments)
+                args = ()
+
+            # 插件函数是同步的（多为网络请求），放到线程中执行，避免阻塞事件循环，
+            # 也使多函数调用时各插件可以并发执行
+            result = await asyncio.to_thread(func_item.func, *args, **arguments)
 
             return result
 
@@ -75,6 +80,9 @@ class ServerPluginExecutor(ToolExecutor):
                     name=func_name,
                     description=func_item.description,
                     tool_type=ToolType.SERVER_PLUGIN,
+                    # CHANGE_SYS_PROMPT会修改系统提示词，需要串行执行
+                    serial=getattr(func_item, "type", None) is not None
+                    and func_item.type.code == 3,
                 )
 
         return tools
@@ -0,0 +1,366 @@
+"""工具检索：按用户输入筛选相关工具，减少注入LLM的函数描述"""
+
+import hashlib
+import json
+import math
+import re
+import threading
+from collections import Counter, OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, List, Optional
+
+from config.logger import setup_logging
+from core.utils.metrics import metrics
+
+TAG = __name__
+
+_CAMEL_RE = re.compile(r"([a-z0-9])([A-Z])")
+_WORD_RE = re.compile(r"[a-z0-9]+")
+_CJK_RE = re.compile(r"[一-鿿]+")
+
+
+def tokenize(text: str) -> List[str]:
+    """分词：英文按单词，中文按单字和相邻二字组合"""
+    if not text:
+        return []
+    text = _CAMEL_RE.sub(r"\1 \2", text).lower()
+    tokens = _WORD_RE.findall(text)
+    for segment in _CJK_RE.findall(text):
+        tokens.extend(segment)
+        tokens.extend(segment[i : i + 2] for i in range(len(segment) - 1))
+    return tokens
+
+
+def _tool_text(name: str, description: Dict[str, Any]) -> List[str]:
+    """提取工具的检索文本，名称权重加倍"""
+    function = description.get("function", description) if description else {}
+    parts = [function.get("description", "")]
+    properties = (function.get("parameters") or {}).get("properties") or {}
+    for prop_name, prop in properties.items():
+        parts.append(prop_name)
+        if isinstance(prop, dict):
+            parts.append(prop.get("description", ""))
+    name_tokens = tokenize(name.replace("_", " ").replace("-", " "))
+    return name_tokens * 2 + tokenize(" ".join(p for p in parts if isinstance(p, str)))
+
+
+class _BM25Index:
+    """简单的BM25倒排索引"""
+
+    def __init__(self, documents: List[List[str]], k1: float = 1.5, b: float = 0.75):
+        self.k1 = k1
+        self.b = b
+        self.doc_freqs = [Counter(doc) for doc in documents]
+        self.doc_lens = [len(doc) for doc in documents]
+        self.avg_len = sum(self.doc_lens) / len(documents) if documents else 0
+        df = Counter()
+        for freqs in self.doc_freqs:
+            df.update(freqs.keys())
+        total = len(documents)
+        self.idf = {
+            term: math.log(1 + (total - n + 0.5) / (n + 0.5)) for term, n in df.items()
+        }
+
+    def scores(self, query_tokens: List[str]) -> List[float]:
+        result = []
+        terms = set(query_tokens)
+        for freqs, length in zip(self.doc_freqs, self.doc_lens):
+            score = 0.0
+            norm = self.k1 * (1 - self.b + self.b * length / (self.avg_len or 1))
+            for term in terms:
+                tf = freqs.get(term)
+                if tf:
+                    score += self.idf[term] * tf * (self.k1 + 1) / (tf + norm)
+            result.append(score)
+        return result
+
+
+class _RetrievalStats:
+    """所有连接的工具检索统计"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.stats = {
+            "turns": 0,
+            "fallbacks": 0,
+            "total_chars": 0,
+            "saved_chars": 0,
+            "embedding_calls": 0,
+            "embedding_cache_hits": 0,
+            "tool_embedding_texts": 0,
+        }
+
+    def add(self, **values):
+        with self._lock:
+            for name, value in values.items():
+                self.stats[name] += value
+
+    def snapshot(self):
+        with self._lock:
+            result = dict(self.stats)
+        total = result["total_chars"]
+        result["saved_ratio"] = round(result["saved_chars"] / total, 3) if total else None
+        return result
+
+
+retrieval_stats = _RetrievalStats()
+metrics.register_collector("tool_retrieval", retrieval_stats.snapshot)
+
+
+class _ToolEmbeddingCache:
+    """
+    所有连接共享的工具向量缓存，按向量模型和“名称: 描述”文本的哈希保存。
+    缺少的文本在后台线程计算，计算完成前检索只用关键词，不阻塞对话
+    """
+
+    def __init__(self, max_size=4096):
+        self.max_size = max_size
+        self._vectors: "OrderedDict[str, List[float]]" = OrderedDict()
+        self._pending = set()
+        self._lock = threading.Lock()
+        self._executor = ThreadPoolExecutor(
+            max_workers=1, thread_name_prefix="tool-embedding"
+        )
+
+    @staticmethod
+    def _key(model_key: str, text: str) -> str:
+        return model_key + ":" + hashlib.sha1(text.encode("utf-8")).hexdigest()
+
+    def get(self, model_key: str, texts: List[str], embed) -> Optional[List[List[float]]]:
+        """全部文本都已缓存时返回向量列表，否则在后台计算缺少的文本并返回None"""
+        keys = [self._key(model_key, text) for text in texts]
+        with self._lock:
+            vectors = [self._vectors.get(key) for key in keys]
+            missing = {
+                key: text
+                for key, text, vector in zip(keys, texts, vectors)
+                if vector is None and key not in self._pending
+            }
+            for key in keys:
+                if key in self._vectors:
+                    self._vectors.move_to_end(key)
+            self._pending.update(missing)
+        if missing:
+            self._executor.submit(self._compute, missing, embed)
+        if any(vector is None for vector in vectors):
+            return None
+        return vectors
+
+    def _compute(self, missing: Dict[str, str], embed):
+        try:
+            vectors = embed(list(missing.values()))
+            if not vectors:
+                return
+            retrieval_stats.add(tool_embedding_texts=len(vectors))
+            with self._lock:
+                for key, vector in zip(missing, vectors):
+                    self._vectors[key] = vector
+                while len(self._vectors) > self.max_size:
+                    self._vectors.popitem(last=False)
+        finally:
+            with self._lock:
+                self._pending.difference_update(missing)
+
+
+tool_embeddings = _ToolEmbeddingCache()
+
+
+class ToolRetriever:
+    """工具检索器，在ToolManager刷新工具后自动重建索引"""
+
+    def __init__(self, tool_manager, config: Optional[Dict[str, Any]] = None):
+        config = config or {}
+        self.tool_manager = tool_manager
+        self.logger = setup_logging()
+        self.enabled = config.get("enabled", False)
+        self.top_k = int(config.get("top_k", 5))
+        self.min_tools = int(config.get("min_tools", 12))
+        self.pinned = list(config.get("pinned", []) or [])
+        self.embedding_config = config.get("embedding") or {}
+        self.embedding_weight = float(self.embedding_config.get("weight", 0.5))
+        # 用户输入的向量在对话LLM请求之前同步计算，超时很短，超时后本轮只用关键词检索
+        self.query_timeout = float(self.embedding_config.get("query_timeout", 0.3))
+        self.cache_size = int(self.embedding_config.get("cache_size", 256))
+        self._query_cache: "OrderedDict[str, List[float]]" = OrderedDict()
+
+        self._version = None
+        self._names: List[str] = []
+        self._descriptions: List[Dict[str, Any]] = []
+        self._index: Optional[_BM25Index] = None
+        self._embedding_texts: List[str] = []
+        self._embeddings: Optional[List[List[float]]] = None
+        self._embedding_client = None
+        self._recent_tools: List[str] = []
+
+    def _ensure_index(self):
+        version = self.tool_manager.version
+        if self._version == version and self._index is not None:
+            return
+        tools = self.tool_manager.get_all_tools()
+        self._names = list(tools.keys())
+        self._descriptions = [tools[name].description for name in self._names]
+        self._index = _BM25Index(
+            [
+                _tool_text(name, description)
+                for name, description in zip(self._names, self._descriptions)
+            ]
+        )
+        self._embedding_texts = self._tool_texts()
+        self._embeddings = None
+        self._version = version
+        self.logger.bind(tag=TAG).debug(f"工具检索索引已重建，共{len(self._names)}个工具")
+
+    def _get_embedding_client(self):
+        if self._embedding_client is None and self.embedding_config.get("model_name"):
+            import openai
+
+            self._embedding_client = openai.OpenAI(
+                api_key=self.embedding_config.get("api_key"),
+                base_url=self.embedding_config.get("base_url"),
+                timeout=float(self.embedding_config.get("timeout", 3)),
+            )
+        return self._embedding_client
+
+    def _embed(
+        self, texts: List[str], timeout: Optional[float] = None
+    ) -> Optional[List[List[float]]]:
+        client = self._get_embedding_client()
+        if client is None or not texts:
+            return None
+        if timeout is not None:
+            client = client.with_options(timeout=timeout, max_retries=0)
+        try:
+            result = client.embeddings.create(
+                model=self.embedding_config["model_name"], input=texts
+            )
+            return [item.embedding for item in result.data]
+        except Exception as e:
+            self.logger.bind(tag=TAG).warning(f"工具检索向量计算失败，仅使用关键词检索: {e}")
+            return None
+
+    def _tool_texts(self) -> List[str]:
+        if not self.embedding_config.get("model_name"):
+            return []
+        texts = []
+        for name, description in zip(self._names, self._descriptions):
+            function = description.get("function", description) if description else {}
+            texts.append(f"{name}: {function.get('description', '')}")
+        return texts
+
+    def _tool_embeddings(self) -> Optional[List[List[float]]]:
+        """工具向量，从全局缓存获取，尚未计算完成时返回None"""
+        if self._embeddings is None and self._embedding_texts:
+            model_key = "{}@{}".format(
+                self.embedding_config.get("model_name"),
+                self.embedding_config.get("base_url", ""),
+            )
+            self._embeddings = tool_embeddings.get(
+                model_key, self._embedding_texts, self._embed
+            )
+        return self._embeddings
+
+    def _embed_query(self, text: str) -> Optional[List[float]]:
+        """计算用户输入的向量，相同输入直接使用缓存"""
+        cached = self._query_cache.get(text)
+        if cached is not None:
+            self._query_cache.move_to_end(text)
+            retrieval_stats.add(embedding_cache_hits=1)
+            return cached
+        retrieval_stats.add(embedding_calls=1)
+        result = self._embed([text], timeout=self.query_timeout)
+        if not result:
+            return None
+        self._query_cache[text] = result[0]
+        while len(self._query_cache) > self.cache_size:
+            self._query_cache.popitem(last=False)
+        return result[0]
+
+    @staticmethod
+    def _cosine(a: List[float], b: List[float]) -> float:
+        dot = sum(x * y for x, y in zip(a, b))
+        norm = math.sqrt(sum(x * x for x in a)) * math.sqrt(sum(y * y for y in b))
+        return dot / norm if norm else 0.0
+
+    @staticmethod
+    def _query_text(query: str) -> str:
+        # 带说话人信息时，query是JSON格式
+        if query and query.strip().startswith("{"):
+            try:
+                data = json.loads(query)
+                if isinstance(data, dict) and "content" in data:
+                    return str(data["content"])
+            except (json.JSONDecodeError, TypeError):
+                pass
+        return query or ""
+
+    def mark_used(self, tool_name: Optional[str]):
+        """记录本轮调用过的工具，下一轮继续保留，便于追问（如“再大一点”）"""
+        if not tool_name:
+            return
+        if tool_name in self._recent_tools:
+            self._recent_tools.remove(tool_name)
+        self._recent_tools.append(tool_name)
+        del self._recent_tools[:-2]
+
+    def select(self, query: str) -> List[Dict[str, Any]]:
+        """返回与当前输入相关的工具描述（固定工具 + top_k）"""
+        all_descriptions = self.tool_manager.get_function_descriptions()
+        if not self.enabled or len(all_descriptions) <= self.min_tools:
+            return all_descriptions
+
+        self._ensure_index()
+        text = self._query_text(query)
+        scores = self._index.scores(tokenize(text))
+        max_score = max(scores) if scores else 0
+        if max_score > 0:
+            scores = [score / max_score for score in scores]
+
+        embeddings = self._tool_embeddings()
+        if embeddings:
+            query_embedding = self._embed_query(text)
+            if query_embedding:
+                w = self.embedding_weight
+                scores = [
+                    (1 - w) * score + w * self._cosine(query_embedding, embedding)
+                    for score, embedding in zip(scores, embeddings)
+                ]
+
+        if max(scores, default=0) <= 0:
+            # 没有任何工具与输入相关（如换了说法），无法判断，注入全部工具
+            retrieval_stats.add(turns=1, fallbacks=1)
+            self.logger.bind(tag=TAG).info("工具检索无匹配，注入全部工具")
+            return all_descriptions
+
+        selected = []
+        for name in self.pinned + self._recent_tools:
+            if name in self._names and name not in selected:
+                selected.append(name)
+        ranked = sorted(range(len(self._names)), key=lambda i: scores[i], reverse=True)
+        count = 0
+        # 按得分依次补足top_k个，得分为0的工具也用来补足
+        for i in ranked:
+            if count >= self.top_k:
+                break
+            if self._names[i] not in selected:
+                selected.append(self._names[i])
+                count += 1
+
+        selected_set = set(selected)
+        result = [
+            description
+            for name, description in zip(self._names, self._descriptions)
+            if name in selected_set
+        ]
+        self._report(all_descriptions, result, selected)
+        return result
+
+    def _report(self, all_descriptions, selected_descriptions, selected_names):
+        total_chars = len(json.dumps(all_descriptions, ensure_ascii=False))
+        selected_chars = len(json.dumps(selected_descriptions, ensure_ascii=False))
+        retrieval_stats.add(
+            turns=1, total_chars=total_chars, saved_chars=total_chars - selected_chars
+        )
+        self.logger.bind(tag=TAG).info(
+            f"工具检索: {len(selected_descriptions)}/{len(all_descriptions)}个工具 {selected_names}，"
+            f"函数描述 {total_chars} -> {selected_chars} 字符"
+        )
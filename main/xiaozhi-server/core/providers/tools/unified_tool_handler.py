@@ -1,6 +1,7 @@
 """统一工具处理器"""
 
 import json
+import asyncio
 from typing import Dict, List, Any, Optional
 from config.logger import setup_logging
 from plugins_func.loadplugins import auto_import_modules
@@ -8,6 +9,7 @@ from plugins_func.loadplugins import auto_import_modules
 from .base import ToolType
 from plugins_func.register import Action, ActionResponse
 from .unified_tool_manager import ToolManager
+from .tool_retriever import ToolRetriever
 from .server_plugins import ServerPluginExecutor
 from .server_mcp import ServerMCPExecutor
 from .device_iot import DeviceIoTExecutor
@@ -25,6 +27,10 @@ class UnifiedToolHandler:
 
         # 创建工具管理器
         self.tool_manager = ToolManager(conn)
+        # 工具检索，按用户输入只注入相关的工具
+        self.tool_retriever = ToolRetriever(
+            self.tool_manager, self.config.get("tool_retrieval")
+        )
 
         # 创建各类执行器
         self.server_plugin_executor = ServerPluginExecutor(conn)
@@ -50,6 +56,16 @@ class UnifiedToolHandler:
             ToolType.MCP_ENDPOINT, self.mcp_endpoint_executor
         )
 
+        # 多函数调用的并发控制配置
+        tool_call_config = self.config.get("tool_call", {}) or {}
+        self.tool_timeout = float(tool_call_config.get("timeout", 30))
+        self.tool_timeouts = tool_call_config.get("timeouts", {}) or {}
+        self.max_concurrency_per_tool = int(
+            tool_call_config.get("max_concurrency_per_tool", 2)
+        )
+        self.serial_tools = set(tool_call_config.get("serial_tools", []) or [])
+        self._tool_semaphores: Dict[str, asyncio.Semaphore] = {}
+
         # 初始化标志
         self.finish_init = False
 
@@ -120,6 +136,14 @@ class UnifiedToolHandler:
         """获取所有工具的函数描述"""
         return self.tool_manager.get_function_descriptions()
 
+    def get_functions_for_query(self, query: str) -> List[Dict[str, Any]]:
+        """获取与用户输入相关的工具函数描述"""
+        try:
+            return self.tool_retriever.select(query)
+        except Exception as e:
+            self.logger.error(f"工具检索失败，使用全部工具: {e}")
+            return self.get_functions()
+
     def current_support_functions(self) -> List[str]:
         """获取当前支持的函数名称列表"""
         func_names = self.tool_manager.get_supported_tool_names()
@@ -142,12 +166,9 @@ class UnifiedToolHandler:
         try:
             # 处理多函数调用
             if "function_calls" in function_call_data:
-                responses = []
-                for call in function_call_data["function_calls"]:
-                    result = await self.tool_manager.execute_tool(
-                        call["name"], call.get("arguments", {})
-                    )
-                    responses.append(result)
+                responses = await self._execute_function_calls(
+                    function_call_data["function_calls"]
+                )
                 return self._combine_responses(responses)
 
             # 处理单函数调用
@@ -168,13 +189,84 @@ class UnifiedToolHandler:
             self.logger.debug(f"调用函数: {function_name}, 参数: {arguments}")
 
             # 执行工具调用
-            result = await self.tool_manager.execute_tool(function_name, arguments)
+            result = await self._execute_with_limit(function_name, arguments)
             return result
 
         except Exception as e:
             self.logger.error(f"处理function call错误: {e}")
             return ActionResponse(action=Action.ERROR, response=str(e))
 
+    def _get_semaphore(self, tool_name: str) -> asyncio.Semaphore:
+        """获取单个工具的并发限制信号量"""
+        semaphore = self._tool_semaphores.get(tool_name)
+        if semaphore is None:
+            semaphore = asyncio.Semaphore(self.max_concurrency_per_tool)
+            self._tool_semaphores[tool_name] = semaphore
+        return semaphore
+
+    def _is_serial_tool(self, tool_name: str) -> bool:
+        """判断工具是否需要串行执行"""
+        if tool_name in self.serial_tools:
+            return True
+        tool_def = self.tool_manager.get_all_tools().get(tool_name)
+        return bool(tool_def and tool_def.serial)
+
+    async def _execute_with_limit(
+        self, tool_name: str, arguments: Dict[str, Any]
+    ) -> ActionResponse:
+        """在并发限制和超时控制下执行单个工具"""
+        timeout = float(self.tool_timeouts.get(tool_name, self.tool_timeout))
+        async with self._get_semaphore(tool_name):
+            try:
+                return await asyncio.wait_for(
+                    self.tool_manager.execute_tool(tool_name, arguments), timeout
+                )
+            except asyncio.TimeoutError:
+                self.logger.error(f"工具 {tool_name} 执行超时({timeout}秒)")
+                message = f"工具 {tool_name} 执行超时"
+                return ActionResponse(
+                    action=Action.ERROR, result=message, response=message
+                )
+
+    async def _execute_function_calls(
+        self, function_calls: List[Dict[str, Any]]
+    ) -> List[ActionResponse]:
+        """并发执行多个函数调用，结果按调用顺序返回；有副作用的工具按顺序串行执行"""
+        results: List[Optional[ActionResponse]] = [None] * len(function_calls)
+        parallel = []
+        serial = []
+
+        for index, call in enumerate(function_calls):
+            arguments = call.get("arguments", {})
+            if isinstance(arguments, str):
+                try:
+                    arguments = json.loads(arguments) if arguments else {}
+                except json.JSONDecodeError:
+                    self.logger.error(f"无法解析函数参数: {arguments}")
+                    results[index] = ActionResponse(
+                        action=Action.ERROR, response="无法解析函数参数"
+                    )
+                    continue
+            if arguments is None:
+                arguments = {}
+            if self._is_serial_tool(call["name"]):
+                serial.append((index, call["name"], arguments))
+            else:
+                parallel.append((index, call["name"], arguments))
+
+        async def run_one(index, name, arguments):
+            results[index] = await self._execute_with_limit(name, arguments)
+
+        async def run_serial():
+            for index, name, arguments in serial:
+                await run_one(index, name, arguments)
+
+        tasks = [run_one(*item) for item in parallel]
+        if serial:
+            tasks.append(run_serial())
+        await asyncio.gather(*tasks)
+        return results
+
     def _combine_responses(self, responses: List[ActionResponse]) -> ActionResponse:
         """合并多个函数调用的响应"""
         if not responses:
@@ -185,13 +277,15 @@ class UnifiedToolHandler:
             if response.action == Action.ERROR:
                 return response
 
-        # 合并所有成功的响应
+        # 按调用顺序合并所有成功的响应，直接回复的工具没有result时用其回复内容，交给LLM时不会丢失
         contents = []
         responses_text = []
 
         for response in responses:
-            if response.content:
-                contents.append(response.content)
+            if response.result is not None:
+                contents.append(str(response.result))
+            elif response.response:
+                contents.append(response.response)
             if response.response:
                 responses_text.append(response.response)
 
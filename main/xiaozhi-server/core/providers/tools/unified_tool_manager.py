@@ -15,6 +15,13 @@ class ToolManager:
         self.executors: Dict[ToolType, ToolExecutor] = {}
         self._cached_tools: Optional[Dict[str, ToolDefinition]] = None
         self._cached_function_descriptions: Optional[List[Dict[str, Any]]] = None
+        # 工具列表版本号，每次刷新递增，供工具检索等判断是否需要重建
+        self._version = 0
+
+    @property
+    def version(self) -> int:
+        """工具列表版本号"""
+        return self._version
 
     def register_executor(self, tool_type: ToolType, executor: ToolExecutor):
         """注册工具执行器"""
@@ -26,6 +33,7 @@ class ToolManager:
         """使缓存失效"""
         self._cached_tools = None
         self._cached_function_descriptions = None
+        self._version += 1
 
     def get_all_tools(self) -> Dict[str, ToolDefinition]:
         """获取所有工具定义"""
@@ -16,11 +16,15 @@ from core.providers.tts.base import TTSProviderBase
 from core.providers.tts.dto.dto import SentenceType, ContentType, InterfaceType
 from core.utils.tts import MarkdownCleaner
 from core.utils import opus_encoder_utils, textUtils
+from core.utils.upstream_pool import upstream_pool, upstream_tokens
 from config.logger import setup_logging
 
 TAG = __name__
 logger = setup_logging()
 
+# 服务端约10秒无请求会断开连接，归还连接池的连接只在这段时间内复用
+IDLE_TIMEOUT = 10
+
 
 class AccessToken:
     @staticmethod
@@ -132,68 +136,58 @@ class TTSProvider(TTSProviderBase):
 
         # 创建Opus编码器
         self.opus_encoder = opus_encoder_utils.OpusEncoderUtils(
-            sample_rate=16000, channels=1, frame_size_ms=60
+            sample_rate=16000, channels=1, frame_size_ms=60, trim_silence=True
         )
 
-        # Token管理
+        # Token管理：同一AccessKey的Token由全局统一刷新，所有设备共享
+        self._token_key = ("aliyun", self.access_key_id)
         if self.access_key_id and self.access_key_secret:
             self._refresh_token()
         else:
             self.token = config.get("token")
-            self.expire_time = None
+        # 同一账号的连接在所有设备间复用
+        self._pool_key = (
+            "aliyun",
+            self.ws_url,
+            self.appkey,
+            self.access_key_id or self.token,
+        )
 
-    def _refresh_token(self):
-        """刷新Token并记录过期时间"""
-        if self.access_key_id and self.access_key_secret:
-            self.token, expire_time_str = AccessToken.create_token(
-                self.access_key_id, self.access_key_secret
-            )
-            if not expire_time_str:
-                raise ValueError("无法获取有效的Token过期时间")
+    def _fetch_token(self):
+        """申请新Token，返回(token, 过期时间戳)"""
+        token, expire_time_str = AccessToken.create_token(
+            self.access_key_id, self.access_key_secret
+        )
+        if not expire_time_str:
+            raise ValueError("无法获取有效的Token过期时间")
 
-            expire_str = str(expire_time_str).strip()
+        expire_str = str(expire_time_str).strip()
 
-            try:
-                if expire_str.isdigit():
-                    expire_time = datetime.fromtimestamp(int(expire_str))
-                else:
-                    expire_time = datetime.strptime(expire_str, "%Y-%m-%dT%H:%M:%SZ")
-                self.expire_time = expire_time.timestamp() - 60
-            except Exception as e:
-                raise ValueError(f"无效的过期时间格式: {expire_str}") from e
-        else:
-            self.expire_time = None
+        try:
+            if expire_str.isdigit():
+                expire_time = datetime.fromtimestamp(int(expire_str))
+            else:
+                expire_time = datetime.strptime(expire_str, "%Y-%m-%dT%H:%M:%SZ")
+        except Exception as e:
+            raise ValueError(f"无效的过期时间格式: {expire_str}") from e
+        return token, expire_time.timestamp()
 
+    def _refresh_token(self):
+        """获取当前有效的Token，临近过期时由全局Token管理刷新"""
+        if self.access_key_id and self.access_key_secret:
+            self.token = upstream_tokens.get(self._token_key, self._fetch_token)
         if not self.token:
             raise ValueError("无法获取有效的访问Token")
 
-    def _is_token_expired(self):
-        """检查Token是否过期"""
-        if not self.expire_time:
-            return False
-        return time.time() > self.expire_time
-
     async def _ensure_connection(self):
-        """确保WebSocket连接可用"""
+        """从连接池取一条连接，没有空闲连接时新建"""
         try:
-            if self._is_token_expired():
-                logger.bind(tag=TAG).warning("Token已过期，正在自动刷新...")
-                self._refresh_token()
-            current_time = time.time()
-            if self.ws and current_time - self.last_active_time < 10:
-                # 10秒内才可以复用链接进行连续对话
-                logger.bind(tag=TAG).info(f"使用已有链接...")
-                return self.ws
-            logger.bind(tag=TAG).info("开始建立新连接...")
-
-            self.ws = await websockets.connect(
-                self.ws_url,
-                additional_headers={"X-NLS-Token": self.token},
-                ping_interval=30,
-                ping_timeout=10,
-                close_timeout=10,
-            )
-            logger.bind(tag=TAG).info("WebSocket连接建立成功")
+            self._refresh_token()
+            if self.ws:
+                # 上一个会话没有正常结束，连接状态未知，不再使用
+                upstream_pool.discard(self.ws)
+                self.ws = None
+            self.ws = await upstream_pool.acquire(self._pool_key, self._connect)
             self.last_active_time = time.time()
             return self.ws
         except Exception as e:
@@ -202,6 +196,18 @@ class TTSProvider(TTSProviderBase):
             self.last_active_time = None
             raise
 
+    async def _connect(self):
+        logger.bind(tag=TAG).info("开始建立新连接...")
+        ws = await websockets.connect(
+            self.ws_url,
+            additional_headers={"X-NLS-Token": self.token},
+            ping_interval=30,
+            ping_timeout=10,
+            close_timeout=10,
+        )
+        logger.bind(tag=TAG).info("WebSocket连接建立成功")
+        return ws
+
     def tts_text_priority_thread(self):
         """流式文本处理线程"""
         while not self.conn.stop_event.is_set():
@@ -336,7 +342,7 @@ class TTSProvider(TTSProviderBase):
                 logger.bind(tag=TAG).info(
                     "检测到未完成的上个会话，关闭监听任务和连接..."
                 )
-                await self.close()
+                await self._close_connection()
 
             # 建立新连接
             await self._ensure_connection()
@@ -368,7 +374,7 @@ class TTSProvider(TTSProviderBase):
         except Exception as e:
             logger.bind(tag=TAG).error(f"启动会话失败: {str(e)}")
             # 确保清理资源
-            await self.close()
+            await self._close_connection()
             raise
 
     async def finish_session(self, session_id):
@@ -399,11 +405,24 @@ class TTSProvider(TTSProviderBase):
         except Exception as e:
             logger.bind(tag=TAG).error(f"关闭会话失败: {str(e)}")
             # 确保清理资源
-            await self.close()
+            await self._close_connection()
             raise
 
+    async def cancel_synthesis(self):
+        """打断时直接断开合成连接，下一轮对话重新建立"""
+        if self._monitor_task is not None and not self._monitor_task.done():
+            await self._close_connection()
+        # 丢弃编码器中未凑满一帧的旧音频
+        self.opus_encoder.reset_state()
+
     async def close(self):
         """资源清理"""
+        await self._close_connection()
+        # 编码器归还到全局池
+        self.opus_encoder.close()
+
+    async def _close_connection(self):
+        """关闭监听任务和连接，编码器保留给后续会话使用"""
         if self._monitor_task:
             try:
                 self._monitor_task.cancel()
@@ -502,12 +521,16 @@ class TTSProvider(TTSProviderBase):
                         f"处理TTS响应时出错: {e}\n{traceback.format_exc()}"
                     )
                     break
-            # 仅在连接异常时才关闭
-            if not session_finished and self.ws:
-                try:
-                    await self.ws.close()
-                except:
-                    pass
+            if self.ws:
+                if session_finished:
+                    # 会话正常结束，连接归还连接池供下一轮对话复用
+                    upstream_pool.release(self._pool_key, self.ws, IDLE_TIMEOUT)
+                else:
+                    # 连接异常时关闭
+                    try:
+                        await self.ws.close()
+                    except:
+                        pass
                 self.ws = None
         # 监听任务退出时清理引用
         finally:
@@ -527,8 +550,7 @@ class TTSProvider(TTSProviderBase):
 
             async def _generate_audio():
                 # 刷新Token（如果需要）
-                if self._is_token_expired():
-                    self._refresh_token()
+                self._refresh_token()
 
                 # 建立WebSocket连接
                 ws = await websockets.connect(
@@ -1,19 +1,28 @@
 import os
 import re
+import json
 import queue
+import hashlib
 import uuid
 import asyncio
 import threading
+import time
 from core.utils import p3
 from datetime import datetime
-from core.utils import textUtils
 from abc import ABC, abstractmethod
 from config.logger import setup_logging
-from core.utils.util import audio_to_data, audio_bytes_to_data
+from core.utils.util import audio_to_data, audio_bytes_to_data, PcmFrameEncoder
+from core.utils.audio_decode import StreamingDecoder
 from core.utils.tts import MarkdownCleaner
+from core.utils.text_segmenter import StreamingSegmenter
 from core.utils.output_counter import add_device_output
 from core.handle.reportHandle import enqueue_tts_report
 from core.handle.sendAudioHandle import sendAudioMessage
+from core.utils.audio_pacer import audio_pacer
+from core.utils import turn_trace
+from core.utils.tts_cache import tts_cache
+from core.utils.first_segment import first_segment_policy
+from core.utils.tts_pipeline import TTSPipeline, get_provider_slot, record_gap
 from core.providers.tts.dto.dto import (
     TTSMessageDTO,
     SentenceType,
@@ -26,21 +35,43 @@ import traceback
 TAG = __name__
 logger = setup_logging()
 
+# 流式播放时，首批凑够预缓冲帧数就推送，之后按批推送以减少消息数量
+STREAM_FIRST_BATCH_FRAMES = 3
+STREAM_BATCH_FRAMES = 10
+
+
+class _TurnOutput:
+    """直接写入播放队列的合成输出，打断后之前提交的合成结果不再入队"""
+
+    def __init__(self, tts):
+        self.tts = tts
+        self.epoch = tts.abort_epoch
+
+    @property
+    def cancelled(self):
+        return self.epoch != self.tts.abort_epoch
+
+    def put(self, item):
+        if not self.cancelled:
+            self.tts.tts_audio_queue.put(item)
+
 
 class TTSProviderBase(ABC):
     def __init__(self, config, delete_audio_file):
         self.interface_type = InterfaceType.NON_STREAM
+        self.provider_name = type(self).__module__.rsplit(".", 1)[-1]
         self.conn = None
         self.tts_timeout = 10
         self.delete_audio_file = delete_audio_file
         self.audio_file_type = "wav"
+        # audio_file_type为pcm时裸PCM的采样率（16位单声道）
+        self.pcm_sample_rate = 16000
         self.output_file = config.get("output_dir", "tmp/")
         self.tts_text_queue = queue.Queue()
         self.tts_audio_queue = queue.Queue()
         self.tts_audio_first_sentence = True
         self.before_stop_play_files = []
 
-        self.tts_text_buff = []
         self.punctuations = (
             "。",
             "？",
@@ -68,8 +99,28 @@ class TTSProviderBase(ABC):
             "：",
         )
         self.tts_stop_request = False
-        self.processed_chars = 0
-        self.is_first_sentence = True
+        # 增量分段：只扫描新增文本，同时完成Markdown清理
+        self.text_segmenter = StreamingSegmenter(
+            self.first_sentence_punctuations, self.punctuations
+        )
+        # 本轮LLM文本的字数和首/末字到达时间，用于统计LLM输出速度
+        self._llm_text_chars = 0
+        self._llm_text_start = None
+        self._llm_text_last = None
+        # 边合成边播放，在open_audio_channels中根据配置和provider能力确定
+        self.stream_playback = False
+        # 每个线程复用一个事件循环，避免每句话都新建
+        self._thread_local = threading.local()
+        # 预合成流水线，在open_audio_channels中根据配置创建
+        self._pipeline = None
+        self.max_concurrency = int(config.get("max_concurrency", 0) or 0)
+        self._last_audio_sent_at = None
+        # 每次打断加1，打断前开始的合成结果据此丢弃
+        self.abort_epoch = 0
+        # TTS缓存的配置摘要，配置相同的provider共享缓存
+        self._cache_config_digest = hashlib.sha1(
+            json.dumps(config, sort_keys=True, default=str).encode("utf-8")
+        ).hexdigest()
 
     def generate_filename(self, extension=".wav"):
         return os.path.join(
@@ -77,17 +128,22 @@ class TTSProviderBase(ABC):
             f"tts-{datetime.now().date()}@{uuid.uuid4().hex}{extension}",
         )
 
-    def to_tts(self, text):
-        text = MarkdownCleaner.clean_markdown(text)
+    def to_tts(self, text, clean_markdown=True):
+        if clean_markdown:
+            text = MarkdownCleaner.clean_markdown(text)
         max_repeat_time = 5
         if self.delete_audio_file:
             # 需要删除文件的直接转为音频数据
             while max_repeat_time > 0:
                 try:
-                    audio_bytes = asyncio.run(self.text_to_speak(text, None))
+                    audio_bytes = self._run_async(self.text_to_speak(text, None))
                     if audio_bytes:
                         audio_datas, _ = audio_bytes_to_data(
-                            audio_bytes, file_type=self.audio_file_type, is_opus=True
+                            audio_bytes,
+                            file_type=self.audio_file_type,
+                            is_opus=True,
+                            sample_rate=self.pcm_sample_rate,
+                            trim_silence=True,
                         )
                         return audio_datas
                     else:
@@ -111,7 +167,7 @@ class TTSProviderBase(ABC):
             try:
                 while not os.path.exists(tmp_file) and max_repeat_time > 0:
                     try:
-                        asyncio.run(self.text_to_speak(text, tmp_file))
+                        self._run_async(self.text_to_speak(text, tmp_file))
                     except Exception as e:
                         logger.bind(tag=TAG).warning(
                             f"语音生成失败{5 - max_repeat_time + 1}次: {text}，错误: {e}"
@@ -135,17 +191,168 @@ class TTSProviderBase(ABC):
                 logger.bind(tag=TAG).error(f"Failed to generate TTS file: {e}")
                 return None
 
+    def _run_async(self, coro):
+        """在当前线程的事件循环中执行协程"""
+        loop = getattr(self._thread_local, "loop", None)
+        if loop is None or loop.is_closed():
+            loop = asyncio.new_event_loop()
+            self._thread_local.loop = loop
+        return loop.run_until_complete(coro)
+
+    def to_tts_stream(self, text, sentence_type=SentenceType.MIDDLE, output=None):
+        """边合成边解码编码，音频帧分批放入output（默认播放队列），返回全部Opus帧
+        text需已经过分段器清理
+        """
+        output = self.tts_audio_queue if output is None else output
+        max_repeat_time = 5
+        started = time.monotonic()
+        while max_repeat_time > 0:
+            audio_datas = []
+            pushed = 0
+
+            def push(final=False):
+                nonlocal pushed
+                pending = len(audio_datas) - pushed
+                threshold = (
+                    STREAM_FIRST_BATCH_FRAMES if pushed == 0 else STREAM_BATCH_FRAMES
+                )
+                if pending <= 0 or (not final and pending < threshold):
+                    return
+                if pushed == 0:
+                    first_segment_policy.record_tts_latency(
+                        self.provider_name, time.monotonic() - started
+                    )
+                # 首批带上文本，用于下发sentence_start和首句预缓冲
+                output.put(
+                    (
+                        sentence_type if pushed == 0 else SentenceType.MIDDLE,
+                        audio_datas[pushed:],
+                        text if pushed == 0 else None,
+                    )
+                )
+                pushed = len(audio_datas)
+
+            async def consume():
+                decoder = StreamingDecoder(self.audio_file_type, self.pcm_sample_rate)
+                encoder = PcmFrameEncoder(is_opus=True, trim_silence=True)
+                stream = self.text_to_speak_stream(text)
+                try:
+                    async for chunk in stream:
+                        if self.conn.client_abort or getattr(output, "cancelled", False):
+                            return False
+                        audio_datas.extend(encoder.encode(decoder.feed(chunk)))
+                        push()
+                    audio_datas.extend(encoder.encode(decoder.flush()))
+                    audio_datas.extend(encoder.flush())
+                finally:
+                    await stream.aclose()
+                    encoder.close()
+                push(final=True)
+                return True
+
+            try:
+                if not self._run_async(consume()):
+                    # 被打断的不完整音频不返回，避免写入缓存
+                    return None
+                if not audio_datas:
+                    max_repeat_time -= 1
+                    continue
+                logger.bind(tag=TAG).info(
+                    f"语音生成成功: {text}，重试{5 - max_repeat_time}次"
+                )
+                return audio_datas
+            except Exception as e:
+                if pushed:
+                    # 已经开始播放，不能再重试
+                    logger.bind(tag=TAG).error(f"语音流式生成中断: {text}，错误: {e}")
+                    push(final=True)
+                    return None
+                logger.bind(tag=TAG).warning(
+                    f"语音生成失败{5 - max_repeat_time + 1}次: {text}，错误: {e}"
+                )
+                max_repeat_time -= 1
+        logger.bind(tag=TAG).error(f"语音生成失败: {text}，请检查网络或服务是否正常")
+        return None
+
+    def cache_identity(self):
+        """TTS缓存使用的provider标识：类型、配置及当前音色"""
+        return {
+            "provider": type(self).__module__,
+            "config": self._cache_config_digest,
+            "voice": str(getattr(self, "voice", "")),
+        }
+
+    def _to_tts_cached(self, text, sentence_type=SentenceType.MIDDLE, output=None):
+        """先查TTS缓存，未命中再合成，音频放入output（默认播放队列）"""
+        output = self.tts_audio_queue if output is None else output
+        key = tts_cache.make_key(self.cache_identity(), text)
+        audio_datas = tts_cache.get(key)
+        if audio_datas is not None:
+            logger.bind(tag=TAG).debug(f"TTS缓存命中: {text}")
+            output.put((sentence_type, audio_datas, text))
+            return
+        if self.stream_playback:
+            # 流式合成时音频已经分批入队
+            audio_datas = self.to_tts_stream(text, sentence_type, output)
+        else:
+            started = time.monotonic()
+            audio_datas = self.to_tts(text, clean_markdown=False)
+            if audio_datas:
+                first_segment_policy.record_tts_latency(
+                    self.provider_name, time.monotonic() - started
+                )
+                output.put((sentence_type, audio_datas, text))
+        if audio_datas:
+            tts_cache.put(key, audio_datas)
+
+    def _synthesize_segment(self, sentence_type, text, output=None):
+        """合成一段文本，音频放入output（默认播放队列）"""
+        output = _TurnOutput(self) if output is None else output
+        if self.delete_audio_file:
+            self._to_tts_cached(text, sentence_type, output)
+            return
+        started = time.monotonic()
+        tts_file = self.to_tts(text, clean_markdown=False)
+        if tts_file:
+            audio_datas = self._process_audio_file(tts_file)
+            first_segment_policy.record_tts_latency(
+                self.provider_name, time.monotonic() - started
+            )
+            output.put((sentence_type, audio_datas, text))
+
+    def _submit_segment(self, sentence_type, text):
+        """开启预合成时交给流水线并发合成，否则在当前线程合成"""
+        if self._pipeline is not None:
+            self._pipeline.submit(self._synthesize_segment, sentence_type, text)
+        else:
+            self._synthesize_segment(sentence_type, text)
+
+    def _put_audio(self, item):
+        """放入播放队列，开启预合成时与合成结果保持顺序"""
+        if self._pipeline is not None:
+            self._pipeline.put(item)
+        else:
+            self.tts_audio_queue.put(item)
+
     @abstractmethod
     async def text_to_speak(self, text, output_file):
         pass
 
+    async def text_to_speak_stream(self, text):
+        """流式合成，逐块返回音频数据（格式同audio_file_type）
+        默认整句合成后一次返回，支持分块返回的provider请在子类中重写
+        """
+        audio_bytes = await self.text_to_speak(text, None)
+        if audio_bytes:
+            yield audio_bytes
+
     def audio_to_pcm_data(self, audio_file_path):
         """音频文件转换为PCM编码"""
         return audio_to_data(audio_file_path, is_opus=False)
 
     def audio_to_opus_data(self, audio_file_path):
         """音频文件转换为Opus编码"""
-        return audio_to_data(audio_file_path, is_opus=True)
+        return audio_to_data(audio_file_path, is_opus=True, trim_silence=True)
 
     def tts_one_sentence(
         self,
@@ -178,6 +385,24 @@ class TTSProviderBase(ABC):
     async def open_audio_channels(self, conn):
         self.conn = conn
         self.tts_timeout = conn.config.get("tts_timeout", 10)
+        # 预合成：同时合成后续多段文本，按顺序播放
+        pipeline_config = conn.config.get("tts_pipeline", {})
+        lookahead = int(pipeline_config.get("lookahead", 1))
+        if lookahead > 1 and self.interface_type == InterfaceType.NON_STREAM:
+            max_concurrency = self.max_concurrency or int(
+                pipeline_config.get("max_concurrency_per_provider", 0)
+            )
+            slot = get_provider_slot(
+                (type(self).__module__, self._cache_config_digest), max_concurrency
+            )
+            self._pipeline = TTSPipeline(self, lookahead, slot)
+        # 重写了text_to_speak_stream的provider才支持边合成边播放
+        self.stream_playback = (
+            self.delete_audio_file
+            and conn.config.get("tts_stream_playback", True)
+            and type(self).text_to_speak_stream
+            is not TTSProviderBase.text_to_speak_stream
+        )
         # tts 消化线程
         self.tts_priority_thread = threading.Thread(
             target=self.tts_text_priority_thread, daemon=True
@@ -202,43 +427,42 @@ class TTSProviderBase(ABC):
                     logger.bind(tag=TAG).info("收到打断信息，终止TTS文本处理线程")
                     continue
                 if message.sentence_type == SentenceType.FIRST:
+                    if self._pipeline is not None:
+                        self._pipeline.new_epoch()
                     # 初始化参数
                     self.tts_stop_request = False
-                    self.processed_chars = 0
-                    self.tts_text_buff = []
-                    self.is_first_sentence = True
+                    self.text_segmenter.reset()
+                    # 根据LLM输出速度和TTS首包耗时决定第一段的长度
+                    self.text_segmenter.set_first_segment_limits(
+                        *first_segment_policy.limits(self.provider_name)
+                    )
+                    self._llm_text_chars = 0
+                    self._llm_text_start = None
                     self.tts_audio_first_sentence = True
                 elif ContentType.TEXT == message.content_type:
-                    self.tts_text_buff.append(message.content_detail)
-                    segment_text = self._get_segment_text()
-                    if segment_text:
-                        if self.delete_audio_file:
-                            audio_datas = self.to_tts(segment_text)
-                            if audio_datas:
-                                self.tts_audio_queue.put(
-                                    (message.sentence_type, audio_datas, segment_text)
-                                )
-                        else:
-                            tts_file = self.to_tts(segment_text)
-                            if tts_file:
-                                audio_datas = self._process_audio_file(tts_file)
-                                self.tts_audio_queue.put(
-                                    (message.sentence_type, audio_datas, segment_text)
-                                )
+                    self._track_llm_text(message.content_detail)
+                    for segment_text in self.text_segmenter.feed(
+                        message.content_detail
+                    ):
+                        self._submit_segment(message.sentence_type, segment_text)
                 elif ContentType.FILE == message.content_type:
                     self._process_remaining_text()
                     tts_file = message.content_file
                     if tts_file and os.path.exists(tts_file):
                         audio_datas = self._process_audio_file(tts_file)
-                        self.tts_audio_queue.put(
+                        self._put_audio(
                             (message.sentence_type, audio_datas, message.content_detail)
                         )
 
                 if message.sentence_type == SentenceType.LAST:
+                    if self._llm_text_start is not None:
+                        first_segment_policy.record_llm_rate(
+                            self._llm_text_chars,
+                            self._llm_text_last - self._llm_text_start,
+                        )
+                        self._llm_text_start = None
                     self._process_remaining_text()
-                    self.tts_audio_queue.put(
-                        (message.sentence_type, [], message.content_detail)
-                    )
+                    self._put_audio((message.sentence_type, [], message.content_detail))
 
             except queue.Empty:
                 continue
@@ -248,6 +472,15 @@ class TTSProviderBase(ABC):
                 )
                 continue
 
+    def _track_llm_text(self, text):
+        if not text:
+            return
+        now = time.monotonic()
+        if self._llm_text_start is None:
+            self._llm_text_start = now
+        self._llm_text_last = now
+        self._llm_text_chars += len(text)
+
     def _audio_play_priority_thread(self):
         while not self.conn.stop_event.is_set():
             text = None
@@ -260,11 +493,34 @@ class TTSProviderBase(ABC):
                     if self.conn.stop_event.is_set():
                         break
                     continue
+                if self.conn.client_abort:
+                    # 打断后才入队的旧音频直接丢弃，结束标记仍需处理（结束追踪、说完再见后关闭连接）
+                    if sentence_type != SentenceType.LAST:
+                        continue
+                    audio_datas, text = [], None
+                if audio_datas:
+                    # 每句话的音频就绪时间
+                    turn_trace.mark(
+                        self.conn, "tts_audio_ready", frames=len(audio_datas)
+                    )
+                    # 同一轮中上一段音频发送完到这一段就绪的间隙
+                    if (
+                        self._last_audio_sent_at is not None
+                        and not self.tts_audio_first_sentence
+                    ):
+                        record_gap(
+                            self.provider_name,
+                            time.monotonic() - self._last_audio_sent_at,
+                        )
                 future = asyncio.run_coroutine_threadsafe(
                     sendAudioMessage(self.conn, sentence_type, audio_datas, text),
                     self.conn.loop,
                 )
                 future.result()
+                if sentence_type == SentenceType.LAST:
+                    self._last_audio_sent_at = None
+                elif audio_datas:
+                    self._last_audio_sent_at = time.monotonic()
                 if self.conn.max_output_size > 0 and text:
                     add_device_output(self.conn.headers.get("device-id"), len(text))
                 enqueue_tts_report(self.conn, text, audio_datas)
@@ -273,6 +529,25 @@ class TTSProviderBase(ABC):
                     f"audio_play_priority priority_thread: {text} {e}"
                 )
 
+    async def abort(self, started=None):
+        """
+        打断当前播报：立即停止发送音频，作废正在合成的文本，清空文本和音频队列，
+        再取消服务端正在进行的合成。started为收到打断的时间，用于统计打断耗时
+        """
+        audio_pacer.abort(self.conn, started)
+        self.abort_epoch += 1
+        if self._pipeline is not None:
+            self._pipeline.new_epoch()
+        self.conn.clear_queues()
+        try:
+            await self.cancel_synthesis()
+        except Exception as e:
+            logger.bind(tag=TAG).warning(f"取消TTS合成失败: {e}")
+
+    async def cancel_synthesis(self):
+        """取消服务端正在进行的合成，流式TTS在子类中重写"""
+        pass
+
     async def start_session(self, session_id):
         pass
 
@@ -281,48 +556,11 @@ class TTSProviderBase(ABC):
 
     async def close(self):
         """资源清理方法"""
+        if self._pipeline is not None:
+            self._pipeline.close()
         if hasattr(self, "ws") and self.ws:
             await self.ws.close()
 
-    def _get_segment_text(self):
-        # 合并当前全部文本并处理未分割部分
-        full_text = "".join(self.tts_text_buff)
-        current_text = full_text[self.processed_chars :]  # 从未处理的位置开始
-        last_punct_pos = -1
-
-        # 根据是否是第一句话选择不同的标点符号集合
-        punctuations_to_use = (
-            self.first_sentence_punctuations
-            if self.is_first_sentence
-            else self.punctuations
-        )
-
-        for punct in punctuations_to_use:
-            pos = current_text.rfind(punct)
-            if (pos != -1 and last_punct_pos == -1) or (
-                pos != -1 and pos < last_punct_pos
-            ):
-                last_punct_pos = pos
-
-        if last_punct_pos != -1:
-            segment_text_raw = current_text[: last_punct_pos + 1]
-            segment_text = textUtils.get_string_no_punctuation_or_emoji(
-                segment_text_raw
-            )
-            self.processed_chars += len(segment_text_raw)  # 更新已处理字符位置
-
-            # 如果是第一句话，在找到第一个逗号后，将标志设置为False
-            if self.is_first_sentence:
-                self.is_first_sentence = False
-
-            return segment_text
-        elif self.tts_stop_request and current_text:
-            segment_text = current_text
-            self.is_first_sentence = True  # 重置标志
-            return segment_text
-        else:
-            return None
-
     def _process_audio_file(self, tts_file):
         """处理音频文件并转换为指定格式
 
@@ -333,19 +571,24 @@ class TTSProviderBase(ABC):
         Returns:
             tuple: (sentence_type, audio_datas, content_detail)
         """
+        delete_file = (
+            self.delete_audio_file
+            and tts_file is not None
+            and os.path.exists(tts_file)
+            and tts_file.startswith(self.output_file)
+        )
         if tts_file.endswith(".p3"):
-            audio_datas, _ = p3.decode_opus_from_file(tts_file)
+            if delete_file:
+                audio_datas, _ = p3.decode_opus_from_file(tts_file)
+            else:
+                # 音乐等长音频使用共享的内存映射，播放时才逐帧读取
+                audio_datas = p3.open_p3(tts_file).frames()
         elif self.conn.audio_format == "pcm":
             audio_datas, _ = self.audio_to_pcm_data(tts_file)
         else:
             audio_datas, _ = self.audio_to_opus_data(tts_file)
 
-        if (
-            self.delete_audio_file
-            and tts_file is not None
-            and os.path.exists(tts_file)
-            and tts_file.startswith(self.output_file)
-        ):
+        if delete_file:
             os.remove(tts_file)
         return audio_datas
 
@@ -361,23 +604,7 @@ class TTSProviderBase(ABC):
         Returns:
             bool: 是否成功处理了文本
         """
-        full_text = "".join(self.tts_text_buff)
-        remaining_text = full_text[self.processed_chars :]
-        if remaining_text:
-            segment_text = textUtils.get_string_no_punctuation_or_emoji(remaining_text)
-            if segment_text:
-                if self.delete_audio_file:
-                    audio_datas = self.to_tts(segment_text)
-                    if audio_datas:
-                        self.tts_audio_queue.put(
-                            (SentenceType.MIDDLE, audio_datas, segment_text)
-                        )
-                else:
-                    tts_file = self.to_tts(segment_text)
-                    audio_datas = self._process_audio_file(tts_file)
-                    self.tts_audio_queue.put(
-                        (SentenceType.MIDDLE, audio_datas, segment_text)
-                    )
-                self.processed_chars += len(full_text)
-                return True
-        return False
+        segments = self.text_segmenter.flush()
+        for segment_text in segments:
+            self._submit_segment(SentenceType.MIDDLE, segment_text)
+        return bool(segments)
@@ -31,7 +31,7 @@ class TTSProvider(TTSProviderBase):
     def generate_filename(self):
         return os.path.join(self.output_file, f"tts-{datetime.now().date()}@{uuid.uuid4().hex}.{self.format}")
 
-    async def text_to_speak(self, text, output_file):
+    def _request(self, text, stream=False):
         request_params = {}
         for k, v in self.params.items():
             if isinstance(v, str) and "{prompt_text}" in v:
@@ -39,9 +39,15 @@ class TTSProvider(TTSProviderBase):
             request_params[k] = v
 
         if self.method.upper() == "POST":
-            resp = requests.post(self.url, json=request_params, headers=self.headers)
-        else:
-            resp = requests.get(self.url, params=request_params, headers=self.headers)
+            return requests.post(
+                self.url, json=request_params, headers=self.headers, stream=stream
+            )
+        return requests.get(
+            self.url, params=request_params, headers=self.headers, stream=stream
+        )
+
+    async def text_to_speak(self, text, output_file):
+        resp = self._request(text)
         if resp.status_code == 200:
             if output_file:
                 with open(output_file, "wb") as file:
@@ -52,3 +58,13 @@ class TTSProvider(TTSProviderBase):
             error_msg = f"Custom TTS请求失败: {resp.status_code} - {resp.text}"
             logger.bind(tag=TAG).error(error_msg)
             raise Exception(error_msg)  # 抛出异常，让调用方捕获
+
+    async def text_to_speak_stream(self, text):
+        with self._request(text, stream=True) as resp:
+            if resp.status_code != 200:
+                error_msg = f"Custom TTS请求失败: {resp.status_code} - {resp.text}"
+                logger.bind(tag=TAG).error(error_msg)
+                raise Exception(error_msg)
+            for chunk in resp.iter_content(chunk_size=4096):
+                if chunk:
+                    yield chunk
@@ -9,6 +9,7 @@ from core.utils.tts import MarkdownCleaner
 from config.logger import setup_logging
 from core.utils import opus_encoder_utils
 from core.utils.util import check_model_key
+from core.utils.upstream_pool import upstream_pool
 from core.providers.tts.base import TTSProviderBase
 from core.providers.tts.dto.dto import SentenceType, ContentType, InterfaceType
 from asyncio import Task
@@ -155,10 +156,18 @@ class TTSProvider(TTSProviderBase):
         self.ws_url = config.get("ws_url")
         self.authorization = config.get("authorization")
         self.header = {"Authorization": f"{self.authorization}{self.access_token}"}
+        # 同一账号的连接在所有设备间复用
+        self._pool_key = (
+            "huoshan",
+            self.ws_url,
+            self.appId,
+            self.access_token,
+            self.resource_id,
+        )
         self.enable_two_way = True
         self.tts_text = ""
         self.opus_encoder = opus_encoder_utils.OpusEncoderUtils(
-            sample_rate=16000, channels=1, frame_size_ms=60
+            sample_rate=16000, channels=1, frame_size_ms=60, trim_silence=True
         )
         model_key_msg = check_model_key("TTS", self.access_token)
         if model_key_msg:
@@ -173,28 +182,32 @@ class TTSProvider(TTSProviderBase):
             raise
 
     async def _ensure_connection(self):
-        """建立新的WebSocket连接"""
+        """从连接池取一条连接，没有空闲连接时新建"""
         try:
             if self.ws:
                 logger.bind(tag=TAG).info(f"使用已有链接...")
                 return self.ws
-            logger.bind(tag=TAG).info("开始建立新连接...")
-            ws_header = {
-                "X-Api-App-Key": self.appId,
-                "X-Api-Access-Key": self.access_token,
-                "X-Api-Resource-Id": self.resource_id,
-                "X-Api-Connect-Id": uuid.uuid4(),
-            }
-            self.ws = await websockets.connect(
-                self.ws_url, additional_headers=ws_header, max_size=1000000000
-            )
-            logger.bind(tag=TAG).info("WebSocket连接建立成功")
+            self.ws = await upstream_pool.acquire(self._pool_key, self._connect)
             return self.ws
         except Exception as e:
             logger.bind(tag=TAG).error(f"建立连接失败: {str(e)}")
             self.ws = None
             raise
 
+    async def _connect(self):
+        logger.bind(tag=TAG).info("开始建立新连接...")
+        ws_header = {
+            "X-Api-App-Key": self.appId,
+            "X-Api-Access-Key": self.access_token,
+            "X-Api-Resource-Id": self.resource_id,
+            "X-Api-Connect-Id": uuid.uuid4(),
+        }
+        ws = await websockets.connect(
+            self.ws_url, additional_headers=ws_header, max_size=1000000000
+        )
+        logger.bind(tag=TAG).info("WebSocket连接建立成功")
+        return ws
+
     def tts_text_priority_thread(self):
         """火山引擎双流式TTS的文本处理线程"""
         while not self.conn.stop_event.is_set():
@@ -320,7 +333,7 @@ class TTSProvider(TTSProviderBase):
                 and not self._monitor_task.done()
             ):
                 logger.bind(tag=TAG).info("检测到未完成的上个会话，关闭监听任务和连接...")
-                await self.close()
+                await self._close_connection()
 
             # 建立新连接
             await self._ensure_connection()
@@ -344,7 +357,7 @@ class TTSProvider(TTSProviderBase):
         except Exception as e:
             logger.bind(tag=TAG).error(f"启动会话失败: {str(e)}")
             # 确保清理资源
-            await self.close()
+            await self._close_connection()
             raise
 
     async def finish_session(self, session_id):
@@ -377,7 +390,7 @@ class TTSProvider(TTSProviderBase):
         except Exception as e:
             logger.bind(tag=TAG).error(f"关闭会话失败: {str(e)}")
             # 确保清理资源
-            await self.close()
+            await self._close_connection()
             raise
 
     async def cancel_session(self,session_id):
@@ -398,11 +411,24 @@ class TTSProvider(TTSProviderBase):
         except Exception as e:
             logger.bind(tag=TAG).error(f"取消会话失败: {str(e)}")
             # 确保清理资源
-            await self.close()
+            await self._close_connection()
             raise
 
+    async def cancel_synthesis(self):
+        """打断时取消服务端正在合成的会话，剩余音频不再下发"""
+        if self._monitor_task is not None and not self._monitor_task.done():
+            await self.cancel_session(self.conn.sentence_id)
+        # 丢弃编码器中未凑满一帧的旧音频
+        self.opus_encoder.reset_state()
+
     async def close(self):
         """资源清理方法"""
+        await self._close_connection()
+        # 编码器归还到全局池
+        self.opus_encoder.close()
+
+    async def _close_connection(self):
+        """关闭监听任务和连接，编码器保留给后续会话使用"""
         # 取消监听任务
         if self._monitor_task:
             try:
@@ -435,9 +461,16 @@ class TTSProvider(TTSProviderBase):
                     res = self.parser_response(msg)
                     self.print_response(res, "send_text res:")
 
+                    if self.conn.client_abort and res.optional.event in (
+                        EVENT_TTSSentenceStart,
+                        EVENT_TTSResponse,
+                        EVENT_TTSSentenceEnd,
+                    ):
+                        # 已打断，等待取消确认期间收到的音频直接丢弃
+                        continue
                     if res.optional.event == EVENT_SessionCanceled:
+                        # 被打断的会话不归还连接池，关闭连接，避免取消前已发出的音频被下一个会话收到
                         logger.bind(tag=TAG).debug(f"释放服务端资源成功～～")
-                        session_finished = True
                         break
                     elif res.optional.event == EVENT_TTSSentenceStart:
                         json_data = json.loads(res.payload.decode("utf-8"))
@@ -491,12 +524,16 @@ class TTSProvider(TTSProviderBase):
                     )
                     traceback.print_exc()
                     break
-            # 仅在连接异常时才关闭
-            if not session_finished and self.ws:
-                try:
-                    await self.ws.close()
-                except:
-                    pass
+            if self.ws:
+                if session_finished:
+                    # 会话正常结束，连接归还连接池供下一轮对话复用
+                    upstream_pool.release(self._pool_key, self.ws)
+                else:
+                    # 会话被取消或连接异常时关闭
+                    try:
+                        await self.ws.close()
+                    except:
+                        pass
                 self.ws = None
         # 监听任务退出时清理引用
         finally:
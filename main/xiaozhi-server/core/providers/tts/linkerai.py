@@ -8,7 +8,7 @@ import time
 from config.logger import setup_logging
 from core.utils.tts import MarkdownCleaner
 from core.providers.tts.base import TTSProviderBase
-from core.utils import opus_encoder_utils, textUtils
+from core.utils import opus_encoder_utils
 from core.providers.tts.dto.dto import SentenceType, ContentType, InterfaceType
 
 TAG = __name__
@@ -28,7 +28,7 @@ class TTSProvider(TTSProviderBase):
 
         # 创建Opus编码器
         self.opus_encoder = opus_encoder_utils.OpusEncoderUtils(
-            sample_rate=16000, channels=1, frame_size_ms=60
+            sample_rate=16000, channels=1, frame_size_ms=60, trim_silence=True
         )
 
         # 添加文本缓冲区
@@ -49,15 +49,14 @@ class TTSProvider(TTSProviderBase):
                 if message.sentence_type == SentenceType.FIRST:
                     # 初始化参数
                     self.tts_stop_request = False
-                    self.processed_chars = 0
-                    self.tts_text_buff = []
+                    self.text_segmenter.reset()
                     self.segment_count = 0
                     self.tts_audio_first_sentence = True
                     self.before_stop_play_files.clear()
                 elif ContentType.TEXT == message.content_type:
-                    self.tts_text_buff.append(message.content_detail)
-                    segment_text = self._get_segment_text()
-                    if segment_text:
+                    for segment_text in self.text_segmenter.feed(
+                        message.content_detail
+                    ):
                         self.to_tts_single_stream(segment_text)
 
                 elif ContentType.FILE == message.content_type:
@@ -88,22 +87,18 @@ class TTSProvider(TTSProviderBase):
         Returns:
             bool: 是否成功处理了文本
         """
-        full_text = "".join(self.tts_text_buff)
-        remaining_text = full_text[self.processed_chars :]
-        if remaining_text:
-            segment_text = textUtils.get_string_no_punctuation_or_emoji(remaining_text)
-            if segment_text:
-                self.to_tts_single_stream(segment_text, is_last)
-                self.processed_chars += len(full_text)
-            else:
-                self._process_before_stop_play_files()
+        segments = self.text_segmenter.flush()
+        if segments:
+            for index, segment_text in enumerate(segments):
+                self.to_tts_single_stream(
+                    segment_text, is_last and index == len(segments) - 1
+                )
         else:
             self._process_before_stop_play_files()
 
     def to_tts_single_stream(self, text, is_last=False):
         try:
             max_repeat_time = 5
-            text = MarkdownCleaner.clean_markdown(text)
             try:
                 asyncio.run(self.text_to_speak(text, is_last))
             except Exception as e:
@@ -19,6 +19,8 @@ class TTSProvider(TTSProviderBase):
             self.voice = config.get("voice", "alloy")
         self.response_format = config.get("format", "wav")
         self.audio_file_type = config.get("format", "wav")
+        # OpenAI返回的pcm为24kHz/16位单声道
+        self.pcm_sample_rate = 24000
 
         # 处理空字符串的情况
         speed = config.get("speed", "1.0")
@@ -29,7 +31,7 @@ class TTSProvider(TTSProviderBase):
         if model_key_msg:
             logger.bind(tag=TAG).error(model_key_msg)
 
-    async def text_to_speak(self, text, output_file):
+    def _request(self, text, stream=False):
         headers = {
             "Authorization": f"Bearer {self.api_key}",
             "Content-Type": "application/json",
@@ -38,10 +40,13 @@ class TTSProvider(TTSProviderBase):
             "model": self.model,
             "input": text,
             "voice": self.voice,
-            "response_format": "wav",
+            "response_format": self.response_format,
             "speed": self.speed,
         }
-        response = requests.post(self.api_url, json=data, headers=headers)
+        return requests.post(self.api_url, json=data, headers=headers, stream=stream)
+
+    async def text_to_speak(self, text, output_file):
+        response = self._request(text)
         if response.status_code == 200:
             if output_file:
                 with open(output_file, "wb") as audio_file:
@@ -52,3 +57,13 @@ class TTSProvider(TTSProviderBase):
             raise Exception(
                 f"OpenAI TTS请求失败: {response.status_code} - {response.text}"
             )
+
+    async def text_to_speak_stream(self, text):
+        with self._request(text, stream=True) as response:
+            if response.status_code != 200:
+                raise Exception(
+                    f"OpenAI TTS请求失败: {response.status_code} - {response.text}"
+                )
+            for chunk in response.iter_content(chunk_size=4096):
+                if chunk:
+                    yield chunk
@@ -0,0 +1,291 @@
+import os
+import json
+import time
+import wave
+import queue
+import asyncio
+import threading
+from concurrent.futures import Future
+
+import numpy as np
+import sherpa_onnx
+
+from config.logger import setup_logging
+from core.providers.tts.base import TTSProviderBase
+from core.utils.metrics import metrics
+
+TAG = __name__
+logger = setup_logging()
+
+# 各模型类型需要的文件配置项，相对路径以model_dir为根目录
+MODEL_FILES = {
+    "vits": ("model", "lexicon", "tokens", "data_dir", "dict_dir"),
+    "matcha": (
+        "acoustic_model",
+        "vocoder",
+        "lexicon",
+        "tokens",
+        "data_dir",
+        "dict_dir",
+    ),
+    "kokoro": ("model", "voices", "tokens", "lexicon", "data_dir", "dict_dir"),
+}
+
+
+def _to_pcm(samples):
+    """float32采样转为16位小端PCM"""
+    samples = np.asarray(samples, dtype=np.float32)
+    return (np.clip(samples, -1.0, 1.0) * 32767).astype(np.int16).tobytes()
+
+
+def _build_config(config):
+    model_type = config.get("model_type", "vits")
+    if model_type not in MODEL_FILES:
+        raise ValueError(f"不支持的sherpa-onnx TTS模型类型: {model_type}")
+    model_dir = config.get("model_dir", "")
+
+    def resolve(path):
+        if path and model_dir and not os.path.isabs(path):
+            return os.path.join(model_dir, path)
+        return path
+
+    files = {name: resolve(config.get(name)) for name in MODEL_FILES[model_type]}
+    files = {name: value for name, value in files.items() if value}
+    model_config = {
+        "vits": sherpa_onnx.OfflineTtsVitsModelConfig,
+        "matcha": sherpa_onnx.OfflineTtsMatchaModelConfig,
+        "kokoro": sherpa_onnx.OfflineTtsKokoroModelConfig,
+    }[model_type](**files)
+    rule_fsts = ",".join(
+        resolve(name.strip())
+        for name in str(config.get("rule_fsts") or "").split(",")
+        if name.strip()
+    )
+    tts_config = sherpa_onnx.OfflineTtsConfig(
+        model=sherpa_onnx.OfflineTtsModelConfig(
+            **{model_type: model_config},
+            provider="cpu",
+            num_threads=int(config.get("num_threads", 2)),
+            debug=False,
+        ),
+        rule_fsts=rule_fsts,
+        max_num_sentences=1,
+    )
+    if not tts_config.validate():
+        raise ValueError("sherpa-onnx TTS模型配置无效，请检查模型文件路径")
+    return tts_config
+
+
+class _Request:
+    __slots__ = (
+        "text",
+        "sid",
+        "speed",
+        "on_chunk",
+        "future",
+        "cancelled",
+        "enqueued",
+    )
+
+    def __init__(self, text, sid, speed, on_chunk):
+        self.text = text
+        self.sid = sid
+        self.speed = speed
+        self.on_chunk = on_chunk
+        self.future = Future()
+        self.cancelled = False
+        self.enqueued = time.monotonic()
+
+
+class SynthesisEngine:
+    """
+    同一模型配置的所有连接共享的本地合成引擎：加载instances个模型实例，每个实例由一个工作线程驱动，
+    各连接的合成请求进入同一个队列。工作线程每次取出当前排队的请求（最多max_batch条），
+    按文本长度从短到长依次合成，让各连接的首句等短句不被长句阻塞。
+    """
+
+    def __init__(self, name, config):
+        self.name = name
+        tts_config = _build_config(config)
+        instances = max(1, int(config.get("instances", 1)))
+        self.max_batch = max(1, int(config.get("max_batch", 8)))
+        self._queue = queue.Queue()
+        self._lock = threading.Lock()
+        self.stats = {
+            "requests": 0,
+            "batches": 0,
+            "cancelled": 0,
+            "audio_seconds": 0.0,
+            "compute_seconds": 0.0,
+            "queue_wait_seconds": 0.0,
+        }
+        models = [sherpa_onnx.OfflineTts(tts_config) for _ in range(instances)]
+        self.sample_rate = models[0].sample_rate
+        self.num_speakers = models[0].num_speakers
+        for i, model in enumerate(models):
+            threading.Thread(
+                target=self._worker,
+                args=(model,),
+                daemon=True,
+                name=f"sherpa-tts-{i}",
+            ).start()
+        logger.bind(tag=TAG).info(
+            f"sherpa-onnx TTS已加载: {name}，实例数{instances}，采样率{self.sample_rate}"
+        )
+
+    def submit(self, text, sid=0, speed=1.0, on_chunk=None):
+        """
+        提交合成请求，返回的请求对象中future的结果为整段16位PCM。
+        on_chunk不为空时每合成完一句就回调一次该句的PCM（在工作线程中调用）
+        """
+        request = _Request(text, sid, speed, on_chunk)
+        self._queue.put(request)
+        return request
+
+    def _worker(self, model):
+        while True:
+            batch = [self._queue.get()]
+            while len(batch) < self.max_batch:
+                try:
+                    batch.append(self._queue.get_nowait())
+                except queue.Empty:
+                    break
+            batch.sort(key=lambda request: len(request.text))
+            with self._lock:
+                self.stats["batches"] += 1
+            for request in batch:
+                self._synthesize(model, request)
+
+    def _synthesize(self, model, request):
+        started = time.monotonic()
+        if request.cancelled:
+            with self._lock:
+                self.stats["cancelled"] += 1
+            request.future.set_result(b"")
+            return
+        chunks = []
+
+        def callback(samples, progress):
+            pcm = _to_pcm(samples)
+            chunks.append(pcm)
+            if request.on_chunk is not None:
+                try:
+                    request.on_chunk(pcm)
+                except Exception:
+                    # 调用方的事件循环已关闭
+                    request.cancelled = True
+            # 返回0停止合成剩余的句子
+            return 0 if request.cancelled else 1
+
+        try:
+            model.generate(
+                request.text, sid=request.sid, speed=request.speed, callback=callback
+            )
+        except Exception as e:
+            request.future.set_exception(e)
+            return
+        finished = time.monotonic()
+        pcm = b"".join(chunks)
+        with self._lock:
+            self.stats["requests"] += 1
+            self.stats["audio_seconds"] += len(pcm) / 2 / self.sample_rate
+            self.stats["compute_seconds"] += finished - started
+            self.stats["queue_wait_seconds"] += started - request.enqueued
+        request.future.set_result(pcm)
+
+    def snapshot(self):
+        with self._lock:
+            stats = dict(self.stats)
+        requests = stats["requests"]
+        audio_seconds = stats.pop("audio_seconds")
+        compute_seconds = stats.pop("compute_seconds")
+        queue_wait = stats.pop("queue_wait_seconds")
+        stats["pending"] = self._queue.qsize()
+        stats["audio_seconds"] = round(audio_seconds, 1)
+        # 实时率：合成耗时/音频时长，小于1表示合成比播放快
+        stats["rtf"] = (
+            round(compute_seconds / audio_seconds, 3) if audio_seconds else None
+        )
+        stats["avg_queue_wait_ms"] = (
+            round(queue_wait / requests * 1000, 1) if requests else None
+        )
+        return stats
+
+
+_engines = {}
+_engines_lock = threading.Lock()
+
+
+def get_engine(config):
+    """按模型配置获取共享的合成引擎，首次使用时加载模型"""
+    keys = ("model_type", "model_dir", "num_threads", "instances", "max_batch")
+    keys += MODEL_FILES.get(config.get("model_type", "vits"), ()) + ("rule_fsts",)
+    identity = json.dumps({key: config.get(key) for key in keys}, sort_keys=True)
+    with _engines_lock:
+        engine = _engines.get(identity)
+        if engine is None:
+            model_dir = config.get("model_dir") or ""
+            name = os.path.basename(os.path.normpath(model_dir)) or "default"
+            engine = SynthesisEngine(name, config)
+            _engines[identity] = engine
+        return engine
+
+
+def _snapshot():
+    with _engines_lock:
+        engines = list(_engines.values())
+    result = {}
+    for engine in engines:
+        for name, value in engine.snapshot().items():
+            result[f"{engine.name}_{name}"] = value
+    return result
+
+
+metrics.register_collector("sherpa_tts", _snapshot)
+
+
+class TTSProvider(TTSProviderBase):
+    def __init__(self, config, delete_audio_file):
+        super().__init__(config, delete_audio_file)
+        self.engine = get_engine(config)
+        # 直接返回模型输出的PCM，不经过文件
+        self.audio_file_type = "pcm"
+        self.pcm_sample_rate = self.engine.sample_rate
+        self.voice = int(config.get("speaker_id", 0) or 0)
+        self.speed = float(config.get("speed", 1.0) or 1.0)
+
+    async def text_to_speak(self, text, output_file):
+        request = self.engine.submit(text, self.voice, self.speed)
+        pcm = await asyncio.wrap_future(request.future)
+        if not output_file:
+            return pcm
+        with wave.open(output_file, "wb") as f:
+            f.setnchannels(1)
+            f.setsampwidth(2)
+            f.setframerate(self.engine.sample_rate)
+            f.writeframes(pcm)
+
+    async def text_to_speak_stream(self, text):
+        """逐句返回PCM，第一句合成完即可开始播放"""
+        loop = asyncio.get_running_loop()
+        chunks = asyncio.Queue()
+        request = self.engine.submit(
+            text,
+            self.voice,
+            self.speed,
+            on_chunk=lambda pcm: loop.call_soon_threadsafe(chunks.put_nowait, pcm),
+        )
+        request.future.add_done_callback(
+            lambda _: loop.call_soon_threadsafe(chunks.put_nowait, None)
+        )
+        try:
+            while True:
+                pcm = await chunks.get()
+                if pcm is None:
+                    break
+                yield pcm
+            # 传递合成异常
+            request.future.result()
+        finally:
+            # 调用方提前结束（打断）时，剩余的句子不再合成
+            request.cancelled = True
@@ -14,27 +14,34 @@ class TTSProvider(TTSProviderBase):
         self.response_format = config.get("response_format", "mp3")
         self.audio_file_type = config.get("response_format", "mp3")
         self.sample_rate = config.get("sample_rate")
+        # 未指定采样率时，接口返回的pcm默认为44.1kHz
+        self.pcm_sample_rate = int(self.sample_rate) if self.sample_rate else 44100
         self.speed = float(config.get("speed", 1.0))
         self.gain = config.get("gain")
 
         self.host = "api.siliconflow.cn"
         self.api_url = f"https://{self.host}/v1/audio/speech"
 
-    async def text_to_speak(self, text, output_file):
+    def _request(self, text, stream=False):
         request_json = {
             "model": self.model,
             "input": text,
             "voice": self.voice,
             "response_format": self.response_format,
         }
+        if self.sample_rate:
+            request_json["sample_rate"] = int(self.sample_rate)
         headers = {
             "Authorization": f"Bearer {self.access_token}",
             "Content-Type": "application/json",
         }
+        return requests.request(
+            "POST", self.api_url, json=request_json, headers=headers, stream=stream
+        )
+
+    async def text_to_speak(self, text, output_file):
         try:
-            response = requests.request(
-                "POST", self.api_url, json=request_json, headers=headers
-            )
+            response = self._request(text)
             data = response.content
             if output_file:
                 with open(output_file, "wb") as file_to_save:
@@ -43,3 +50,13 @@ class TTSProvider(TTSProviderBase):
                 return data
         except Exception as e:
             raise Exception(f"{__name__} error: {e}")
+
+    async def text_to_speak_stream(self, text):
+        with self._request(text, stream=True) as response:
+            if response.status_code != 200:
+                raise Exception(
+                    f"{__name__} error: {response.status_code} - {response.text}"
+                )
+            for chunk in response.iter_content(chunk_size=4096):
+                if chunk:
+                    yield chunk
@@ -0,0 +1,179 @@
+import os
+import threading
+import time
+
+from config.logger import setup_logging
+from core.utils import p3
+from core.utils.metrics import metrics
+from core.utils.util import audio_to_data
+
+TAG = __name__
+logger = setup_logging()
+
+AUDIO_EXTENSIONS = (".wav", ".mp3", ".p3", ".ogg", ".opus", ".flac", ".m4a")
+
+
+class _Asset:
+    __slots__ = ("path", "mtime", "size", "frames", "duration")
+
+    def __init__(self, path, mtime, size, frames, duration):
+        self.path = path
+        self.mtime = mtime
+        self.size = size
+        self.frames = frames
+        self.duration = duration
+
+
+class AudioAssetLibrary:
+    """
+    预加载的音频素材库：启动时把素材目录下的音频全部编码为Opus帧放在内存中，
+    后台线程定期检查文件变化并重新加载。素材既可以用名称（相对目录的路径，不含扩展名，
+    如 bind_code/3）获取，也可以直接用文件路径获取，未加载过的文件在首次使用时加载。
+    """
+
+    def __init__(self):
+        self.dirs = ["config/assets"]
+        self.watch_interval = 5
+        self._by_name = {}
+        self._by_path = {}
+        self._lock = threading.Lock()
+        self._watcher = None
+        self.stats = {"hits": 0, "loads": 0, "misses": 0}
+        metrics.register_collector("audio_assets", self.snapshot)
+
+    def configure(self, config):
+        """根据audio_assets配置加载素材，并启动文件变化检查"""
+        config = config or {}
+        self.dirs = ["config/assets"] + list(config.get("extra_dirs") or [])
+        self.watch_interval = float(config.get("watch_interval", 5))
+        started = time.monotonic()
+        count = self.scan()
+        logger.bind(tag=TAG).info(
+            f"音频素材已加载: {count}个, 耗时{time.monotonic() - started:.2f}s"
+        )
+        if self.watch_interval > 0 and self._watcher is None:
+            self._watcher = threading.Thread(target=self._watch_loop, daemon=True)
+            self._watcher.start()
+
+    @staticmethod
+    def _normalize(path):
+        return os.path.normcase(os.path.abspath(path))
+
+    def _load(self, path):
+        """解码音频文件为Opus帧"""
+        stat = os.stat(path)
+        if path.endswith(".p3"):
+            frames, duration = p3.decode_opus_from_file(path)
+        else:
+            frames, duration = audio_to_data(path)
+        self.stats["loads"] += 1
+        return _Asset(path, stat.st_mtime, stat.st_size, frames, duration)
+
+    def _iter_files(self):
+        for base in self.dirs:
+            if not os.path.isdir(base):
+                continue
+            for root, _, names in os.walk(base):
+                for file_name in names:
+                    if file_name.lower().endswith(AUDIO_EXTENSIONS):
+                        path = os.path.join(root, file_name)
+                        name = os.path.splitext(os.path.relpath(path, base))[0]
+                        yield name.replace(os.sep, "/"), path
+
+    def scan(self):
+        """扫描素材目录，加载新增或已变化的文件，返回素材数量"""
+        for name, path in self._iter_files():
+            key = self._normalize(path)
+            asset = self._by_path.get(key)
+            if asset is None or self._changed(asset):
+                asset = self._try_load(path)
+                if asset is None:
+                    continue
+            with self._lock:
+                self._by_path[key] = asset
+                # 多个目录有同名素材时，以先配置的目录为准
+                self._by_name.setdefault(name, key)
+        return len(self._by_name)
+
+    def _try_load(self, path):
+        try:
+            return self._load(path)
+        except Exception as e:
+            logger.bind(tag=TAG).error(f"加载音频素材失败: {path}, {e}")
+            return None
+
+    @staticmethod
+    def _changed(asset):
+        try:
+            stat = os.stat(asset.path)
+        except OSError:
+            return False
+        return stat.st_mtime != asset.mtime or stat.st_size != asset.size
+
+    def _refresh(self):
+        """重新加载已变化的文件，并加入新增的文件"""
+        for key, asset in list(self._by_path.items()):
+            if self._changed(asset):
+                reloaded = self._try_load(asset.path)
+                if reloaded is not None:
+                    logger.bind(tag=TAG).info(f"音频素材已更新: {asset.path}")
+                    with self._lock:
+                        self._by_path[key] = reloaded
+        self.scan()
+
+    def _watch_loop(self):
+        while True:
+            time.sleep(self.watch_interval)
+            try:
+                self._refresh()
+            except Exception as e:
+                logger.bind(tag=TAG).error(f"检查音频素材变化失败: {e}")
+
+    def get(self, name):
+        """按名称或文件路径获取Opus帧列表，文件不存在或解码失败时返回空列表"""
+        with self._lock:
+            key = self._by_name.get(name) or self._normalize(name)
+            asset = self._by_path.get(key)
+        if asset is not None and not self._changed(asset):
+            self.stats["hits"] += 1
+            return asset.frames
+        # 素材目录之外的文件（如唤醒词回复）首次使用时加载，文件有变化时重新加载
+        path = asset.path if asset is not None else self._resolve(name)
+        if path is None:
+            self.stats["misses"] += 1
+            logger.bind(tag=TAG).warning(f"音频素材不存在: {name}")
+            return []
+        asset = self._try_load(path)
+        if asset is None:
+            self.stats["misses"] += 1
+            return []
+        with self._lock:
+            self._by_path[key] = asset
+        return asset.frames
+
+    def _resolve(self, name):
+        """把名称或路径解析为实际文件路径"""
+        if os.path.isfile(name):
+            return name
+        for base in self.dirs:
+            for extension in AUDIO_EXTENSIONS:
+                path = os.path.join(base, name + extension)
+                if os.path.isfile(path):
+                    return path
+        return None
+
+    def enqueue(self, conn, name, sentence_type, text=None):
+        """把素材放入连接的播放队列"""
+        conn.tts.tts_audio_queue.put((sentence_type, self.get(name), text))
+
+    def snapshot(self):
+        with self._lock:
+            assets = list(self._by_path.values())
+        result = dict(self.stats)
+        result["assets"] = len(assets)
+        result["bytes"] = sum(sum(len(frame) for frame in a.frames) for a in assets)
+        return result
+
+
+# 全局音频素材库
+audio_assets = AudioAssetLibrary()
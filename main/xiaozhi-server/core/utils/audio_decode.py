@@ -0,0 +1,447 @@
+"""
+进程内音频解码与重采样，输出16kHz/单声道/16位PCM。
+WAV和裸PCM直接解析，MP3优先使用miniaudio在进程内解码，其余格式或解码失败时回退到ffmpeg(pydub)。
+"""
+
+import struct
+from functools import lru_cache
+from io import BytesIO
+from math import gcd
+
+import numpy as np
+
+from config.logger import setup_logging
+
+TAG = __name__
+logger = setup_logging()
+
+TARGET_SAMPLE_RATE = 16000
+
+try:
+    import miniaudio
+except ImportError:  # 未安装时MP3回退到ffmpeg解码
+    miniaudio = None
+
+_WAVE_FORMAT_PCM = 0x0001
+_WAVE_FORMAT_IEEE_FLOAT = 0x0003
+_WAVE_FORMAT_EXTENSIBLE = 0xFFFE
+
+
+@lru_cache(maxsize=32)
+def _polyphase_filter(up, down, half_taps=10, beta=5.0):
+    """设计抗混叠低通滤波器，并拆分为up个相位的多相矩阵"""
+    max_rate = max(up, down)
+    length = 2 * half_taps * max_rate + 1
+    n = np.arange(length) - (length - 1) / 2
+    cutoff = 1.0 / max_rate
+    h = cutoff * np.sinc(cutoff * n) * np.kaiser(length, beta) * up
+    taps_per_phase = -(-length // up)
+    padded = np.zeros(taps_per_phase * up)
+    padded[:length] = h
+    # phases[p, k] = h[p + k * up]
+    phases = padded.reshape(taps_per_phase, up).T.copy()
+    return phases, (length - 1) // 2
+
+
+def resample_poly(samples, orig_rate, target_rate=TARGET_SAMPLE_RATE):
+    """多相滤波重采样，输入输出均为float数组"""
+    if orig_rate == target_rate or len(samples) == 0:
+        return samples
+    divisor = gcd(int(orig_rate), int(target_rate))
+    up = int(target_rate) // divisor
+    down = int(orig_rate) // divisor
+    phases, delay = _polyphase_filter(up, down)
+    taps = phases.shape[1]
+
+    out_len = -(-len(samples) * up // down)
+    positions = np.arange(out_len, dtype=np.int64) * down + delay
+    phase = positions % up
+    base = positions // up
+
+    padded = np.concatenate(
+        (np.zeros(taps, dtype=np.float32), samples.astype(np.float32), np.zeros(taps + 1, dtype=np.float32))
+    )
+    # 每个输出样本取对应相位的taps个输入样本做点积
+    index = base[:, None] - np.arange(taps)[None, :] + taps
+    np.clip(index, 0, len(padded) - 1, out=index)
+    return np.einsum("ij,ij->i", padded[index], phases[phase].astype(np.float32))
+
+
+def _to_pcm16(samples):
+    return np.clip(np.round(samples), -32768, 32767).astype("<i2").tobytes()
+
+
+def _finish(samples, sample_rate, channels):
+    """多声道混为单声道并重采样到16kHz，返回16位PCM字节"""
+    if channels > 1:
+        usable = len(samples) - len(samples) % channels
+        samples = samples[:usable].reshape(-1, channels).mean(axis=1)
+    if sample_rate != TARGET_SAMPLE_RATE:
+        samples = resample_poly(samples, sample_rate)
+    return _to_pcm16(samples)
+
+
+def decode_pcm(data, sample_rate=TARGET_SAMPLE_RATE, channels=1):
+    """解析16位小端裸PCM"""
+    usable = len(data) - len(data) % 2
+    if sample_rate == TARGET_SAMPLE_RATE and channels == 1:
+        return bytes(data[:usable])
+    samples = np.frombuffer(data[:usable], dtype="<i2").astype(np.float32)
+    return _finish(samples, sample_rate, channels)
+
+
+def _parse_wav_header(data):
+    """解析WAV头，返回(fmt, data块起始位置, data块长度)；数据不足时返回None，不是WAV时抛出ValueError"""
+    if len(data) < 12:
+        return None
+    if data[:4] != b"RIFF" or data[8:12] != b"WAVE":
+        raise ValueError("不是有效的WAV数据")
+    offset = 12
+    fmt = None
+    while offset + 8 <= len(data):
+        chunk_id = data[offset : offset + 4]
+        chunk_size = struct.unpack("<I", data[offset + 4 : offset + 8])[0]
+        body_start = offset + 8
+        if chunk_id == b"fmt ":
+            if body_start + chunk_size > len(data):
+                return None
+            fmt = struct.unpack("<HHIIHH", data[body_start : body_start + 16])
+            if fmt[0] == _WAVE_FORMAT_EXTENSIBLE and chunk_size >= 40:
+                # 扩展格式的实际编码在SubFormat GUID的前两个字节
+                sub_format = struct.unpack("<H", data[body_start + 24 : body_start + 26])[0]
+                fmt = (sub_format,) + fmt[1:]
+        elif chunk_id == b"data":
+            if fmt is None:
+                raise ValueError("WAV缺少fmt块")
+            return fmt, body_start, chunk_size
+        offset = body_start + chunk_size + (chunk_size & 1)
+    return None
+
+
+def decode_wav(data):
+    """解析WAV（PCM 8/16/24/32位或32位浮点），返回16kHz单声道PCM；不支持的格式抛出ValueError"""
+    header = _parse_wav_header(data)
+    if header is None:
+        raise ValueError("WAV缺少data块")
+    fmt, body_start, chunk_size = header
+    # 流式生成的WAV常把长度写成0或0xFFFFFFFF，此时取到数据末尾
+    end = body_start + chunk_size
+    if chunk_size == 0 or end > len(data):
+        end = len(data)
+    payload = data[body_start:end]
+    format_tag, channels, sample_rate, _, _, bits = fmt
+    if format_tag == _WAVE_FORMAT_PCM and bits == 16:
+        return decode_pcm(payload, sample_rate, channels)
+    return _finish(_wav_to_float(payload, fmt), sample_rate, channels)
+
+
+def _wav_to_float(payload, fmt):
+    """将WAV样本数据转换为16位幅度范围的float数组（多声道交错）"""
+    format_tag, _, _, _, block_align, bits = fmt
+    width = bits // 8
+    usable = len(payload) - len(payload) % max(block_align, 1)
+    payload = payload[:usable]
+    if format_tag == _WAVE_FORMAT_PCM and bits == 16:
+        return np.frombuffer(payload, dtype="<i2").astype(np.float32)
+    if format_tag == _WAVE_FORMAT_PCM and bits == 8:
+        return (np.frombuffer(payload, dtype=np.uint8).astype(np.float32) - 128) * 256
+    if format_tag == _WAVE_FORMAT_PCM and bits == 24:
+        raw = np.frombuffer(payload, dtype=np.uint8).reshape(-1, 3).astype(np.int32)
+        value = raw[:, 0] | (raw[:, 1] << 8) | (raw[:, 2] << 16)
+        value = np.where(value & 0x800000, value - 0x1000000, value)
+        return value.astype(np.float32) / 256
+    if format_tag == _WAVE_FORMAT_PCM and bits == 32:
+        return np.frombuffer(payload, dtype="<i4").astype(np.float32) / 65536
+    if format_tag == _WAVE_FORMAT_IEEE_FLOAT and width == 4:
+        return np.frombuffer(payload, dtype="<f4") * 32767
+    raise ValueError(f"不支持的WAV编码: format={format_tag}, bits={bits}")
+
+
+def decode_mp3(data):
+    """使用miniaudio在进程内解码MP3，未安装miniaudio时抛出ValueError"""
+    if miniaudio is None:
+        raise ValueError("未安装miniaudio")
+    decoded = miniaudio.mp3_read_s16(data)
+    samples = np.frombuffer(decoded.samples, dtype=np.int16).astype(np.float32)
+    return _finish(samples, decoded.sample_rate, decoded.nchannels)
+
+
+def decode_with_ffmpeg(source, file_type):
+    """使用pydub(ffmpeg)解码，source为文件路径或二进制数据"""
+    from pydub import AudioSegment
+
+    if isinstance(source, (bytes, bytearray, memoryview)):
+        source = BytesIO(bytes(source))
+    # -nostdin 参数：不要从标准输入读取数据，否则FFmpeg会阻塞
+    audio = AudioSegment.from_file(
+        source, format=file_type or None, parameters=["-nostdin"]
+    )
+    # 转换为单声道/16kHz采样率/16位小端编码（确保与编码器匹配）
+    audio = audio.set_channels(1).set_frame_rate(TARGET_SAMPLE_RATE).set_sample_width(2)
+    return audio.raw_data
+
+
+def decode_audio_bytes(data, file_type, sample_rate=None, channels=1):
+    """将音频二进制数据解码为16kHz单声道16位PCM"""
+    file_type = (file_type or "").lower().lstrip(".")
+    try:
+        if file_type == "pcm":
+            return decode_pcm(data, sample_rate or TARGET_SAMPLE_RATE, channels)
+        if file_type == "wav" or data[:4] == b"RIFF":
+            return decode_wav(data)
+        if file_type == "mp3" and miniaudio is not None:
+            return decode_mp3(data)
+    except Exception as e:
+        logger.bind(tag=TAG).debug(f"进程内解码失败，回退到ffmpeg: {e}")
+    return decode_with_ffmpeg(data, file_type)
+
+
+def decode_audio_file(file_path, file_type=None):
+    """将音频文件解码为16kHz单声道16位PCM"""
+    if file_type is None:
+        file_type = file_path.rsplit(".", 1)[-1] if "." in file_path else ""
+    file_type = file_type.lower()
+    if file_type in ("wav", "mp3", "pcm"):
+        with open(file_path, "rb") as f:
+            return decode_audio_bytes(f.read(), file_type)
+    return decode_with_ffmpeg(file_path, file_type)
+
+
+class StreamingResampler:
+    """流式多相重采样，保留滤波器所需的历史样本，分块输入与一次性重采样结果一致"""
+
+    def __init__(self, orig_rate, target_rate=TARGET_SAMPLE_RATE):
+        divisor = gcd(int(orig_rate), int(target_rate))
+        self.up = int(target_rate) // divisor
+        self.down = int(orig_rate) // divisor
+        self.passthrough = self.up == self.down
+        self.phases, self.delay = _polyphase_filter(self.up, self.down)
+        self.phases = self.phases.astype(np.float32)
+        self.taps = self.phases.shape[1]
+        # 缓冲区开头补taps个0，_start为缓冲区第一个样本对应的输入下标
+        self._buffer = np.zeros(self.taps, dtype=np.float32)
+        self._start = -self.taps
+        self._total = 0
+        self._next = 0
+
+    def _produce(self, available, limit=None):
+        """计算输入下标小于available的所有可输出样本"""
+        # 第n个输出需要的最大输入下标为 (n * down + delay) // up
+        count = (available * self.up - self.delay - 1) // self.down + 1 - self._next
+        if limit is not None:
+            count = min(count, limit - self._next)
+        if count <= 0:
+            return np.zeros(0, dtype=np.float32)
+        positions = np.arange(self._next, self._next + count, dtype=np.int64) * self.down
+        positions += self.delay
+        base = positions // self.up
+        index = base[:, None] - np.arange(self.taps)[None, :] - self._start
+        out = np.einsum(
+            "ij,ij->i", self._buffer[index], self.phases[positions % self.up]
+        )
+        self._next += count
+        # 丢弃后续输出不再需要的历史样本
+        keep_from = (self._next * self.down + self.delay) // self.up - self.taps
+        drop = max(0, keep_from - self._start)
+        if drop:
+            self._buffer = self._buffer[drop:]
+            self._start += drop
+        return out
+
+    def process(self, samples):
+        if self.passthrough:
+            return samples
+        self._buffer = np.concatenate((self._buffer, samples.astype(np.float32)))
+        self._total += len(samples)
+        return self._produce(self._total)
+
+    def flush(self):
+        if self.passthrough:
+            return np.zeros(0, dtype=np.float32)
+        out_len = -(-self._total * self.up // self.down)
+        self._buffer = np.concatenate(
+            (self._buffer, np.zeros(self.taps + 1, dtype=np.float32))
+        )
+        return self._produce(self._total + self.taps + 1, limit=out_len)
+
+
+_MP3_BITRATES = {
+    3: (0, 32, 40, 48, 56, 64, 80, 96, 112, 128, 160, 192, 224, 256, 320),
+    2: (0, 8, 16, 24, 32, 40, 48, 56, 64, 80, 96, 112, 128, 144, 160),
+}
+_MP3_SAMPLE_RATES = {
+    3: (44100, 48000, 32000),
+    2: (22050, 24000, 16000),
+    0: (11025, 12000, 8000),
+}
+# 比特池(main_data_begin)最多回溯511字节，续解码时需要带上足够的前序帧
+_MP3_RESERVOIR_BYTES = 512
+
+
+def _mp3_frame_length(data, offset):
+    """解析Layer III帧头，返回(帧长度, 每帧样本数)，不是有效帧头时返回None"""
+    if data[offset] != 0xFF or data[offset + 1] & 0xE0 != 0xE0:
+        return None
+    version = (data[offset + 1] >> 3) & 0x03
+    layer = (data[offset + 1] >> 1) & 0x03
+    bitrate_index = data[offset + 2] >> 4
+    rate_index = (data[offset + 2] >> 2) & 0x03
+    if version == 1 or layer != 1 or bitrate_index in (0, 15) or rate_index == 3:
+        return None
+    padding = (data[offset + 2] >> 1) & 0x01
+    bitrate = _MP3_BITRATES[3 if version == 3 else 2][bitrate_index] * 1000
+    sample_rate = _MP3_SAMPLE_RATES[version][rate_index]
+    if version == 3:
+        return 144 * bitrate // sample_rate + padding, 1152
+    return 72 * bitrate // sample_rate + padding, 576
+
+
+class StreamingDecoder:
+    """
+    增量解码：边接收音频数据边输出16kHz单声道16位PCM。
+    pcm/wav直接解析，mp3按完整帧用miniaudio续解码，其余格式缓存到结束时一次性解码。
+    """
+
+    def __init__(self, file_type, sample_rate=None, channels=1):
+        self.file_type = (file_type or "").lower().lstrip(".")
+        self.sample_rate = sample_rate or TARGET_SAMPLE_RATE
+        self.channels = channels
+        self._pending = bytearray()
+        self._resampler = None
+        self._wav_fmt = None
+        self._mp3_prime = []
+        self._mp3_started = False
+        if self.file_type == "pcm":
+            self.mode = "pcm"
+        elif self.file_type == "wav":
+            self.mode = "wav"
+        elif self.file_type == "mp3" and miniaudio is not None:
+            self.mode = "mp3"
+        else:
+            self.mode = "buffer"
+
+    def feed(self, data):
+        """输入一段音频数据，返回已能解码的PCM"""
+        if not data:
+            return b""
+        self._pending += data
+        try:
+            if self.mode == "pcm":
+                return self._feed_pcm()
+            if self.mode == "wav":
+                return self._feed_wav()
+            if self.mode == "mp3":
+                return self._feed_mp3()
+        except Exception as e:
+            if self._resampler is not None or self._mp3_started:
+                raise
+            logger.bind(tag=TAG).debug(f"增量解码失败，改为整体解码: {e}")
+            self.mode = "buffer"
+        return b""
+
+    def flush(self):
+        """输入结束，返回剩余的PCM"""
+        if self.mode == "buffer":
+            data, self._pending = bytes(self._pending), bytearray()
+            if not data:
+                return b""
+            return decode_audio_bytes(data, self.file_type, self.sample_rate, self.channels)
+        if self.mode == "mp3":
+            pcm = self._decode_mp3_frames(self._split_mp3_frames())
+        elif self.mode == "wav" and self._wav_fmt is None:
+            # 只收到WAV头时没有可播放的数据
+            return b""
+        else:
+            pcm = b""
+        if self._resampler is None:
+            return pcm
+        return pcm + _to_pcm16(self._resampler.flush())
+
+    def _emit(self, samples, sample_rate, channels):
+        if channels > 1:
+            usable = len(samples) - len(samples) % channels
+            samples = samples[:usable].reshape(-1, channels).mean(axis=1)
+        if self._resampler is None:
+            self._resampler = StreamingResampler(sample_rate)
+        return _to_pcm16(self._resampler.process(samples))
+
+    def _take(self, block):
+        usable = len(self._pending) - len(self._pending) % block
+        data = bytes(self._pending[:usable])
+        del self._pending[:usable]
+        return data
+
+    def _feed_pcm(self):
+        data = self._take(2 * self.channels)
+        if self.sample_rate == TARGET_SAMPLE_RATE and self.channels == 1:
+            return data
+        samples = np.frombuffer(data, dtype="<i2").astype(np.float32)
+        return self._emit(samples, self.sample_rate, self.channels)
+
+    def _feed_wav(self):
+        if self._wav_fmt is None:
+            header = _parse_wav_header(self._pending)
+            if header is None:
+                return b""
+            self._wav_fmt, body_start, _ = header
+            del self._pending[:body_start]
+        format_tag, channels, sample_rate, _, block_align, bits = self._wav_fmt
+        data = self._take(max(block_align, 1))
+        if format_tag == _WAVE_FORMAT_PCM and bits == 16:
+            if sample_rate == TARGET_SAMPLE_RATE and channels == 1:
+                return data
+        return self._emit(_wav_to_float(data, self._wav_fmt), sample_rate, channels)
+
+    def _split_mp3_frames(self):
+        """从缓冲区中取出所有完整的MP3帧"""
+        data = self._pending
+        offset = 0
+        frames = []
+        while offset + 4 <= len(data):
+            if data[offset : offset + 3] == b"ID3":
+                if offset + 10 > len(data):
+                    break
+                size = 0
+                for value in data[offset + 6 : offset + 10]:
+                    size = (size << 7) | (value & 0x7F)
+                tag_length = 10 + size + (10 if data[offset + 5] & 0x10 else 0)
+                if offset + tag_length > len(data):
+                    break
+                offset += tag_length
+                continue
+            frame = _mp3_frame_length(data, offset)
+            if frame is None:
+                offset += 1
+                continue
+            length, frame_samples = frame
+            if offset + length > len(data):
+                break
+            frames.append((bytes(data[offset : offset + length]), frame_samples))
+            offset += length
+        del self._pending[:offset]
+        return frames
+
+    def _feed_mp3(self):
+        return self._decode_mp3_frames(self._split_mp3_frames())
+
+    def _decode_mp3_frames(self, frames):
+        if not frames:
+            return b""
+        prime = b"".join(frame for frame, _ in self._mp3_prime)
+        decoded = miniaudio.mp3_read_s16(prime + b"".join(frame for frame, _ in frames))
+        self._mp3_started = True
+        samples = np.frombuffer(decoded.samples, dtype=np.int16)
+        # 前序帧只用于恢复比特池和重叠相加状态，输出时丢弃
+        new_samples = sum(count for _, count in frames) * decoded.nchannels
+        samples = samples[-new_samples:] if len(samples) > new_samples else samples
+
+        self._mp3_prime.extend(frames)
+        while (
+            len(self._mp3_prime) > 1
+            and sum(len(frame) for frame, _ in self._mp3_prime[1:])
+            >= _MP3_RESERVOIR_BYTES + len(self._mp3_prime[-1][0])
+        ):
+            self._mp3_prime.pop(0)
+        return self._emit(
+            samples.astype(np.float32), decoded.sample_rate, decoded.nchannels
+        )
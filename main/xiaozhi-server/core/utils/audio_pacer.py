@@ -0,0 +1,331 @@
+import asyncio
+import time
+
+from config.logger import setup_logging
+from core.utils import turn_trace
+from core.utils.llm_latency import LatencyTracker
+from core.utils.metrics import metrics
+
+TAG = __name__
+logger = setup_logging()
+
+FRAME_DURATION = 0.06  # 帧时长（秒），匹配 Opus 编码
+# 打断后观察这么久，确认没有再发出音频帧再记录打断耗时
+ABORT_SETTLE = 0.5
+
+
+def pack_frames(frames):
+    """多帧打包格式：每帧前加2字节大端长度，依次拼接"""
+    return b"".join(len(frame).to_bytes(2, "big") + frame for frame in frames)
+
+
+class _Stream:
+    """一段正在播放的音频：frames为剩余帧的迭代器，第position帧应在start + position * 60ms发送"""
+
+    __slots__ = (
+        "conn",
+        "link",
+        "frames",
+        "remaining",
+        "start",
+        "position",
+        "future",
+        "lead",
+        "slack",
+        "underrun",
+    )
+
+    def __init__(self, conn, link, frames, remaining, start, future, lead, slack):
+        self.conn = conn
+        self.link = link
+        self.frames = frames
+        self.remaining = remaining
+        self.start = start
+        self.position = 0
+        self.future = future
+        # 发送提前量，以及设备已缓冲的时长（超过这个时间还没发出的帧会导致断流）
+        self.lead = lead
+        self.slack = slack
+        self.underrun = False
+
+    def finish(self, error=None):
+        if self.future.done():
+            return
+        if error is None:
+            self.future.set_result(None)
+        else:
+            self.future.set_exception(error)
+
+
+class AudioPacer:
+    """
+    全局音频节拍器：所有连接的音频流共用一个定时循环，每个节拍把各流已到发送时间的帧一次发完，
+    不再为每一帧单独创建定时器。没有音频流时循环挂起，不产生唤醒。
+    """
+
+    def __init__(self):
+        self.tick = 0.02
+        self.lead = 0.02
+        self.pre_buffer_frames = 3
+        # 多帧打包时一条消息最多包含的帧数
+        self.max_packed_frames = 4
+        # 客户端发送缓冲区超过该字节数时暂停给它发送，避免阻塞其他连接
+        # （需小于websockets的write_limit，否则send会等待缓冲区排空）
+        self.max_write_buffer = 16 * 1024
+        # 从收到打断到最后一帧发出的目标耗时
+        self.abort_target = 0.1
+        self.abort_latency = LatencyTracker(window_size=500)
+        self._streams = []
+        self._wakeup = None
+        self._task = None
+        self._probes = set()
+        self.stats = {
+            "ticks": 0,
+            "frames": 0,
+            "messages": 0,
+            "late_frames": 0,
+            "underruns": 0,
+            "aborted": 0,
+            "aborts": 0,
+            "aborts_over_target": 0,
+        }
+        metrics.register_collector("audio_pacer", self.snapshot)
+
+    def configure(self, config):
+        """根据audio_pacer配置初始化"""
+        config = config or {}
+        self.tick = max(0.005, float(config.get("tick_ms", 20)) / 1000)
+        self.lead = max(0.0, float(config.get("lead_ms", 20)) / 1000)
+        self.pre_buffer_frames = int(config.get("pre_buffer_frames", 3))
+        self.max_packed_frames = int(config.get("max_packed_frames", 4))
+        self.abort_target = float(config.get("abort_target_ms", 100)) / 1000
+
+    def _ensure_running(self):
+        if self._task is None or self._task.done():
+            self._wakeup = asyncio.Event()
+            self._task = asyncio.get_running_loop().create_task(self._run())
+        self._wakeup.set()
+
+    async def play(self, conn, frames, pre_buffer=False):
+        """播放一段音频，全部发送完或被打断后返回"""
+        total = len(frames)
+        if total == 0 or conn.client_abort:
+            return
+        iterator = iter(frames)
+        link = getattr(conn, "link_estimator", None)
+        lead = self.lead
+        count = self.pre_buffer_frames if pre_buffer else 0
+        if link is not None:
+            link.device_id = conn.device_id
+            lead = link.lead(self.lead)
+            depth = link.pre_buffer_frames(self.pre_buffer_frames)
+            # 第一句按估计的深度预缓冲；后续句子只在链路比默认情况差时补发超出的部分
+            count = depth if pre_buffer else max(0, depth - self.pre_buffer_frames)
+        # 预缓冲的帧立即发送，让设备尽快开始播放
+        count = min(count, total)
+        if count:
+            frames = [next(iterator) for _ in range(count)]
+            await self._send_frames(conn, link, frames)
+        total -= count
+        if pre_buffer:
+            turn_trace.mark(conn, "first_audio_sent", once=True)
+        if total <= 0 or conn.client_abort:
+            return
+
+        loop = asyncio.get_running_loop()
+        stream = _Stream(
+            conn,
+            link,
+            iterator,
+            total,
+            loop.time(),
+            loop.create_future(),
+            lead,
+            count * FRAME_DURATION + lead,
+        )
+        self._streams.append(stream)
+        self._ensure_running()
+        try:
+            await stream.future
+        finally:
+            # 调用方被取消时，节拍循环在下一个节拍丢弃这个流
+            if not stream.future.done():
+                stream.future.cancel()
+
+    def abort(self, conn, started=None):
+        """
+        丢弃连接尚未发送的帧，正在等待的play立即返回。
+        started为收到打断的时间(time.monotonic)，稍后统计从打断到最后一帧发出的耗时
+        """
+        for stream in self._streams:
+            if stream.conn is conn and not stream.future.done():
+                self.stats["aborted"] += 1
+                stream.finish()
+        if started is not None:
+            stopped = time.monotonic()
+            asyncio.get_running_loop().call_later(
+                ABORT_SETTLE, self._record_abort, conn, started, stopped
+            )
+
+    def replace_remaining(self, conn, replace):
+        """
+        把连接正在播放的音频中尚未发送的帧替换为replace(剩余帧数)返回的帧（如淡出片段），
+        没有正在播放的音频时返回False
+        """
+        for stream in self._streams:
+            if stream.conn is conn and not stream.future.done():
+                frames = replace(stream.remaining)
+                stream.frames = iter(frames)
+                stream.remaining = len(frames)
+                if not frames:
+                    stream.finish()
+                return True
+        return False
+
+    def _record_abort(self, conn, started, stopped):
+        # 打断之后仍有帧发出时，以最后一帧的发送时间为准
+        last_sent = getattr(conn, "last_audio_sent_at", None) or 0
+        latency = max(stopped, last_sent) - started
+        self.abort_latency.record("abort", latency)
+        self.stats["aborts"] += 1
+        if latency > self.abort_target:
+            self.stats["aborts_over_target"] += 1
+            logger.bind(tag=TAG).warning(f"打断后{latency * 1000:.0f}ms才停止发送音频")
+
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+        next_tick = loop.time()
+        while True:
+            if not self._streams:
+                self._wakeup.clear()
+                await self._wakeup.wait()
+                next_tick = loop.time()
+            try:
+                await self._send_due(loop.time())
+            except Exception as e:
+                logger.bind(tag=TAG).error(f"音频节拍处理失败: {e}")
+            next_tick += self.tick
+            delay = next_tick - loop.time()
+            if delay < 0:
+                # 处理耗时超过一个节拍时不补偿，从当前时间重新计时
+                next_tick = loop.time()
+                delay = 0
+            await asyncio.sleep(delay)
+
+    @staticmethod
+    def _write_buffer_size(conn):
+        transport = getattr(conn.websocket, "transport", None)
+        if transport is None:
+            return 0
+        try:
+            return transport.get_write_buffer_size()
+        except Exception:
+            return 0
+
+    async def _send_due(self, now):
+        """发送各流到期的帧，处理过程中新加入的流留到下一个节拍"""
+        self.stats["ticks"] += 1
+        activity_time = time.time() * 1000
+        for stream in list(self._streams):
+            if stream.future.done():
+                continue
+            conn = stream.conn
+            if conn.client_abort:
+                self.stats["aborted"] += 1
+                stream.finish()
+                continue
+            backlog = self._write_buffer_size(conn)
+            link = stream.link
+            if link is not None:
+                link.record_backlog(backlog)
+                if now - link.last_probe > link.monitor.probe_interval:
+                    link.last_probe = now
+                    task = asyncio.create_task(link.probe(conn.websocket))
+                    self._probes.add(task)
+                    task.add_done_callback(self._probes.discard)
+            if backlog > self.max_write_buffer:
+                self._check_underrun(stream, now)
+                continue
+            try:
+                await self._send_stream(stream, now)
+            except Exception as e:
+                stream.finish(e)
+                continue
+            if stream.remaining <= 0:
+                stream.finish()
+            # 重置没有声音的状态
+            conn.last_activity_time = activity_time
+        self._streams = [
+            stream for stream in self._streams if not stream.future.done()
+        ]
+
+    def _check_underrun(self, stream, now):
+        """下一帧晚于设备缓冲可支撑的时间时记为一次断流，追上后才重新计数"""
+        late = now - (stream.start + stream.position * FRAME_DURATION)
+        if late > stream.slack:
+            if not stream.underrun:
+                stream.underrun = True
+                self.stats["underruns"] += 1
+                if stream.link is not None:
+                    stream.link.record_underrun()
+        else:
+            stream.underrun = False
+
+    async def _send_stream(self, stream, now):
+        horizon = now + stream.lead
+        frames = []
+        first = stream.position == 0
+        while stream.remaining > 0:
+            due = stream.start + stream.position * FRAME_DURATION
+            if due > horizon:
+                break
+            if now - due > self.tick:
+                self.stats["late_frames"] += 1
+            self._check_underrun(stream, now)
+            frames.append(next(stream.frames))
+            stream.position += 1
+            stream.remaining -= 1
+        if frames:
+            await self._send_frames(stream.conn, stream.link, frames)
+            if first:
+                turn_trace.mark(stream.conn, "first_audio_sent", once=True)
+
+    async def _send_frames(self, conn, link, frames):
+        """
+        发送一批帧：客户端协商了多帧打包时合并为一条消息，否则每帧一条消息。
+        发送过程中被打断时剩余的帧不再发送
+        """
+        websocket = conn.websocket
+        packing = getattr(conn, "audio_packing", 0)
+        if packing > 1 and len(frames) > 1:
+            for i in range(0, len(frames), packing):
+                if conn.client_abort:
+                    break
+                await websocket.send(pack_frames(frames[i : i + packing]))
+                self.stats["messages"] += 1
+        else:
+            for frame in frames:
+                if conn.client_abort:
+                    break
+                await websocket.send(
+                    pack_frames((frame,)) if packing > 1 else frame
+                )
+                self.stats["messages"] += 1
+        self.stats["frames"] += len(frames)
+        conn.last_audio_sent_at = time.monotonic()
+        if link is not None:
+            for frame in frames:
+                link.record_frame(len(frame))
+
+    def snapshot(self):
+        result = dict(self.stats)
+        result["streams"] = len(self._streams)
+        stats = self.abort_latency.snapshot().get("abort")
+        if stats:
+            result["abort_p50_ms"] = round(stats["p50"] * 1000, 1)
+            result["abort_p95_ms"] = round(stats["p95"] * 1000, 1)
+        return result
+
+
+# 全局音频节拍器，所有连接共享
+audio_pacer = AudioPacer()
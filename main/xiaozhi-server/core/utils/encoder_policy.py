@@ -0,0 +1,160 @@
+import asyncio
+import os
+import time
+from collections import deque
+
+from config.logger import setup_logging
+from core.utils.metrics import metrics
+from core.utils.opus_encoder_utils import encoder_pool
+
+TAG = __name__
+logger = setup_logging()
+
+DEFAULT_LEVELS = [
+    {"complexity": 6},
+    {"complexity": 3},
+    {"complexity": 1, "bitrate": 16000},
+]
+
+
+class EncoderPolicy:
+    """
+    按负载调整Opus编码参数：定期采样进程CPU占用和事件循环延迟，
+    持续过载时逐级降低编码复杂度（和码率），负载回落一段时间后逐级恢复。
+    第0级为opus_encoder中配置的参数，levels依次为更低的档位。
+    """
+
+    def __init__(self):
+        self.enabled = True
+        self.interval = 2.0
+        self.sample_interval = 0.1
+        # CPU占用为进程CPU时间占cpu_cores个核心的百分比。服务主要受GIL限制，
+        # 默认按单核计算，多个工作进程或大量释放GIL的原生计算时可以调大
+        self.cpu_cores = 1
+        self.cpu_high = 85.0
+        self.cpu_low = 50.0
+        self.lag_high = 0.1
+        self.lag_low = 0.02
+        # 连续多少次采样过载才降级、连续多少次空闲才升级
+        self.down_after = 2
+        self.up_after = 5
+        self.levels = list(DEFAULT_LEVELS)
+        self.level = 0
+        self.cpu_percent = 0.0
+        self.loop_lag = 0.0
+        self.transitions = 0
+        self.history = deque(maxlen=20)
+        self._high = 0
+        self._low = 0
+        self._task = None
+        metrics.register_collector("encoder_policy", self.snapshot)
+
+    def configure(self, config):
+        """根据encoder_policy配置初始化"""
+        config = config or {}
+        self.enabled = config.get("enabled", True)
+        self.interval = max(0.5, float(config.get("interval", 2)))
+        cpu_cores = config.get("cpu_cores", 1)
+        if cpu_cores == "all":
+            cpu_cores = os.cpu_count() or 1
+        self.cpu_cores = max(1, int(cpu_cores))
+        self.cpu_high = float(config.get("cpu_high", 85))
+        self.cpu_low = float(config.get("cpu_low", 50))
+        self.lag_high = float(config.get("lag_high_ms", 100)) / 1000
+        self.lag_low = float(config.get("lag_low_ms", 20)) / 1000
+        self.down_after = max(1, int(config.get("down_after", 2)))
+        self.up_after = max(1, int(config.get("up_after", 5)))
+        self.levels = list(config.get("levels") or DEFAULT_LEVELS)
+        self.level = 0
+
+    def start(self):
+        """在事件循环中启动负载采样任务"""
+        if not self.enabled or (self._task is not None and not self._task.done()):
+            return
+        self._task = asyncio.get_running_loop().create_task(self._run())
+
+    def params(self, level):
+        """返回某一级的(复杂度, 码率)，未配置的项沿用opus_encoder的配置"""
+        if level == 0:
+            return encoder_pool.base_complexity, encoder_pool.base_bitrate
+        params = self.levels[level - 1]
+        return (
+            int(params.get("complexity", encoder_pool.base_complexity)),
+            int(params.get("bitrate", encoder_pool.base_bitrate)),
+        )
+
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            cpu_start = time.process_time()
+            wall_start = loop.time()
+            # 多次短暂sleep，用实际唤醒的延迟估计事件循环的繁忙程度
+            lag = 0.0
+            samples = max(1, round(self.interval / self.sample_interval))
+            for _ in range(samples):
+                started = loop.time()
+                await asyncio.sleep(self.sample_interval)
+                lag += max(0.0, loop.time() - started - self.sample_interval)
+            wall = loop.time() - wall_start
+            cpu = time.process_time() - cpu_start
+            try:
+                self.update(cpu / wall * 100 / self.cpu_cores, lag / samples)
+            except Exception as e:
+                logger.bind(tag=TAG).error(f"调整编码参数失败: {e}")
+
+    def update(self, cpu_percent, loop_lag):
+        """根据一次采样结果决定是否调整档位"""
+        self.cpu_percent = cpu_percent
+        self.loop_lag = loop_lag
+        if cpu_percent >= self.cpu_high or loop_lag >= self.lag_high:
+            self._high += 1
+            self._low = 0
+        elif cpu_percent < self.cpu_low and loop_lag < self.lag_low:
+            self._low += 1
+            self._high = 0
+        else:
+            self._high = self._low = 0
+
+        if self._high >= self.down_after and self.level < len(self.levels):
+            self._set_level(self.level + 1)
+        elif self._low >= self.up_after and self.level > 0:
+            self._set_level(self.level - 1)
+
+    def _set_level(self, level):
+        previous = self.level
+        complexity, bitrate = self.params(level)
+        encoder_pool.set_params(complexity, bitrate)
+        self.level = level
+        self.transitions += 1
+        self._high = self._low = 0
+        self.history.append(
+            {
+                "time": round(time.time()),
+                "from": previous,
+                "to": level,
+                "complexity": complexity,
+                "bitrate": bitrate,
+                "cpu_percent": round(self.cpu_percent, 1),
+                "loop_lag_ms": round(self.loop_lag * 1000, 1),
+            }
+        )
+        logger.bind(tag=TAG).info(
+            f"编码档位 {previous} -> {level}：复杂度{complexity}，码率{bitrate}，"
+            f"CPU {self.cpu_percent:.1f}%，事件循环延迟{self.loop_lag * 1000:.1f}ms"
+        )
+
+    def snapshot(self):
+        return {
+            "enabled": self.enabled,
+            "level": self.level,
+            "complexity": encoder_pool.complexity,
+            "bitrate": encoder_pool.bitrate,
+            "cpu_percent": round(self.cpu_percent, 1),
+            "loop_lag_ms": round(self.loop_lag * 1000, 1),
+            "transitions": self.transitions,
+            "history": list(self.history),
+        }
+
+
+# 全局编码参数调整策略
+encoder_policy = EncoderPolicy()
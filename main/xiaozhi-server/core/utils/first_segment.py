@@ -0,0 +1,84 @@
+import math
+import threading
+
+from config.logger import setup_logging
+from core.utils.metrics import metrics
+
+TAG = __name__
+logger = setup_logging()
+
+
+class FirstSegmentPolicy:
+    """
+    首段切分策略：根据实测的LLM输出速度（字/秒）和各TTS的首包耗时，计算第一段的最少字数和强制切分的字数预算。
+    第一段播放时长需要覆盖下一段的合成耗时，否则句间会卡顿，因此最少字数约为 TTS首包耗时 × 播放语速；
+    为等待自然标点最多只额外等待max_wait秒，因此字数预算约为 LLM输出速度 × max_wait。
+    """
+
+    def __init__(self):
+        self.enabled = True
+        self.min_chars = 4
+        self.max_chars = 30
+        self.speech_rate = 4.5
+        self.max_wait = 0.8
+        self.alpha = 0.2
+        self.llm_char_rate = 20.0
+        self.default_tts_latency = 0.5
+        self._tts_latency = {}
+        self._lock = threading.Lock()
+        metrics.register_collector("first_segment", self.snapshot)
+
+    def configure(self, config):
+        """根据first_segment配置初始化"""
+        config = config or {}
+        self.enabled = config.get("enabled", True)
+        self.min_chars = int(config.get("min_chars", 4))
+        self.max_chars = int(config.get("max_chars", 30))
+        self.speech_rate = float(config.get("speech_rate", 4.5))
+        self.max_wait = float(config.get("max_wait", 0.8))
+
+    def _ema(self, previous, value):
+        if previous is None:
+            return value
+        return previous * (1 - self.alpha) + value * self.alpha
+
+    def record_llm_rate(self, chars, seconds):
+        """记录一轮LLM输出的字数和耗时（从第一个字到最后一个字）"""
+        if chars < 10 or seconds < 0.2:
+            return
+        with self._lock:
+            self.llm_char_rate = self._ema(self.llm_char_rate, chars / seconds)
+
+    def record_tts_latency(self, provider, seconds):
+        """记录TTS从收到文本到产生第一帧音频的耗时"""
+        if seconds is None or seconds < 0:
+            return
+        with self._lock:
+            self._tts_latency[provider] = self._ema(
+                self._tts_latency.get(provider), seconds
+            )
+
+    def limits(self, provider):
+        """返回(最少字数, 强制切分字数)，未启用时返回(0, 0)"""
+        if not self.enabled:
+            return 0, 0
+        with self._lock:
+            latency = self._tts_latency.get(provider, self.default_tts_latency)
+            char_rate = self.llm_char_rate
+        min_chars = min(
+            self.max_chars,
+            max(self.min_chars, math.ceil(latency * self.speech_rate)),
+        )
+        budget = min(self.max_chars, max(min_chars, round(char_rate * self.max_wait)))
+        return min_chars, budget
+
+    def snapshot(self):
+        with self._lock:
+            result = {"llm_char_rate": round(self.llm_char_rate, 1)}
+            for provider, latency in self._tts_latency.items():
+                result[f"{provider}_tts_latency_ms"] = round(latency * 1000, 1)
+        return result
+
+
+# 全局首段切分策略，所有连接共享统计
+first_segment_policy = FirstSegmentPolicy()
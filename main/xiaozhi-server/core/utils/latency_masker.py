@@ -0,0 +1,228 @@
+import asyncio
+import random
+import threading
+from bisect import bisect_right
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+import opuslib_next
+
+from config.logger import setup_logging
+from core.utils import turn_trace
+from core.utils.audio_pacer import audio_pacer
+from core.utils.llm_latency import ttft_tracker
+from core.utils.metrics import metrics
+from core.utils.util import pcm_to_data
+from core.utils.wakeup_responses import create_tts, synthesize, voice_of
+
+TAG = __name__
+logger = setup_logging()
+
+FRAME_SIZE = 960  # 60ms @ 16kHz
+DEFAULT_FILLERS = ["嗯，我想想", "稍等一下哦", "让我看看"]
+
+
+class _Filler:
+    """一句预先编码的语气词：frames为完整音频，tails[i]为从第i帧开始淡出的几帧"""
+
+    __slots__ = ("text", "frames", "tails")
+
+    def __init__(self, text, frames, tails):
+        self.text = text
+        self.frames = frames
+        self.tails = tails
+
+    def tail(self, remaining):
+        """还剩remaining帧未发送时，改为发送的淡出帧"""
+        index = len(self.frames) - remaining
+        if index >= len(self.tails):
+            return []
+        return self.tails[index]
+
+
+class _Turn:
+    __slots__ = ("handle", "task", "filler")
+
+    def __init__(self):
+        self.handle = None
+        self.task = None
+        self.filler = None
+
+
+class LatencyMasker:
+    """
+    首token较慢时（工具调用、推理模型）用语气词填补设备的静默：对话开始后超过阈值仍没有TTS音频，
+    就从内存中的语气词里挑一句（避开上一次用过的）播放，真正的音频到达时语气词在几帧内淡出后再接上。
+    阈值按当前LLM的首token耗时分布计算：从min_delay开始找最早的时刻，
+    使得耗时已超过该时刻的样本中，至少confidence比例还要再等min_gain以上，确保播放语气词是值得的。
+    """
+
+    def __init__(self):
+        self.enabled = False
+        self.fillers = list(DEFAULT_FILLERS)
+        self.min_delay = 1.0
+        self.max_delay = 3.0
+        self.default_delay = 1.5
+        self.min_gain = 0.8
+        self.confidence = 0.6
+        self.min_samples = 20
+        self.fade_frames = 2
+        self._pools = {}
+        self._pending = set()
+        self._lock = threading.Lock()
+        self._executor = ThreadPoolExecutor(
+            max_workers=1, thread_name_prefix="latency-masker"
+        )
+        self.stats = {"turns": 0, "triggered": 0, "faded": 0, "stopped": 0}
+        metrics.register_collector("latency_masker", self.snapshot)
+
+    def configure(self, config):
+        """根据latency_masker配置初始化"""
+        config = config or {}
+        self.enabled = bool(config.get("enabled", False))
+        self.fillers = list(config.get("fillers") or DEFAULT_FILLERS)
+        self.min_delay = float(config.get("min_delay_ms", 1000)) / 1000
+        self.max_delay = max(
+            self.min_delay, float(config.get("max_delay_ms", 3000)) / 1000
+        )
+        self.default_delay = float(config.get("default_delay_ms", 1500)) / 1000
+        self.min_gain = float(config.get("min_gain_ms", 800)) / 1000
+        self.confidence = float(config.get("confidence", 0.6))
+        self.min_samples = int(config.get("min_samples", 20))
+        self.fade_frames = max(1, int(config.get("fade_frames", 2)))
+
+    def threshold(self, provider):
+        """对话开始后等待多久仍没有音频就播放语气词"""
+        samples = ttft_tracker.samples(provider)
+        if len(samples) < self.min_samples:
+            return self.default_delay
+        delay = self.min_delay
+        while delay <= self.max_delay:
+            slower = len(samples) - bisect_right(samples, delay)
+            if slower == 0:
+                # 该LLM从没慢到这个程度，只在异常卡顿时播放
+                break
+            waiting = len(samples) - bisect_right(samples, delay + self.min_gain)
+            if waiting / slower >= self.confidence:
+                return delay
+            delay += 0.1
+        return self.max_delay
+
+    def ensure(self, conn):
+        """在后台为连接的音色合成语气词"""
+        if not self.enabled or conn.tts is None:
+            return
+        voice = voice_of(conn.tts)
+        with self._lock:
+            if voice in self._pools or voice in self._pending:
+                return
+            self._pending.add(voice)
+        # 只传配置，合成用专用的TTS实例，不使用连接的conn.tts
+        self._executor.submit(self._build_pool, conn.config, voice)
+
+    def _build_pool(self, config, voice):
+        pool = []
+        try:
+            tts = create_tts(config)
+            for text in self.fillers:
+                try:
+                    frames = synthesize(tts, text)
+                except Exception as e:
+                    logger.bind(tag=TAG).warning(f"合成语气词失败: {text}, {e}")
+                    continue
+                pool.append(self._prepare(text, frames))
+            if pool:
+                self._pools[voice] = pool
+                logger.bind(tag=TAG).info(f"语气词已合成: {voice}, {len(pool)}句")
+        except Exception as e:
+            logger.bind(tag=TAG).warning(f"合成语气词失败: {voice}, {e}")
+        finally:
+            with self._lock:
+                self._pending.discard(voice)
+
+    def _prepare(self, text, frames):
+        """预先编码从每一帧开始的淡出片段，播放时无需再编码"""
+        decoder = opuslib_next.Decoder(16000, 1)
+        pcm = np.frombuffer(
+            b"".join(decoder.decode(frame, FRAME_SIZE) for frame in frames),
+            dtype=np.int16,
+        )
+        fade_length = self.fade_frames * FRAME_SIZE
+        tails = []
+        for index in range(len(frames)):
+            chunk = pcm[index * FRAME_SIZE : index * FRAME_SIZE + fade_length]
+            gain = np.linspace(1.0, 0.0, len(chunk), dtype=np.float32)
+            faded = (chunk.astype(np.float32) * gain).astype(np.int16)
+            tails.append(pcm_to_data(faded.tobytes()))
+        return _Filler(text, frames, tails)
+
+    def arm(self, conn):
+        """对话开始时调用，超过阈值仍没有音频就播放语气词"""
+        self.disarm(conn)
+        if not self.enabled or conn.tts is None:
+            return
+        provider = conn.config.get("selected_module", {}).get("LLM")
+        turn = _Turn()
+        turn.handle = asyncio.get_running_loop().call_later(
+            self.threshold(provider), self._trigger, conn, turn
+        )
+        conn.masker_turn = turn
+        self.stats["turns"] += 1
+
+    def disarm(self, conn):
+        turn = conn.masker_turn
+        if turn is not None and turn.handle is not None:
+            turn.handle.cancel()
+        conn.masker_turn = None
+
+    def _trigger(self, conn, turn):
+        if (
+            conn.masker_turn is not turn
+            or conn.client_abort
+            or not conn.tts.tts_audio_queue.empty()
+        ):
+            return
+        pool = self._pools.get(voice_of(conn.tts))
+        if not pool:
+            return
+        candidates = [f for f in pool if f.text != conn.last_filler] or pool
+        filler = random.choice(candidates)
+        conn.last_filler = filler.text
+        turn.filler = filler
+        turn.task = asyncio.create_task(audio_pacer.play(conn, filler.frames))
+        self.stats["triggered"] += 1
+        turn_trace.mark(conn, "filler_start", text=filler.text)
+        conn.logger.bind(tag=TAG).info(f"首token较慢，播放语气词: {filler.text}")
+
+    async def handoff(self, conn):
+        """真正的音频到达时调用：语气词还在播放的话改为淡出，等淡出帧发送完再返回"""
+        turn = conn.masker_turn
+        if turn is None:
+            return
+        self.disarm(conn)
+        if turn.task is None or turn.task.done():
+            return
+        if audio_pacer.replace_remaining(conn, turn.filler.tail):
+            self.stats["faded"] += 1
+        else:
+            # 语气词还没开始发送，直接停止
+            turn.task.cancel()
+            self.stats["stopped"] += 1
+        try:
+            await turn.task
+        except asyncio.CancelledError:
+            pass
+
+    def snapshot(self):
+        result = dict(self.stats)
+        result["enabled"] = self.enabled
+        result["voices"] = len(self._pools)
+        for provider in ttft_tracker.snapshot():
+            result[f"{provider}_threshold_ms"] = round(
+                self.threshold(provider) * 1000
+            )
+        return result
+
+
+# 全局首token延迟掩蔽
+latency_masker = LatencyMasker()
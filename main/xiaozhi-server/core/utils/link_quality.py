@@ -0,0 +1,147 @@
+import asyncio
+import math
+import weakref
+
+from config.logger import setup_logging
+from core.utils.metrics import metrics
+
+TAG = __name__
+logger = setup_logging()
+
+FRAME_DURATION = 0.06  # 帧时长（秒）
+
+
+class LinkEstimator:
+    """
+    单个连接的链路质量估计：RTT及其抖动（按ping/pong计时，参考TCP的RTT平滑算法）、
+    发送缓冲区积压，以及最近的断流次数。据此决定预缓冲帧数和发送提前量。
+    """
+
+    def __init__(self, monitor):
+        self.monitor = monitor
+        self.device_id = None
+        self.rtt = None
+        self.rtt_var = 0.0
+        self.backlog = 0.0  # 发送缓冲区积压字节数（平滑值）
+        self.frame_bytes = 120.0  # 平均帧大小（平滑值）
+        self.underruns = 0
+        self.frames = 0
+        self.last_probe = 0.0
+        self._recent_underruns = 0.0
+
+    def record_rtt(self, seconds):
+        if self.rtt is None:
+            self.rtt = seconds
+            self.rtt_var = seconds / 2
+        else:
+            self.rtt_var = 0.75 * self.rtt_var + 0.25 * abs(seconds - self.rtt)
+            self.rtt = 0.875 * self.rtt + 0.125 * seconds
+
+    def record_backlog(self, size):
+        self.backlog = 0.8 * self.backlog + 0.2 * size
+
+    def record_frame(self, size):
+        self.frames += 1
+        self.frame_bytes = 0.99 * self.frame_bytes + 0.01 * size
+        # 断流记录约8秒衰减一半
+        self._recent_underruns *= 0.995
+
+    def record_underrun(self):
+        self.underruns += 1
+        self._recent_underruns += 1
+        self.monitor.underruns += 1
+        metrics.inc("audio_underruns")
+
+    def pre_buffer_frames(self, default):
+        """预缓冲帧数：覆盖单程时延和抖动、发送积压，并按最近的断流次数加深"""
+        monitor = self.monitor
+        if not monitor.enabled:
+            return default
+        if self.rtt is None:
+            depth = default
+        else:
+            depth = math.ceil((self.rtt / 2 + 4 * self.rtt_var) / FRAME_DURATION) + 1
+        depth += math.ceil(self.backlog / self.frame_bytes)
+        depth += round(self._recent_underruns)
+        return max(monitor.min_pre_buffer, min(monitor.max_pre_buffer, depth))
+
+    def lead(self, default):
+        """帧的发送提前量（秒），链路抖动越大提前越多"""
+        monitor = self.monitor
+        if not monitor.enabled:
+            return default
+        lead = 4 * self.rtt_var + self._recent_underruns * FRAME_DURATION
+        return max(default, min(monitor.max_lead, lead))
+
+    async def probe(self, websocket):
+        """发送一次ping测量RTT，超时按超时时间记录"""
+        loop = asyncio.get_running_loop()
+        started = loop.time()
+        try:
+            pong_waiter = await websocket.ping()
+            await asyncio.wait_for(pong_waiter, timeout=self.monitor.probe_timeout)
+            self.record_rtt(loop.time() - started)
+        except asyncio.TimeoutError:
+            self.record_rtt(self.monitor.probe_timeout)
+        except Exception as e:
+            logger.bind(tag=TAG).debug(f"链路探测失败: {e}")
+
+    def snapshot(self):
+        return {
+            "rtt_ms": round(self.rtt * 1000, 1) if self.rtt is not None else None,
+            "rtt_var_ms": round(self.rtt_var * 1000, 1),
+            "backlog_bytes": round(self.backlog),
+            "underruns": self.underruns,
+            "frames": self.frames,
+        }
+
+
+class LinkQualityMonitor:
+    """链路质量估计的全局配置和统计"""
+
+    def __init__(self):
+        self.enabled = True
+        self.min_pre_buffer = 2
+        self.max_pre_buffer = 10
+        self.max_lead = 0.2
+        self.probe_interval = 5.0
+        self.probe_timeout = 2.0
+        # 指标中是否按设备ID输出各连接的链路质量，设备ID属于敏感信息，默认不输出
+        self.per_device_metrics = False
+        self.underruns = 0
+        self._estimators = weakref.WeakSet()
+        metrics.register_collector("link_quality", self.snapshot)
+
+    def configure(self, config):
+        """根据link_quality配置初始化"""
+        config = config or {}
+        self.enabled = config.get("enabled", True)
+        self.min_pre_buffer = int(config.get("min_pre_buffer_frames", 2))
+        self.max_pre_buffer = int(config.get("max_pre_buffer_frames", 10))
+        self.max_lead = float(config.get("max_lead_ms", 200)) / 1000
+        self.probe_interval = float(config.get("probe_interval", 5))
+        self.probe_timeout = float(config.get("probe_timeout", 2))
+        self.per_device_metrics = bool(config.get("per_device_metrics", False))
+
+    def create(self):
+        estimator = LinkEstimator(self)
+        self._estimators.add(estimator)
+        return estimator
+
+    def snapshot(self):
+        estimators = list(self._estimators)
+        result = {
+            "connections": len(estimators),
+            "underruns": self.underruns,
+        }
+        if self.per_device_metrics:
+            result["devices"] = {
+                estimator.device_id: estimator.snapshot()
+                for estimator in estimators
+                if estimator.device_id
+            }
+        return result
+
+
+# 全局链路质量监控
+link_quality = LinkQualityMonitor()
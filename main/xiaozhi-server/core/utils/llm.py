@@ -7,6 +7,8 @@ project_root = os.path.abspath(os.path.join(current_dir, "..", ".."))
 sys.path.insert(0, project_root)
 
 from config.logger import setup_logging
+from core.utils.llm_scheduler import Priority, use_priority, wrap_with_scheduler
+import asyncio
 import importlib
 
 logger = setup_logging()
@@ -18,6 +20,28 @@ def create_instance(class_name, *args, **kwargs):
         lib_name = f'core.providers.llm.{class_name}.{class_name}'
         if lib_name not in sys.modules:
             sys.modules[lib_name] = importlib.import_module(f'{lib_name}')
-        return sys.modules[lib_name].LLMProvider(*args, **kwargs)
+        instance = sys.modules[lib_name].LLMProvider(*args, **kwargs)
+        # 配置了rpm/tpm配额时，统一经过共享调度器
+        return wrap_with_scheduler(instance, args[0] if args else kwargs.get("config"))
 
     raise ValueError(f"不支持的LLM类型: {class_name}，请检查该配置的type是否设置正确")
+
+
+class LLMHelper:
+    """供HTTP接口等非对话场景调用LLM的辅助类，按后台优先级调度"""
+
+    def __init__(self, config, llm_name=None, priority=Priority.BACKGROUND):
+        llm_name = llm_name or config["selected_module"]["LLM"]
+        llm_config = config["LLM"][llm_name]
+        self.llm = create_instance(llm_config.get("type", llm_name), llm_config)
+        self.priority = priority
+
+    def _generate(self, messages, **kwargs):
+        with use_priority(self.priority):
+            return "".join(
+                part for part in self.llm.response("", messages, **kwargs) if part
+            )
+
+    async def generate_response(self, messages, **kwargs):
+        """在线程中执行LLM调用，避免阻塞事件循环"""
+        return await asyncio.to_thread(self._generate, messages, **kwargs)
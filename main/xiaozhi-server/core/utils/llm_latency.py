@@ -0,0 +1,61 @@
+import threading
+from collections import deque
+
+from config.logger import setup_logging
+
+TAG = __name__
+logger = setup_logging()
+
+
+class LatencyTracker:
+    """按provider记录首token耗时（TTFT），用于计算分位数"""
+
+    def __init__(self, window_size=200):
+        self.window_size = window_size
+        self._samples = {}
+        self._lock = threading.Lock()
+
+    def record(self, name, seconds):
+        """记录一次首token耗时，单位秒"""
+        if seconds is None or seconds < 0:
+            return
+        with self._lock:
+            samples = self._samples.get(name)
+            if samples is None:
+                samples = deque(maxlen=self.window_size)
+                self._samples[name] = samples
+            samples.append(seconds)
+
+    def percentile(self, name, pct, min_samples=5):
+        """获取指定provider的TTFT分位数，样本不足时返回None"""
+        with self._lock:
+            samples = self._samples.get(name)
+            if not samples or len(samples) < min_samples:
+                return None
+            ordered = sorted(samples)
+        index = min(len(ordered) - 1, max(0, int(round(pct / 100 * (len(ordered) - 1)))))
+        return ordered[index]
+
+    def samples(self, name):
+        """返回指定provider从小到大排序的样本"""
+        with self._lock:
+            return sorted(self._samples.get(name, ()))
+
+    def snapshot(self):
+        """返回各provider的样本数及p50/p95，用于日志和调试"""
+        result = {}
+        with self._lock:
+            names = list(self._samples.keys())
+        for name in names:
+            with self._lock:
+                count = len(self._samples.get(name, ()))
+            result[name] = {
+                "count": count,
+                "p50": self.percentile(name, 50, min_samples=1),
+                "p95": self.percentile(name, 95, min_samples=1),
+            }
+        return result
+
+
+# 全局TTFT统计，所有连接共享
+ttft_tracker = LatencyTracker()
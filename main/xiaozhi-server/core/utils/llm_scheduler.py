@@ -0,0 +1,322 @@
+import heapq
+import itertools
+import json
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from enum import IntEnum
+
+from config.logger import setup_logging
+from core.providers.llm.base import LLMProviderBase
+
+TAG = __name__
+logger = setup_logging()
+
+# 排队超时或被挤出队列时返回的文本，带“异常”字样以便对冲LLM识别为失败
+BUSY_TEXT = "【LLM服务响应异常：请求排队超时，请稍后再试】"
+
+
+class Priority(IntEnum):
+    """LLM请求优先级，数值越小越优先"""
+
+    INTERACTIVE = 0  # 用户对话
+    INTENT = 1  # 意图识别
+    BACKGROUND = 2  # 记忆总结、传感器分析等后台任务
+
+
+_current_priority = ContextVar("llm_priority", default=Priority.INTERACTIVE)
+
+
+@contextmanager
+def use_priority(priority):
+    """在当前上下文中指定LLM请求的优先级"""
+    token = _current_priority.set(priority)
+    try:
+        yield
+    finally:
+        _current_priority.reset(token)
+
+
+class LLMSchedulerRejected(Exception):
+    """请求因排队超时或队列已满被拒绝"""
+
+
+class TokenBucket:
+    """按分钟限额的令牌桶，允许短暂透支（用于按实际token数修正）"""
+
+    def __init__(self, per_minute, burst=None):
+        self.rate = per_minute / 60.0
+        self.capacity = float(burst or per_minute)
+        self.tokens = self.capacity
+        self.last = time.monotonic()
+
+    def _refill(self, now):
+        self.tokens = min(self.capacity, self.tokens + (now - self.last) * self.rate)
+        self.last = now
+
+    def wait_time(self, amount, now):
+        """获取足够令牌需要等待的秒数"""
+        self._refill(now)
+        amount = min(amount, self.capacity)
+        if self.tokens >= amount:
+            return 0
+        return (amount - self.tokens) / self.rate
+
+    def take(self, amount):
+        self.tokens -= min(amount, self.capacity)
+
+    def adjust(self, delta):
+        """按实际消耗修正，delta为正表示多用，为负表示退还"""
+        self.tokens = min(self.capacity, self.tokens - delta)
+
+
+class _Ticket:
+    __slots__ = ("priority", "seq", "tokens", "deadline", "shed", "enqueue_time")
+
+    def __init__(self, priority, seq, tokens, deadline):
+        self.priority = priority
+        self.seq = seq
+        self.tokens = tokens
+        self.deadline = deadline
+        self.shed = False
+        self.enqueue_time = time.monotonic()
+
+    def __lt__(self, other):
+        return (self.priority, self.seq) < (other.priority, other.seq)
+
+
+class ProviderScheduler:
+    """单个LLM服务（同一配额）的调度器，由所有连接共享"""
+
+    def __init__(self, name, rpm=None, tpm=None, burst=None, max_queue=64, max_wait=None):
+        self.name = name
+        self.rpm_bucket = TokenBucket(rpm, burst) if rpm else None
+        self.tpm_bucket = TokenBucket(tpm) if tpm else None
+        self.max_queue = max_queue
+        self.max_wait = max_wait or {}
+        self._waiting = []
+        self._seq = itertools.count()
+        self._cond = threading.Condition()
+        self.stats = {"granted": 0, "shed": 0, "wait_total": 0.0, "in_flight": 0}
+
+    def _bucket_wait(self, tokens, now):
+        wait = 0
+        if self.rpm_bucket:
+            wait = max(wait, self.rpm_bucket.wait_time(1, now))
+        if self.tpm_bucket:
+            wait = max(wait, self.tpm_bucket.wait_time(tokens, now))
+        return wait
+
+    def _remove(self, ticket):
+        try:
+            self._waiting.remove(ticket)
+            heapq.heapify(self._waiting)
+        except ValueError:
+            pass
+
+    def acquire(self, priority, tokens):
+        """
+        阻塞直到配额允许发起请求，超时或被挤出时抛出LLMSchedulerRejected。
+        会在Condition上等待，不能在事件循环线程中调用
+        """
+        priority = Priority(priority)
+        max_wait = float(self.max_wait.get(priority.name.lower(), 30))
+        with self._cond:
+            ticket = _Ticket(priority, next(self._seq), tokens, time.monotonic() + max_wait)
+            if len(self._waiting) >= self.max_queue:
+                # 队列已满：挤出优先级最低且最晚入队的请求
+                victim = max(self._waiting)
+                if ticket < victim:
+                    victim.shed = True
+                    self._remove(victim)
+                    self._cond.notify_all()
+                else:
+                    self.stats["shed"] += 1
+                    raise LLMSchedulerRejected(f"{self.name} 请求队列已满")
+            heapq.heappush(self._waiting, ticket)
+
+            while True:
+                now = time.monotonic()
+                if ticket.shed:
+                    self.stats["shed"] += 1
+                    raise LLMSchedulerRejected(f"{self.name} 请求被更高优先级请求挤出")
+                wait = None
+                if self._waiting[0] is ticket:
+                    wait = self._bucket_wait(tokens, now)
+                    if wait <= 0:
+                        heapq.heappop(self._waiting)
+                        if self.rpm_bucket:
+                            self.rpm_bucket.take(1)
+                        if self.tpm_bucket:
+                            self.tpm_bucket.take(tokens)
+                        self.stats["granted"] += 1
+                        self.stats["in_flight"] += 1
+                        self.stats["wait_total"] += now - ticket.enqueue_time
+                        # 队首变化，唤醒下一个等待者
+                        self._cond.notify_all()
+                        return ticket
+                remaining = ticket.deadline - now
+                if remaining <= 0:
+                    self._remove(ticket)
+                    self.stats["shed"] += 1
+                    self._cond.notify_all()
+                    raise LLMSchedulerRejected(
+                        f"{self.name} 请求排队超过{max_wait}秒，优先级: {priority.name}"
+                    )
+                self._cond.wait(min(remaining, wait) if wait else remaining)
+
+    def release(self, ticket, actual_tokens):
+        """请求结束后按实际token数修正配额"""
+        with self._cond:
+            self.stats["in_flight"] -= 1
+            if self.tpm_bucket and actual_tokens is not None:
+                self.tpm_bucket.adjust(actual_tokens - min(ticket.tokens, self.tpm_bucket.capacity))
+            self._cond.notify_all()
+
+    def snapshot(self):
+        with self._cond:
+            granted = self.stats["granted"]
+            return {
+                "name": self.name,
+                "queued": len(self._waiting),
+                "in_flight": self.stats["in_flight"],
+                "granted": granted,
+                "shed": self.stats["shed"],
+                "avg_wait": self.stats["wait_total"] / granted if granted else 0,
+            }
+
+
+_schedulers = {}
+_schedulers_lock = threading.Lock()
+
+
+def _load_scheduler_config():
+    try:
+        from config.config_loader import load_config
+
+        return load_config().get("llm_scheduler", {}) or {}
+    except Exception:
+        return {}
+
+
+def get_scheduler(llm_config):
+    """按配额key获取共享调度器，未配置rpm/tpm时返回None"""
+    rpm = llm_config.get("rpm")
+    tpm = llm_config.get("tpm")
+    if not rpm and not tpm:
+        return None
+    key = llm_config.get("quota_key") or "{}|{}|{}".format(
+        llm_config.get("type", ""),
+        llm_config.get("base_url") or llm_config.get("url", ""),
+        llm_config.get("model_name", ""),
+    )
+    with _schedulers_lock:
+        scheduler = _schedulers.get(key)
+        if scheduler is None:
+            global_config = _load_scheduler_config()
+            scheduler = ProviderScheduler(
+                key,
+                rpm=int(rpm) if rpm else None,
+                tpm=int(tpm) if tpm else None,
+                burst=llm_config.get("burst"),
+                max_queue=int(global_config.get("max_queue", 64)),
+                max_wait=global_config.get("max_wait", {}),
+            )
+            _schedulers[key] = scheduler
+            logger.bind(tag=TAG).info(f"LLM调度器已创建: {key}, rpm={rpm}, tpm={tpm}")
+        return scheduler
+
+
+def _estimate_tokens(dialogue, extra=None):
+    """粗略估算输入token数：按字符数计，中文约一字一token"""
+    count = 0
+    for message in dialogue or []:
+        content = message.get("content") if isinstance(message, dict) else message
+        if content:
+            count += len(content) if isinstance(content, str) else len(str(content))
+    if extra:
+        count += len(json.dumps(extra, ensure_ascii=False))
+    return count
+
+
+class ScheduledLLMProvider(LLMProviderBase):
+    """在LLM实例外包一层配额调度，对调用方透明"""
+
+    def __init__(self, llm, scheduler, config):
+        self.llm = llm
+        self.scheduler = scheduler
+        try:
+            self.max_tokens = int(config.get("max_tokens") or 500)
+        except (TypeError, ValueError):
+            self.max_tokens = 500
+
+    def __getattr__(self, name):
+        return getattr(self.llm, name)
+
+    def _acquire(self, prompt_tokens, max_tokens=None):
+        estimate = prompt_tokens + int(max_tokens or self.max_tokens)
+        priority = _current_priority.get()
+        try:
+            return self.scheduler.acquire(priority, estimate)
+        except LLMSchedulerRejected as e:
+            logger.bind(tag=TAG).warning(f"LLM请求被调度器拒绝: {e}")
+            return None
+
+    def response(self, session_id, dialogue, **kwargs):
+        prompt_tokens = _estimate_tokens(dialogue)
+        ticket = self._acquire(prompt_tokens, kwargs.get("max_tokens"))
+        if ticket is None:
+            yield BUSY_TEXT
+            return
+        output_tokens = 0
+        try:
+            if kwargs:
+                generator = self.llm.response(session_id, dialogue, **kwargs)
+            else:
+                generator = self.llm.response(session_id, dialogue)
+            for content in generator:
+                if content:
+                    output_tokens += len(content)
+                yield content
+        finally:
+            self.scheduler.release(ticket, prompt_tokens + output_tokens)
+
+    def response_with_functions(self, session_id, dialogue, functions=None):
+        prompt_tokens = _estimate_tokens(dialogue, functions)
+        ticket = self._acquire(prompt_tokens)
+        if ticket is None:
+            yield BUSY_TEXT, None
+            return
+        output_tokens = 0
+        try:
+            for content, tool_calls in self.llm.response_with_functions(
+                session_id, dialogue, functions=functions
+            ):
+                if content:
+                    output_tokens += len(content)
+                yield content, tool_calls
+        finally:
+            self.scheduler.release(ticket, prompt_tokens + output_tokens)
+
+    def response_no_stream(self, system_prompt, user_prompt, **kwargs):
+        prompt_tokens = len(system_prompt or "") + len(user_prompt or "")
+        ticket = self._acquire(prompt_tokens, kwargs.get("max_tokens"))
+        if ticket is None:
+            return BUSY_TEXT
+        result = ""
+        try:
+            result = self.llm.response_no_stream(system_prompt, user_prompt, **kwargs)
+            return result
+        finally:
+            self.scheduler.release(ticket, prompt_tokens + len(result or ""))
+
+
+def wrap_with_scheduler(llm, llm_config):
+    """配置了rpm/tpm时为LLM实例加上配额调度"""
+    if not isinstance(llm_config, dict):
+        return llm
+    scheduler = get_scheduler(llm_config)
+    if scheduler is None:
+        return llm
+    return ScheduledLLMProvider(llm, scheduler, llm_config)
@@ -0,0 +1,71 @@
+import threading
+from collections import defaultdict
+
+from config.logger import setup_logging
+
+TAG = __name__
+logger = setup_logging()
+
+
+class MetricsRegistry:
+    """进程内的简单指标注册表：计数器、当前值，以及按需采集的统计回调"""
+
+    def __init__(self):
+        self._counters = defaultdict(float)
+        self._gauges = {}
+        self._collectors = {}
+        self._lock = threading.Lock()
+
+    def inc(self, name, value=1):
+        """计数器累加"""
+        with self._lock:
+            self._counters[name] += value
+
+    def set(self, name, value):
+        """设置当前值"""
+        with self._lock:
+            self._gauges[name] = value
+
+    def register_collector(self, name, collector):
+        """注册统计回调，查询指标时调用，返回dict"""
+        with self._lock:
+            self._collectors[name] = collector
+
+    def snapshot(self):
+        with self._lock:
+            result = {
+                "counters": dict(self._counters),
+                "gauges": dict(self._gauges),
+            }
+            collectors = list(self._collectors.items())
+        for name, collector in collectors:
+            try:
+                result[name] = collector()
+            except Exception as e:
+                logger.bind(tag=TAG).error(f"采集指标{name}失败: {e}")
+        return result
+
+    def to_prometheus(self):
+        """转换为Prometheus文本格式，只输出数值型指标"""
+        lines = []
+
+        def emit(name, value):
+            if isinstance(value, bool):
+                value = int(value)
+            if isinstance(value, (int, float)):
+                lines.append(f"xiaozhi_{name} {value}")
+
+        snapshot = self.snapshot()
+        for name, value in snapshot.pop("counters").items():
+            emit(name, value)
+        for name, value in snapshot.pop("gauges").items():
+            emit(name, value)
+        for group, values in snapshot.items():
+            if isinstance(values, dict):
+                for name, value in values.items():
+                    emit(f"{group}_{name}", value)
+        return "\n".join(lines) + "\n"
+
+
+# 全局指标注册表
+metrics = MetricsRegistry()
@@ -0,0 +1,268 @@
+"""
+音乐索引：保存音乐目录的文件清单和各目录的修改时间，刷新时只重新列出修改时间变化的目录；
+歌名按字符二元组和拼音音节二元组建立倒排索引，模糊查找时先用倒排索引取出候选，
+只对少量候选计算相似度。
+"""
+
+import difflib
+import json
+import os
+import re
+import threading
+import time
+from collections import Counter
+
+from config.logger import setup_logging
+
+try:
+    from pypinyin import lazy_pinyin
+except ImportError:
+    lazy_pinyin = None
+
+TAG = __name__
+logger = setup_logging()
+
+# 计算相似度的最大候选数
+MAX_CANDIDATES = 50
+_NORMALIZE = re.compile(r"[\W_]+")
+
+
+def normalize(text):
+    """去掉标点和空白并转为小写"""
+    return _NORMALIZE.sub("", text).lower()
+
+
+def _char_grams(text):
+    if len(text) < 2:
+        return {text} if text else set()
+    return {text[i : i + 2] for i in range(len(text) - 1)}
+
+
+def _pinyin(text):
+    if lazy_pinyin is None or not text:
+        return []
+    return lazy_pinyin(text)
+
+
+def _pinyin_grams(syllables):
+    if len(syllables) < 2:
+        return {f"py:{s}" for s in syllables}
+    return {
+        f"py:{syllables[i]} {syllables[i + 1]}" for i in range(len(syllables) - 1)
+    }
+
+
+class _Song:
+    __slots__ = ("path", "name", "key", "pinyin", "grams", "mtime", "size")
+
+    def __init__(self, path, mtime, size):
+        self.path = path
+        self.name = os.path.splitext(path)[0]
+        self.key = normalize(os.path.basename(self.name))
+        self.pinyin = "".join(_pinyin(self.key))
+        self.grams = _char_grams(self.key) | _pinyin_grams(_pinyin(self.key))
+        self.mtime = mtime
+        self.size = size
+
+
+class MusicIndex:
+    def __init__(self, music_dir, music_ext, index_file=None):
+        """
+        Args:
+            music_dir: 音乐目录
+            music_ext: 音乐文件扩展名列表
+            index_file: 清单持久化文件，重启后只需检查修改时间变化的目录
+        """
+        self.music_dir = os.path.abspath(music_dir)
+        self.music_ext = tuple(ext.lower() for ext in music_ext)
+        self.index_file = index_file
+        self._songs = {}
+        self._dirs = {}
+        self._postings = {}
+        self._lock = threading.Lock()
+        self._load()
+
+    def __len__(self):
+        return len(self._songs)
+
+    @property
+    def files(self):
+        with self._lock:
+            return list(self._songs)
+
+    @property
+    def names(self):
+        with self._lock:
+            return [song.name for song in self._songs.values()]
+
+    def _load(self):
+        if not self.index_file or not os.path.exists(self.index_file):
+            return
+        try:
+            with open(self.index_file, "r", encoding="utf-8") as f:
+                data = json.load(f)
+        except Exception as e:
+            logger.bind(tag=TAG).warning(f"读取音乐索引失败，将重新扫描: {e}")
+            return
+        if data.get("music_dir") != self.music_dir:
+            return
+        self._dirs = data.get("dirs", {})
+        for path, (mtime, size) in data.get("files", {}).items():
+            self._add(_Song(path, mtime, size))
+
+    def _save(self):
+        if not self.index_file:
+            return
+        with self._lock:
+            data = {
+                "music_dir": self.music_dir,
+                "dirs": dict(self._dirs),
+                "files": {
+                    path: [song.mtime, song.size] for path, song in self._songs.items()
+                },
+            }
+        os.makedirs(os.path.dirname(os.path.abspath(self.index_file)), exist_ok=True)
+        temp_file = f"{self.index_file}.tmp"
+        with open(temp_file, "w", encoding="utf-8") as f:
+            json.dump(data, f, ensure_ascii=False)
+        os.replace(temp_file, self.index_file)
+
+    def _add(self, song):
+        self._songs[song.path] = song
+        for gram in song.grams:
+            self._postings.setdefault(gram, set()).add(song.path)
+
+    def _remove(self, path):
+        song = self._songs.pop(path, None)
+        if song is None:
+            return
+        for gram in song.grams:
+            paths = self._postings.get(gram)
+            if paths is not None:
+                paths.discard(path)
+                if not paths:
+                    del self._postings[gram]
+
+    def _list_dir(self, relative_dir):
+        """列出目录下的音乐文件和子目录"""
+        files = {}
+        subdirs = []
+        base = os.path.join(self.music_dir, relative_dir)
+        with os.scandir(base) as entries:
+            for entry in entries:
+                relative_path = (
+                    os.path.join(relative_dir, entry.name)
+                    if relative_dir
+                    else entry.name
+                )
+                if entry.is_dir(follow_symlinks=True):
+                    subdirs.append(relative_path)
+                elif entry.name.lower().endswith(self.music_ext):
+                    stat = entry.stat()
+                    files[relative_path] = (stat.st_mtime, stat.st_size)
+        return files, subdirs
+
+    def refresh(self):
+        """增量刷新：遍历目录检查修改时间，只重新列出有变化的目录，返回(新增, 删除)数量"""
+        if not os.path.isdir(self.music_dir):
+            return 0, 0
+        started = time.monotonic()
+        added = removed = 0
+        seen_dirs = set()
+        stack = [""]
+        while stack:
+            relative_dir = stack.pop()
+            seen_dirs.add(relative_dir)
+            try:
+                mtime = os.stat(os.path.join(self.music_dir, relative_dir)).st_mtime
+            except OSError:
+                continue
+            if self._dirs.get(relative_dir, {}).get("mtime") == mtime:
+                stack.extend(self._dirs[relative_dir]["subdirs"])
+                continue
+            try:
+                files, subdirs = self._list_dir(relative_dir)
+            except OSError as e:
+                logger.bind(tag=TAG).warning(f"读取音乐目录失败: {relative_dir}, {e}")
+                continue
+            previous = set(self._dirs.get(relative_dir, {}).get("files", []))
+            with self._lock:
+                for path in previous - files.keys():
+                    self._remove(path)
+                    removed += 1
+                for path, (file_mtime, size) in files.items():
+                    song = self._songs.get(path)
+                    if song is None:
+                        added += 1
+                    elif song.mtime == file_mtime and song.size == size:
+                        continue
+                    self._remove(path)
+                    self._add(_Song(path, file_mtime, size))
+                self._dirs[relative_dir] = {
+                    "mtime": mtime,
+                    "files": list(files),
+                    "subdirs": subdirs,
+                }
+            stack.extend(subdirs)
+        # 已被删除的目录
+        with self._lock:
+            for relative_dir in set(self._dirs) - seen_dirs:
+                for path in self._dirs.pop(relative_dir)["files"]:
+                    self._remove(path)
+                    removed += 1
+        if added or removed:
+            logger.bind(tag=TAG).info(
+                f"音乐索引已更新: 新增{added}首, 删除{removed}首, 共{len(self._songs)}首, "
+                f"耗时{(time.monotonic() - started) * 1000:.0f}ms"
+            )
+            self._save()
+        return added, removed
+
+    def _candidates(self, key, syllables):
+        """按命中的索引项数量返回候选歌曲及命中数"""
+        grams = _char_grams(key) | _pinyin_grams(syllables)
+        hits = Counter()
+        with self._lock:
+            for gram in grams:
+                hits.update(self._postings.get(gram, ()))
+            return [(self._songs[path], count) for path, count in hits.items()]
+
+    def search(self, query, limit=5, threshold=0.4):
+        """按歌名相似度查找，返回[(相对路径, 相似度)]，相似度取字符和拼音中较高的一个"""
+        key = normalize(query)
+        if not key:
+            return []
+        syllables = _pinyin(key)
+        query_pinyin = "".join(syllables)
+        candidates = self._candidates(key, syllables)
+        candidates.sort(key=lambda item: item[1] / len(item[0].grams), reverse=True)
+        results = []
+        for song, _ in candidates[:MAX_CANDIDATES]:
+            ratio = difflib.SequenceMatcher(None, key, song.key).ratio()
+            if query_pinyin and song.pinyin:
+                ratio = max(
+                    ratio,
+                    difflib.SequenceMatcher(None, query_pinyin, song.pinyin).ratio(),
+                )
+            if ratio > threshold:
+                results.append((song.path, ratio))
+        results.sort(key=lambda item: item[1], reverse=True)
+        return results[:limit]
+
+    def best_match(self, query, threshold=0.4):
+        results = self.search(query, limit=1, threshold=threshold)
+        return results[0][0] if results else None
+
+    def suggest(self, text, limit=10):
+        """从一句话中找出可能提到的歌名，歌名的索引项一半以上出现在这句话中才算"""
+        key = normalize(text)
+        if not key:
+            return []
+        candidates = self._candidates(key, _pinyin(key))
+        scored = [
+            (count / len(song.grams), song.name)
+            for song, count in candidates
+            if count * 2 >= len(song.grams)
+        ]
+        scored.sort(reverse=True)
+        return [name for _, name in scored[:limit]]
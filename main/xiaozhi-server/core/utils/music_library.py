@@ -0,0 +1,190 @@
+"""
+音乐库预转码：把music_dir下的音乐文件离线转码为p3（16kHz单声道60ms Opus帧），
+并在p3目录下维护index.json记录源文件的修改时间和大小。播放时优先使用已转码的p3文件，
+通过内存映射按帧读取，不需要在请求时解码整首歌曲。
+
+离线转码：
+    python -m core.utils.music_library --music-dir ./music --p3-dir data/music_p3
+"""
+
+import argparse
+import json
+import os
+import threading
+import time
+
+from config.logger import setup_logging
+from core.utils import p3
+from core.utils.audio_decode import decode_audio_file
+from core.utils.util import PcmFrameEncoder
+
+TAG = __name__
+logger = setup_logging()
+
+INDEX_FILE = "index.json"
+DEFAULT_MUSIC_EXT = (".mp3", ".wav", ".p3")
+
+
+def transcode_to_p3(source_file, output_file):
+    """把音频文件转码为p3文件，返回帧数"""
+    pcm_data = decode_audio_file(source_file)
+    encoder = PcmFrameEncoder(is_opus=True, signal="music", trim_silence=True)
+    try:
+        opus_datas = encoder.encode(pcm_data) + encoder.flush()
+    finally:
+        encoder.close()
+    os.makedirs(os.path.dirname(output_file) or ".", exist_ok=True)
+    p3.write_p3(output_file, opus_datas)
+    return len(opus_datas)
+
+
+class MusicLibrary:
+    """音乐目录与其p3转码目录的对应关系"""
+
+    def __init__(self, music_dir, p3_dir, music_ext=DEFAULT_MUSIC_EXT):
+        self.music_dir = os.path.abspath(music_dir)
+        self.p3_dir = os.path.abspath(p3_dir)
+        self.music_ext = tuple(ext.lower() for ext in music_ext)
+        self.index = {}
+        self._lock = threading.Lock()
+        self._transcoding = False
+        self._load_index()
+
+    def _index_path(self):
+        return os.path.join(self.p3_dir, INDEX_FILE)
+
+    def _load_index(self):
+        try:
+            with open(self._index_path(), "r", encoding="utf-8") as f:
+                self.index = json.load(f)
+        except FileNotFoundError:
+            self.index = {}
+        except Exception as e:
+            logger.bind(tag=TAG).warning(f"读取音乐转码索引失败，将重新转码: {e}")
+            self.index = {}
+
+    def _save_index(self):
+        os.makedirs(self.p3_dir, exist_ok=True)
+        temp_file = self._index_path() + ".tmp"
+        with self._lock:
+            content = json.dumps(self.index, ensure_ascii=False, indent=2)
+        with open(temp_file, "w", encoding="utf-8") as f:
+            f.write(content)
+        os.replace(temp_file, self._index_path())
+
+    def _p3_path(self, relative_path):
+        return os.path.join(self.p3_dir, os.path.splitext(relative_path)[0] + ".p3")
+
+    def _is_fresh(self, relative_path, stat):
+        entry = self.index.get(relative_path.replace(os.sep, "/"))
+        return (
+            entry is not None
+            and entry["mtime"] == stat.st_mtime
+            and entry["size"] == stat.st_size
+            and os.path.exists(self._p3_path(relative_path))
+        )
+
+    def resolve(self, relative_path):
+        """返回播放用的文件路径：p3源文件直接使用，已转码且未过期的返回p3文件，否则返回源文件"""
+        source_file = os.path.join(self.music_dir, relative_path)
+        if source_file.lower().endswith(".p3"):
+            return source_file
+        try:
+            stat = os.stat(source_file)
+        except OSError:
+            return source_file
+        with self._lock:
+            fresh = self._is_fresh(relative_path, stat)
+        return self._p3_path(relative_path) if fresh else source_file
+
+    def _iter_sources(self):
+        for root, _, names in os.walk(self.music_dir):
+            for name in names:
+                if name.lower().endswith(self.music_ext) and not name.lower().endswith(
+                    ".p3"
+                ):
+                    yield os.path.relpath(os.path.join(root, name), self.music_dir)
+
+    def transcode(self, force=False):
+        """转码新增或已变化的音乐文件，删除源文件已不存在的p3，返回(转码数, 失败数)"""
+        converted = failed = 0
+        seen = set()
+        for relative_path in self._iter_sources():
+            key = relative_path.replace(os.sep, "/")
+            seen.add(key)
+            source_file = os.path.join(self.music_dir, relative_path)
+            stat = os.stat(source_file)
+            with self._lock:
+                fresh = self._is_fresh(relative_path, stat)
+            if fresh and not force:
+                continue
+            started = time.monotonic()
+            try:
+                frames = transcode_to_p3(source_file, self._p3_path(relative_path))
+            except Exception as e:
+                failed += 1
+                logger.bind(tag=TAG).error(f"音乐转码失败: {relative_path}, {e}")
+                continue
+            converted += 1
+            with self._lock:
+                self.index[key] = {
+                    "mtime": stat.st_mtime,
+                    "size": stat.st_size,
+                    "frames": frames,
+                    "duration": frames * p3.FRAME_DURATION_MS / 1000.0,
+                }
+            logger.bind(tag=TAG).info(
+                f"音乐转码完成: {relative_path}, {frames}帧, "
+                f"耗时{time.monotonic() - started:.2f}s"
+            )
+        with self._lock:
+            removed = [key for key in self.index if key not in seen]
+            for key in removed:
+                del self.index[key]
+        for key in removed:
+            try:
+                os.remove(self._p3_path(key.replace("/", os.sep)))
+            except OSError:
+                pass
+        if converted or removed:
+            self._save_index()
+        return converted, failed
+
+    def transcode_in_background(self):
+        """在后台线程中转码，已有转码任务在运行时直接返回"""
+        with self._lock:
+            if self._transcoding:
+                return
+            self._transcoding = True
+
+        def run():
+            try:
+                self.transcode()
+            except Exception as e:
+                logger.bind(tag=TAG).error(f"音乐库后台转码失败: {e}")
+            finally:
+                self._transcoding = False
+
+        threading.Thread(target=run, daemon=True).start()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="把音乐目录转码为p3文件")
+    parser.add_argument("--music-dir", default="./music", help="音乐文件目录")
+    parser.add_argument("--p3-dir", default="data/music_p3", help="p3文件输出目录")
+    parser.add_argument(
+        "--force", action="store_true", help="忽略索引，重新转码全部文件"
+    )
+    args = parser.parse_args()
+
+    library = MusicLibrary(args.music_dir, args.p3_dir)
+    started = time.monotonic()
+    converted, failed = library.transcode(force=args.force)
+    print(
+        f"转码完成: {converted}个, 失败{failed}个, 共{len(library.index)}首, "
+        f"耗时{time.monotonic() - started:.1f}s"
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -1,21 +1,117 @@
 """
 Opus编码工具类
-将PCM音频数据编码为Opus格式
+将PCM音频数据编码为Opus格式。所有TTS和音频素材的编码都经过这里：
+编码器从全局池中取用，用完归还复用；每个编码器预分配一帧PCM缓冲区和输出缓冲区，
+输入数据通过memoryview切片拷入缓冲区后直接交给libopus，不再逐帧创建numpy数组和bytes。
 """
 
+import ctypes
 import logging
-import traceback
-
-import numpy as np
+import threading
 from typing import List, Optional
+
 from opuslib_next import Encoder
 from opuslib_next import constants
+from opuslib_next.api import c_int16_pointer
+from opuslib_next.api import encoder as opus_api
+
+from core.utils.metrics import metrics
+from core.utils.silence import SilenceTrimmer, silence_settings
+
+# 单个Opus包的最大字节数（libopus建议值）
+MAX_PACKET_SIZE = 4000
+
+SIGNALS = {
+    "auto": constants.AUTO,
+    "voice": constants.SIGNAL_VOICE,
+    "music": constants.SIGNAL_MUSIC,
+}
+
+
+class EncoderPool:
+    """按(采样率, 通道数)缓存空闲的编码器，避免每次编码都重新创建"""
+
+    def __init__(self, max_idle=64):
+        self.max_idle = max_idle
+        # 配置的码率和复杂度，以及负载调整后当前生效的值
+        self.base_bitrate = self.bitrate = 24000
+        self.base_complexity = self.complexity = 10
+        # 码率或复杂度每变化一次加1，使用中的编码器据此在下一次编码时更新参数
+        self.generation = 0
+        self._idle = {}
+        self._lock = threading.Lock()
+        self.stats = {"created": 0, "reused": 0}
+        metrics.register_collector("opus_encoder", self.snapshot)
+
+    def configure(self, config):
+        """根据opus_encoder配置设置码率和复杂度，已创建的空闲编码器会被丢弃"""
+        config = config or {}
+        self.base_bitrate = int(config.get("bitrate", 24000))
+        self.base_complexity = int(config.get("complexity", 10))
+        self.max_idle = int(config.get("max_idle", 64))
+        self.set_params(self.base_complexity, self.base_bitrate)
+        with self._lock:
+            self._idle.clear()
+
+    def set_params(self, complexity, bitrate):
+        """调整所有编码器的复杂度和码率，包括正在使用的编码器"""
+        self.complexity = complexity
+        self.bitrate = bitrate
+        self.generation += 1
+
+    def tune(self, encoder):
+        """把当前的码率和复杂度应用到编码器，返回对应的generation"""
+        generation = self.generation
+        encoder.bitrate = self.bitrate
+        encoder.complexity = self.complexity
+        return generation
+
+    def acquire(self, sample_rate, channels):
+        key = (sample_rate, channels)
+        with self._lock:
+            idle = self._idle.get(key)
+            if idle:
+                self.stats["reused"] += 1
+                encoder = idle.pop()
+            else:
+                self.stats["created"] += 1
+                encoder = None
+        if encoder is None:
+            encoder = Encoder(sample_rate, channels, constants.APPLICATION_AUDIO)
+        self.tune(encoder)
+        return encoder
+
+    def release(self, encoder, sample_rate, channels):
+        encoder.reset_state()
+        with self._lock:
+            idle = self._idle.setdefault((sample_rate, channels), [])
+            if len(idle) < self.max_idle:
+                idle.append(encoder)
+
+    def snapshot(self):
+        with self._lock:
+            result = dict(self.stats)
+            result["idle"] = sum(len(idle) for idle in self._idle.values())
+        result["bitrate"] = self.bitrate
+        result["complexity"] = self.complexity
+        return result
+
+
+# 全局编码器池
+encoder_pool = EncoderPool()
 
 
 class OpusEncoderUtils:
     """PCM到Opus的编码器"""
 
-    def __init__(self, sample_rate: int, channels: int, frame_size_ms: int):
+    def __init__(
+        self,
+        sample_rate: int,
+        channels: int,
+        frame_size_ms: int,
+        signal="voice",
+        trim_silence=False,
+    ):
         """
         初始化Opus编码器
 
@@ -23,6 +119,8 @@ class OpusEncoderUtils:
             sample_rate: 采样率 (Hz)
             channels: 通道数 (1=单声道, 2=立体声)
             frame_size_ms: 帧大小 (毫秒)
+            signal: 信号类型优化，voice/music/auto
+            trim_silence: 是否裁剪开头和过长的静音帧（用于TTS和音乐，不用于提示音）
         """
         self.sample_rate = sample_rate
         self.channels = channels
@@ -31,22 +129,28 @@ class OpusEncoderUtils:
         self.frame_size = (sample_rate * frame_size_ms) // 1000
         # 总帧大小 = 每帧样本数 * 通道数
         self.total_frame_size = self.frame_size * channels
+        self.frame_bytes = self.total_frame_size * 2
 
-        # 比特率和复杂度设置
-        self.bitrate = 24000  # bps
-        self.complexity = 10  # 最高质量
-
-        # 缓冲区初始化为空
-        self.buffer = np.array([], dtype=np.int16)
+        # 预分配的一帧PCM缓冲区，未凑满一帧的数据留在这里
+        self._frame = bytearray(self.frame_bytes)
+        self._frame_view = memoryview(self._frame)
+        self._filled = 0
+        self._pcm_pointer = ctypes.cast(
+            (ctypes.c_char * self.frame_bytes).from_buffer(self._frame),
+            c_int16_pointer,
+        )
+        self._output = (ctypes.c_char * MAX_PACKET_SIZE)()
+        self.trimmer = (
+            SilenceTrimmer() if trim_silence and silence_settings.enabled else None
+        )
+        self._segment_packets = 0
 
         try:
-            # 创建Opus编码器
-            self.encoder = Encoder(
-                sample_rate, channels, constants.APPLICATION_AUDIO  # 音频优化模式
-            )
-            self.encoder.bitrate = self.bitrate
-            self.encoder.complexity = self.complexity
-            self.encoder.signal = constants.SIGNAL_VOICE  # 语音信号优化
+            self._generation = encoder_pool.generation
+            self.encoder = encoder_pool.acquire(sample_rate, channels)
+            self.encoder.signal = SIGNALS.get(signal, constants.SIGNAL_VOICE)
+            # DTX：静音帧只输出1~2字节的包
+            self.encoder.dtx = 1 if silence_settings.dtx else 0
         except Exception as e:
             logging.error(f"初始化Opus编码器失败: {e}")
             raise RuntimeError("初始化失败") from e
@@ -54,83 +158,100 @@ class OpusEncoderUtils:
     def reset_state(self):
         """重置编码器状态"""
         self.encoder.reset_state()
-        self.buffer = np.array([], dtype=np.int16)
+        self._filled = 0
 
     def encode_pcm_to_opus(self, pcm_data: bytes, end_of_stream: bool) -> List[bytes]:
         """
         将PCM数据编码为Opus格式
 
         Args:
-            pcm_data: PCM字节数据
+            pcm_data: PCM字节数据（16位小端）
             end_of_stream: 是否为流的结束
 
         Returns:
             Opus数据包列表
         """
-        # 将字节数据转换为short数组
-        new_samples = self._convert_bytes_to_shorts(pcm_data)
-
-        # 校验PCM数据
-        self._validate_pcm_data(new_samples)
-
-        # 将新数据追加到缓冲区
-        self.buffer = np.append(self.buffer, new_samples)
+        # 负载调整了复杂度或码率时，在编码线程内更新参数
+        if self._generation != encoder_pool.generation:
+            self._generation = encoder_pool.tune(self.encoder)
 
+        view = memoryview(pcm_data).cast("B")
+        length = len(view)
+        frame_bytes = self.frame_bytes
         opus_packets = []
-        offset = 0
+        position = 0
+
+        # 先补满上次剩下的半帧
+        if self._filled:
+            take = min(frame_bytes - self._filled, length)
+            self._frame_view[self._filled : self._filled + take] = view[:take]
+            self._filled += take
+            position = take
+            if self._filled == frame_bytes:
+                self._append(opus_packets)
+                self._filled = 0
 
         # 处理所有完整帧
-        while offset <= len(self.buffer) - self.total_frame_size:
-            frame = self.buffer[offset : offset + self.total_frame_size]
-            output = self._encode(frame)
-            if output:
-                opus_packets.append(output)
-            offset += self.total_frame_size
+        while position + frame_bytes <= length:
+            self._frame_view[:] = view[position : position + frame_bytes]
+            self._append(opus_packets)
+            position += frame_bytes
 
         # 保留未处理的样本
-        self.buffer = self.buffer[offset:]
+        rest = length - position
+        if rest:
+            self._frame_view[:rest] = view[position:]
+            self._filled = rest
 
-        # 流结束时处理剩余数据
-        if end_of_stream and len(self.buffer) > 0:
-            # 创建最后一帧并用0填充
-            last_frame = np.zeros(self.total_frame_size, dtype=np.int16)
-            last_frame[: len(self.buffer)] = self.buffer
-
-            output = self._encode(last_frame)
-            if output:
-                opus_packets.append(output)
-            self.buffer = np.array([], dtype=np.int16)
+        # 流结束时处理剩余数据，最后一帧用0填充
+        if end_of_stream:
+            if self._filled:
+                self._frame_view[self._filled :] = bytes(frame_bytes - self._filled)
+                self._append(opus_packets)
+                self._filled = 0
+            self._finish_segment(opus_packets)
 
         return opus_packets
 
-    def _encode(self, frame: np.ndarray) -> Optional[bytes]:
-        """编码一帧音频数据"""
+    def _append(self, opus_packets, force=False):
+        trimmer = self.trimmer
+        if not force and trimmer is not None and not trimmer.keep(self._frame):
+            return
+        output = self._encode()
+        if output:
+            opus_packets.append(output)
+            self._segment_packets += 1
+
+    def _finish_segment(self, opus_packets):
+        if self.trimmer is not None:
+            if self._segment_packets == 0 and self.trimmer.dropped:
+                # 整段都是静音时保留一帧，避免被当作合成失败
+                self._frame_view[:] = bytes(self.frame_bytes)
+                self._append(opus_packets, force=True)
+            self.trimmer.finish()
+        self._segment_packets = 0
+
+    def _encode(self) -> Optional[bytes]:
+        """编码缓冲区中的一帧音频数据"""
         try:
-            # 将numpy数组转换为bytes
-            frame_bytes = frame.tobytes()
-            # opuslib要求输入字节数必须是channels*2的倍数
-            encoded = self.encoder.encode(frame_bytes, self.frame_size)
-            return encoded
+            result = opus_api.libopus_encode(
+                self.encoder.encoder_state,
+                self._pcm_pointer,
+                self.frame_size,
+                self._output,
+                MAX_PACKET_SIZE,
+            )
+            if result < 0:
+                raise RuntimeError(f"libopus error {result}")
+            return ctypes.string_at(self._output, result)
         except Exception as e:
             logging.error(f"Opus编码失败: {e}")
-            traceback.print_exc()
             return None
 
-    def _convert_bytes_to_shorts(self, bytes_data: bytes) -> np.ndarray:
-        """将字节数组转换为short数组 (16位PCM)"""
-        # 假设输入是小端字节序的16位PCM
-        return np.frombuffer(bytes_data, dtype=np.int16)
-
-    def _validate_pcm_data(self, pcm_shorts: np.ndarray) -> None:
-        """验证PCM数据是否有效"""
-        # 16位PCM数据范围是 -32768 到 32767
-        if np.any((pcm_shorts < -32768) | (pcm_shorts > 32767)):
-            invalid_samples = pcm_shorts[(pcm_shorts < -32768) | (pcm_shorts > 32767)]
-            logging.warning(f"发现无效PCM样本: {invalid_samples[:5]}...")
-            # 在实际应用中可以选择裁剪而不是抛出异常
-            # np.clip(pcm_shorts, -32768, 32767, out=pcm_shorts)
-
     def close(self):
-        """关闭编码器并释放资源"""
-        # opuslib没有明确的关闭方法，Python的垃圾回收会处理
-        pass
+        """把编码器归还到全局池"""
+        encoder = self.encoder
+        if encoder is not None:
+            self.encoder = None
+            encoder_pool.release(encoder, self.sample_rate, self.channels)
+
@@ -1,36 +1,144 @@
+import mmap
+import os
 import struct
+import threading
+from array import array
+from collections import OrderedDict
 
-def decode_opus_from_file(input_file):
+FRAME_DURATION_MS = 60  # 帧时长
+HEADER_SIZE = 4  # 头部：[1字节类型，1字节保留，2字节长度]
+
+
+class P3File:
     """
-    从p3文件中解码 Opus 数据，并返回一个 Opus 数据包的列表以及总时长。
+    内存映射的p3文件：打开时只扫描一遍头部建立帧索引，帧数据在读取时才从映射中取出。
+    同一文件的映射由open_p3在所有连接间共享，操作系统页缓存中只有一份数据。
     """
-    opus_datas = []
-    total_frames = 0
-    sample_rate = 16000  # 文件采样率
-    frame_duration_ms = 60  # 帧时长
-    frame_size = int(sample_rate * frame_duration_ms / 1000)
 
-    with open(input_file, 'rb') as f:
-        while True:
-            # 读取头部（4字节）：[1字节类型，1字节保留，2字节长度]
-            header = f.read(4)
-            if not header:
-                break
+    def __init__(self, path):
+        self.path = path
+        stat = os.stat(path)
+        self.mtime = stat.st_mtime
+        self.size = stat.st_size
+        self.offsets = array('Q')
+        self.lengths = array('H')
+        if self.size == 0:
+            self._data = b''
+            return
+        with open(path, 'rb') as f:
+            self._data = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        self._build_index()
 
-            # 解包头部信息
-            _, _, data_len = struct.unpack('>BBH', header)
+    def _build_index(self):
+        data = self._data
+        size = self.size
+        position = 0
+        unpack_from = struct.unpack_from
+        while position + HEADER_SIZE <= size:
+            _, _, data_len = unpack_from('>BBH', data, position)
+            position += HEADER_SIZE
+            if position + data_len > size:
+                raise ValueError(
+                    f"Data length({size - position}) mismatch({data_len}) in the file."
+                )
+            self.offsets.append(position)
+            self.lengths.append(data_len)
+            position += data_len
+        if position != size:
+            raise ValueError(f"Incomplete header at {position} in the file.")
 
-            # 根据头部指定的长度读取 Opus 数据
-            opus_data = f.read(data_len)
-            if len(opus_data) != data_len:
-                raise ValueError(f"Data length({len(opus_data)}) mismatch({data_len}) in the file.")
+    def __len__(self):
+        return len(self.offsets)
 
-            opus_datas.append(opus_data)
-            total_frames += 1
+    @property
+    def duration(self):
+        return len(self.offsets) * FRAME_DURATION_MS / 1000.0
 
-    # 计算总时长
-    total_duration = (total_frames * frame_duration_ms) / 1000.0
-    return opus_datas, total_duration
+    def frame(self, index):
+        offset = self.offsets[index]
+        return self._data[offset : offset + self.lengths[index]]
+
+    def frames(self):
+        """返回全部帧的惰性序列，支持len、下标、切片和迭代"""
+        return P3Frames(self, 0, len(self))
+
+
+class P3Frames:
+    """P3File中一段连续帧的惰性视图，切片不复制数据"""
+
+    __slots__ = ('file', 'start', 'stop')
+
+    def __init__(self, file, start, stop):
+        self.file = file
+        self.start = start
+        self.stop = stop
+
+    def __len__(self):
+        return self.stop - self.start
+
+    def __getitem__(self, index):
+        length = self.stop - self.start
+        if isinstance(index, slice):
+            start, stop, step = index.indices(length)
+            if step != 1:
+                return [self[i] for i in range(start, stop, step)]
+            return P3Frames(self.file, self.start + start, self.start + max(start, stop))
+        if index < 0:
+            index += length
+        if not 0 <= index < length:
+            raise IndexError('frame index out of range')
+        return self.file.frame(self.start + index)
+
+    def __iter__(self):
+        frame = self.file.frame
+        for index in range(self.start, self.stop):
+            yield frame(index)
+
+
+# 已打开的p3文件，按路径共享映射，文件变化后重新打开
+_open_files = OrderedDict()
+_open_files_lock = threading.Lock()
+MAX_OPEN_FILES = 128
+
+
+def open_p3(path):
+    """打开p3文件并返回共享的P3File；旧映射在没有连接使用后由垃圾回收释放"""
+    key = os.path.abspath(path)
+    stat = os.stat(key)
+    with _open_files_lock:
+        p3_file = _open_files.get(key)
+        if (
+            p3_file is not None
+            and p3_file.mtime == stat.st_mtime
+            and p3_file.size == stat.st_size
+        ):
+            _open_files.move_to_end(key)
+            return p3_file
+    p3_file = P3File(key)
+    with _open_files_lock:
+        _open_files[key] = p3_file
+        _open_files.move_to_end(key)
+        while len(_open_files) > MAX_OPEN_FILES:
+            _open_files.popitem(last=False)
+    return p3_file
+
+
+def write_p3(output_file, opus_datas):
+    """把Opus数据包逐个写入p3文件，先写临时文件再替换，避免正在播放的连接读到不完整的文件"""
+    temp_file = f"{output_file}.tmp"
+    with open(temp_file, 'wb') as f:
+        for opus_data in opus_datas:
+            f.write(struct.pack('>BBH', 0, 0, len(opus_data)))
+            f.write(opus_data)
+    os.replace(temp_file, output_file)
+
+
+def decode_opus_from_file(input_file):
+    """
+    从p3文件中解码 Opus 数据，并返回一个 Opus 数据包的列表以及总时长。
+    """
+    p3_file = P3File(input_file)
+    return list(p3_file.frames()), p3_file.duration
 
 def decode_opus_from_bytes(input_bytes):
     """
@@ -56,4 +164,12 @@ def decode_opus_from_bytes(input_bytes):
         total_frames += 1
 
     total_duration = (total_frames * frame_duration_ms) / 1000.0
-    return opus_datas, total_duration
\ No newline at end of file
+    return opus_datas, total_duration
+
+def encode_opus_to_bytes(opus_datas):
+    """
+    将 Opus 数据包列表编码为p3二进制数据，每个数据包前加4字节头部。
+    """
+    return b"".join(
+        struct.pack('>BBH', 0, 0, len(opus_data)) + opus_data for opus_data in opus_datas
+    )
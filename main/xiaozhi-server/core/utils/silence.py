@@ -0,0 +1,118 @@
+"""
+出站音频的静音裁剪：在编码前按60ms帧计算音量，去掉每段音频开头的静音，
+并把中间和结尾连续的静音限制在设定的最大时长内，超出部分的帧直接丢弃不发送。
+"""
+
+import threading
+
+import numpy as np
+
+from config.logger import setup_logging
+from core.utils.metrics import metrics
+
+TAG = __name__
+logger = setup_logging()
+
+FRAME_MS = 60
+
+
+class SilenceSettings:
+    """静音裁剪的全局配置和统计"""
+
+    def __init__(self):
+        self.enabled = True
+        self.threshold = self._db_to_rms(-50)
+        self.max_leading_frames = 0
+        self.max_gap_frames = 5
+        self.dtx = False
+        self._lock = threading.Lock()
+        self.stats = {
+            "segments": 0,
+            "frames": 0,
+            "dropped_frames": 0,
+            "leading_trimmed_ms": 0,
+        }
+        metrics.register_collector("silence", self.snapshot)
+
+    @staticmethod
+    def _db_to_rms(db):
+        return 32768 * 10 ** (db / 20)
+
+    def configure(self, config):
+        """根据silence_trim配置初始化"""
+        config = config or {}
+        self.enabled = config.get("enabled", True)
+        self.threshold = self._db_to_rms(float(config.get("threshold_db", -50)))
+        self.max_leading_frames = int(config.get("max_leading_ms", 0)) // FRAME_MS
+        self.max_gap_frames = int(config.get("max_gap_ms", 300)) // FRAME_MS
+        self.dtx = bool(config.get("dtx", False))
+
+    def record(self, frames, dropped, leading):
+        with self._lock:
+            self.stats["segments"] += 1
+            self.stats["frames"] += frames
+            self.stats["dropped_frames"] += dropped
+            self.stats["leading_trimmed_ms"] += leading * FRAME_MS
+
+    def snapshot(self):
+        with self._lock:
+            result = dict(self.stats)
+        segments = result["segments"]
+        # 每段音频开头平均少等待的时间，即首个有声帧提前的时长
+        result["avg_leading_trimmed_ms"] = (
+            round(result["leading_trimmed_ms"] / segments, 1) if segments else 0
+        )
+        return result
+
+
+# 全局静音裁剪配置
+silence_settings = SilenceSettings()
+
+
+class SilenceTrimmer:
+    """单个音频流的静音裁剪状态，每段音频结束时调用finish"""
+
+    def __init__(self, settings=None):
+        self.settings = settings or silence_settings
+        self._reset()
+
+    def _reset(self):
+        self._voiced = False
+        self._silent_run = 0
+        self._frames = 0
+        self._dropped = 0
+        self._leading = 0
+
+    def is_silent(self, frame):
+        samples = np.frombuffer(frame, dtype=np.int16).astype(np.float32)
+        return float(np.sqrt(np.mean(samples * samples))) < self.settings.threshold
+
+    def keep(self, frame):
+        """判断一帧16位PCM是否需要发送"""
+        self._frames += 1
+        if not self.is_silent(frame):
+            self._voiced = True
+            self._silent_run = 0
+            return True
+        self._silent_run += 1
+        limit = (
+            self.settings.max_gap_frames
+            if self._voiced
+            else self.settings.max_leading_frames
+        )
+        if self._silent_run <= limit:
+            return True
+        self._dropped += 1
+        if not self._voiced:
+            self._leading += 1
+        return False
+
+    @property
+    def dropped(self):
+        return self._dropped
+
+    def finish(self):
+        """一段音频结束，记录统计并重置为段首状态"""
+        if self._frames:
+            self.settings.record(self._frames, self._dropped, self._leading)
+        self._reset()
@@ -26,24 +26,9 @@ EMOJI_MAP = {
 }
 
 
-def get_string_no_punctuation_or_emoji(s):
-    """去除字符串首尾的空格、标点符号和表情符号"""
-    chars = list(s)
-    # 处理开头的字符
-    start = 0
-    while start < len(chars) and is_punctuation_or_emoji(chars[start]):
-        start += 1
-    # 处理结尾的字符
-    end = len(chars) - 1
-    while end >= start and is_punctuation_or_emoji(chars[end]):
-        end -= 1
-    return "".join(chars[start : end + 1])
-
-
-def is_punctuation_or_emoji(char):
-    """检查字符是否为空格、指定标点或表情符号"""
-    # 定义需要去除的中英文标点（包括全角/半角）
-    punctuation_set = {
+# 需要去除的中英文标点（包括全角/半角）
+PUNCTUATION_SET = frozenset(
+    {
         "，",
         ",",  # 中文逗号 + 英文逗号
         "。",
@@ -63,20 +48,43 @@ def is_punctuation_or_emoji(char):
         "【",
         "】",  # 中文方括号
     }
-    if char.isspace() or char in punctuation_set:
+)
+EMOJI_RANGES = (
+    (0x1F600, 0x1F64F),
+    (0x1F300, 0x1F5FF),
+    (0x1F680, 0x1F6FF),
+    (0x1F900, 0x1F9FF),
+    (0x1FA70, 0x1FAFF),
+    (0x2600, 0x26FF),
+    (0x2700, 0x27BF),
+)
+
+
+def get_string_no_punctuation_or_emoji(s):
+    """去除字符串首尾的空格、标点符号和表情符号"""
+    # 处理开头的字符
+    start = 0
+    end = len(s)
+    while start < end and is_punctuation_or_emoji(s[start]):
+        start += 1
+    # 处理结尾的字符
+    while end > start and is_punctuation_or_emoji(s[end - 1]):
+        end -= 1
+    return s[start:end]
+
+
+def is_punctuation_or_emoji(char):
+    """检查字符是否为空格、指定标点或表情符号"""
+    if char.isspace() or char in PUNCTUATION_SET:
         return True
-    # 检查表情符号（保留原有逻辑）
+    # 检查表情符号
     code_point = ord(char)
-    emoji_ranges = [
-        (0x1F600, 0x1F64F),
-        (0x1F300, 0x1F5FF),
-        (0x1F680, 0x1F6FF),
-        (0x1F900, 0x1F9FF),
-        (0x1FA70, 0x1FAFF),
-        (0x2600, 0x26FF),
-        (0x2700, 0x27BF),
-    ]
-    return any(start <= code_point <= end for start, end in emoji_ranges)
+    if code_point < 0x2600:
+        return False
+    for start, end in EMOJI_RANGES:
+        if start <= code_point <= end:
+            return True
+    return False
 
 
 async def get_emotion(conn, text):
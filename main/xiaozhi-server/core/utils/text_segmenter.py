@@ -0,0 +1,349 @@
+"""
+流式文本分段：LLM每输出一段增量文本就送入分段器，分段器只扫描新增字符，
+边扫描边去除Markdown标记（代码块、标题、粗体/斜体、链接、图片、引用、列表、表格、公式），
+遇到断句标点时输出一段已清理、去除首尾标点和表情的文本。
+"""
+
+import re
+
+from core.utils.textUtils import get_string_no_punctuation_or_emoji
+
+# 表格分隔行，如 |---|:---:|
+_TABLE_SEPARATOR = re.compile(r"^\|?\s*:?-+:?\s*(\|\s*:?-+:?\s*)*\|?$")
+# 行内公式中出现这些字符时认为是公式，否则（如金额）保留$
+_FORMULA_CHARS = frozenset("abcdefghijklmnopqrstuvwxyzABCDEFGHIJKLMNOPQRSTUVWXYZ\\^_{}+-()[]=")
+# 行内公式最多等待这么多字符的闭合$，超过后认为$是普通字符（如货币符号）
+_FORMULA_WINDOW = 40
+# 需要向后看几个字符才能确定含义的标记字符
+_LOOKAHEAD = {"`": 2, "*": 1, "_": 1, "$": 1, "!": 1, "-": 1, "+": 1}
+
+_TEXT = 0
+_CODE_BLOCK = 1
+_FORMULA_BLOCK = 2
+_LINK_TEXT = 3
+_LINK_CLOSE = 4
+_LINK_URL = 5
+_INLINE_FORMULA = 6
+_TABLE_ROW = 7
+
+
+class StreamingSegmenter:
+    def __init__(self, first_punctuations, punctuations, max_pending=200):
+        """
+        Args:
+            first_punctuations: 第一段使用的断句标点（通常包含逗号，让首句尽快合成）
+            punctuations: 后续段落使用的断句标点
+            max_pending: 链接、公式等未闭合结构最多缓存的字符数，超过后按普通文本输出
+        """
+        self.first_punctuations = frozenset(first_punctuations)
+        self.punctuations = frozenset(punctuations)
+        self.max_pending = max_pending
+        # 第一段的最少字数和强制切分的字数预算，0表示不限制，由set_first_segment_limits设置
+        self.first_min_chars = 0
+        self.first_max_chars = 0
+        self.reset()
+
+    def set_first_segment_limits(self, min_chars=0, max_chars=0):
+        """设置第一段的长度限制：短于min_chars时遇到标点也不切分，超过max_chars时在词边界强制切分"""
+        self.first_min_chars = max(0, int(min_chars))
+        self.first_max_chars = max(0, int(max_chars))
+
+    def reset(self):
+        """新一轮对话开始时重置状态"""
+        self._raw = ""
+        self._out = []
+        self._segments = []
+        self._mode = _TEXT
+        self._line_start = True
+        self._last_newline = True
+        # 上一个已扫描的原始字符，已扫描的文本被丢弃后用于判断*的左侧
+        self._prev = "\n"
+        self._pending = []
+        self._is_image = False
+        self._url_length = 0
+        self._table_headers = None
+        self._table_rows = 0
+        self.is_first = True
+
+    def feed(self, text):
+        """输入增量文本，返回新产生的完整分段列表"""
+        if text:
+            self._raw += text
+            self._scan(final=False)
+        return self._take_segments()
+
+    def flush(self):
+        """输入结束，返回剩余文本组成的分段列表，并重置为首段状态"""
+        self._scan(final=True)
+        self._close_pending()
+        self._cut()
+        segments = self._take_segments()
+        self.reset()
+        return segments
+
+    def _take_segments(self):
+        segments, self._segments = self._segments, []
+        return segments
+
+    def _cut(self):
+        segment = get_string_no_punctuation_or_emoji("".join(self._out))
+        self._out = []
+        if segment:
+            self._segments.append(segment)
+
+    def _emit(self, char):
+        """输出一个已清理的字符，遇到断句标点时切分"""
+        if char == "\n":
+            if self._last_newline:
+                return
+            self._last_newline = True
+        else:
+            self._last_newline = False
+        self._out.append(char)
+        if not self.is_first:
+            if char in self.punctuations:
+                self._cut()
+            return
+        if char in self.first_punctuations:
+            if len(self._out) >= self.first_min_chars:
+                self._cut()
+                self.is_first = False
+        elif self.first_max_chars and len(self._out) >= self.first_max_chars:
+            self._force_cut()
+
+    def _force_cut(self):
+        """第一段超过字数预算仍没有标点时，在词边界处切分，不拆开英文单词"""
+        out = self._out
+        index = len(out)
+        while index > 0 and out[index - 1].isascii() and out[index - 1].isalnum():
+            index -= 1
+        if index == 0 and len(out) < self.first_max_chars * 2:
+            # 整段都是同一个单词，继续等待
+            return
+        if index == 0:
+            index = len(out)
+        rest = out[index:]
+        self._out = out[:index]
+        self._cut()
+        self._out = rest
+        self.is_first = False
+
+    def _emit_text(self, text):
+        for char in text:
+            self._emit(char)
+
+    def _scan(self, final):
+        raw = self._raw
+        length = len(raw)
+        i = 0
+        while i < length:
+            char = raw[i]
+            mode = self._mode
+            if mode == _TEXT:
+                need = _LOOKAHEAD.get(char, 0)
+                if need and i + need >= length and not final:
+                    # 标记字符后面的内容还没到，等下一次输入再判断
+                    break
+                i = self._scan_text(raw, i, length)
+            elif mode == _CODE_BLOCK:
+                if char == "`":
+                    if i + 2 >= length and not final:
+                        break
+                    if raw.startswith("```", i):
+                        self._mode = _TEXT
+                        i += 3
+                        continue
+                i += 1
+            elif mode == _FORMULA_BLOCK:
+                if char == "$":
+                    if i + 1 >= length and not final:
+                        break
+                    if raw.startswith("$$", i):
+                        self._mode = _TEXT
+                        i += 2
+                        continue
+                i += 1
+            elif mode == _LINK_TEXT:
+                i += 1
+                if char == "]":
+                    self._mode = _LINK_CLOSE
+                elif char == "\n" or len(self._pending) >= self.max_pending:
+                    self._close_pending()
+                    self._emit(char)
+                    self._line_start = char == "\n"
+                else:
+                    self._pending.append(char)
+            elif mode == _LINK_CLOSE:
+                # 读完]后必须紧跟(才是链接，否则按原文输出后重新处理当前字符
+                if char == "(":
+                    self._mode = _LINK_URL
+                    self._url_length = 0
+                    i += 1
+                else:
+                    self._close_pending()
+            elif mode == _LINK_URL:
+                i += 1
+                self._url_length += 1
+                if char == ")":
+                    text = "".join(self._pending)
+                    self._pending = []
+                    self._mode = _TEXT
+                    if not self._is_image:
+                        self._emit_text(text)
+                elif char == "\n" or self._url_length > self.max_pending:
+                    self._pending = []
+                    self._mode = _TEXT
+                    self._emit(char)
+                    self._line_start = char == "\n"
+            elif mode == _INLINE_FORMULA:
+                if char == "$":
+                    i += 1
+                    content = "".join(self._pending)
+                    self._pending = []
+                    self._mode = _TEXT
+                    if any(c in _FORMULA_CHARS for c in content):
+                        self._emit_text(content)
+                    else:
+                        self._emit_text(f"${content}$")
+                elif (
+                    char == "\n"
+                    or char in self.first_punctuations
+                    or char in self.punctuations
+                    or len(self._pending) >= min(_FORMULA_WINDOW, self.max_pending)
+                ):
+                    # 短距离内没有闭合的$，按普通文本输出，当前字符回到普通文本状态处理
+                    self._close_pending()
+                else:
+                    i += 1
+                    self._pending.append(char)
+            elif mode == _TABLE_ROW:
+                i += 1
+                if char == "\n":
+                    self._finish_table_row()
+                else:
+                    self._pending.append(char)
+        if i > 0:
+            self._prev = raw[i - 1]
+        self._raw = raw[i:]
+
+    def _scan_text(self, raw, i, length):
+        """处理普通文本状态下的一个字符，返回下一个位置"""
+        char = raw[i]
+        if self._line_start:
+            if char in " \t":
+                return i + 1
+            if char == "#":
+                # 标题：去掉#及后面的空格
+                while i < length and raw[i] == "#":
+                    i += 1
+                return i
+            if char == ">":
+                return i + 1
+            if char in "*+-" and i + 1 < length and raw[i + 1] == " ":
+                # 无序列表标记
+                return i + 2
+            if char == "|":
+                self._mode = _TABLE_ROW
+                self._pending = [char]
+                self._line_start = False
+                return i + 1
+            if char != "\n":
+                # 不是表格行，之前的表格结束
+                self._line_start = False
+                self._table_headers = None
+
+        if char == "\n":
+            self._line_start = True
+            self._emit(char)
+            return i + 1
+        if char == "`":
+            if raw.startswith("```", i):
+                self._mode = _CODE_BLOCK
+                return i + 3
+            return i + 1
+        if char == "*" or char == "_":
+            if i + 1 < length and raw[i + 1] == char:
+                return i + 2
+            if char == "*":
+                prev = raw[i - 1] if i > 0 else self._prev
+                following = raw[i + 1] if i + 1 < length else "\n"
+                if (prev.isdigit() and following.isdigit()) or (
+                    prev.isspace() and following.isspace()
+                ):
+                    # 乘号（3*4、a * b），不是强调标记
+                    self._emit(char)
+                return i + 1
+        if char == "$":
+            if i + 1 < length and raw[i + 1] == "$":
+                self._mode = _FORMULA_BLOCK
+                return i + 2
+            if i + 1 >= length or raw[i + 1].isdigit() or raw[i + 1].isspace():
+                # 货币金额（如$5）或单独的$，直接作为文本输出
+                self._emit(char)
+                return i + 1
+            self._mode = _INLINE_FORMULA
+            self._pending = []
+            return i + 1
+        if char == "!" and i + 1 < length and raw[i + 1] == "[":
+            self._mode = _LINK_TEXT
+            self._is_image = True
+            self._pending = []
+            return i + 2
+        if char == "[":
+            self._mode = _LINK_TEXT
+            self._is_image = False
+            self._pending = []
+            return i + 1
+        self._emit(char)
+        return i + 1
+
+    def _close_pending(self):
+        """未闭合的结构按原文输出"""
+        mode = self._mode
+        pending = self._pending
+        self._pending = []
+        self._mode = _TEXT
+        if mode in (_LINK_TEXT, _LINK_CLOSE):
+            prefix = "![" if self._is_image else "["
+            suffix = "]" if mode == _LINK_CLOSE else ""
+            self._emit_text(prefix + "".join(pending) + suffix)
+        elif mode == _LINK_URL:
+            # 链接地址不完整时只保留链接文字
+            if not self._is_image:
+                self._emit_text("".join(pending))
+        elif mode == _INLINE_FORMULA:
+            self._emit_text("$" + "".join(pending))
+        elif mode == _TABLE_ROW:
+            self._mode = _TABLE_ROW
+            self._pending = pending
+            self._finish_table_row()
+
+    def _finish_table_row(self):
+        """表格一行结束：第一行作为表头，后续行按“表头=值”的形式朗读"""
+        line = "".join(self._pending).strip()
+        self._pending = []
+        self._mode = _TEXT
+        self._line_start = True
+        if _TABLE_SEPARATOR.match(line):
+            return
+        cells = [cell.strip() for cell in line.split("|") if cell.strip()]
+        if not cells:
+            return
+        if self._table_headers is None:
+            self._table_headers = cells
+            self._table_rows = 0
+            row_text = f"表头是{', '.join(cells)}"
+        else:
+            self._table_rows += 1
+            values = [
+                f"{self._table_headers[index]} = {cell}"
+                if index < len(self._table_headers)
+                else cell
+                for index, cell in enumerate(cells)
+            ]
+            row_text = f"第{self._table_rows}行，{', '.join(values)}"
+        # 表格行内的逗号不断句，整行作为一段
+        self._out.extend(row_text)
+        self._last_newline = False
+        self._cut()
+        self.is_first = False
@@ -0,0 +1,212 @@
+import hashlib
+import json
+import os
+import re
+import threading
+from collections import OrderedDict
+
+from config.logger import setup_logging
+from core.utils import p3
+from core.utils.metrics import metrics
+
+TAG = __name__
+logger = setup_logging()
+
+_SPACE_RE = re.compile(r"\s+")
+
+
+class TTSCache:
+    """
+    TTS音频缓存：以(provider类型, 音色, 参数, 归一化文本)为key，缓存可直接发送的Opus帧列表。
+    内存为按字节数限制的LRU，磁盘以p3格式持久化；文本出现次数达到阈值才会写入缓存，
+    避免一次性的句子占用空间。
+    """
+
+    def __init__(self):
+        self.enabled = False
+        self.memory_max_bytes = 64 * 1024 * 1024
+        self.disk_dir = None
+        self.disk_max_bytes = 512 * 1024 * 1024
+        self.admit_count = 2
+        self.max_text_length = 60
+        self._memory = OrderedDict()
+        self._memory_bytes = 0
+        self._disk_index = OrderedDict()
+        self._disk_bytes = 0
+        self._frequency = OrderedDict()
+        self._frequency_max = 20000
+        self._lock = threading.Lock()
+        self.stats = {
+            "hits_memory": 0,
+            "hits_disk": 0,
+            "misses": 0,
+            "admissions": 0,
+            "evictions": 0,
+            "bytes_saved": 0,
+        }
+        metrics.register_collector("tts_cache", self.snapshot)
+
+    def configure(self, config):
+        """根据tts_cache配置初始化，并加载磁盘缓存索引"""
+        config = config or {}
+        self.enabled = config.get("enabled", True)
+        self.memory_max_bytes = int(config.get("memory_max_mb", 64)) * 1024 * 1024
+        self.disk_max_bytes = int(config.get("disk_max_mb", 512)) * 1024 * 1024
+        self.admit_count = max(1, int(config.get("admit_count", 2)))
+        self.max_text_length = int(config.get("max_text_length", 60))
+        self.disk_dir = config.get("disk_dir", "data/tts_cache") or None
+        if self.enabled and self.disk_dir:
+            self._load_disk_index()
+
+    def _load_disk_index(self):
+        files = []
+        if os.path.isdir(self.disk_dir):
+            for root, _, names in os.walk(self.disk_dir):
+                for name in names:
+                    if not name.endswith(".p3"):
+                        continue
+                    path = os.path.join(root, name)
+                    try:
+                        stat = os.stat(path)
+                    except OSError:
+                        continue
+                    files.append((stat.st_mtime, name[:-3], stat.st_size))
+        files.sort()
+        with self._lock:
+            self._disk_index.clear()
+            self._disk_bytes = 0
+            for _, key, size in files:
+                self._disk_index[key] = size
+                self._disk_bytes += size
+        if files:
+            logger.bind(tag=TAG).info(
+                f"TTS磁盘缓存已加载: {len(files)}条, {self._disk_bytes / 1024 / 1024:.1f}MB"
+            )
+
+    @staticmethod
+    def normalize_text(text):
+        return _SPACE_RE.sub(" ", text or "").strip()
+
+    def make_key(self, identity, text):
+        """根据provider标识和文本生成缓存key，文本过长或缓存关闭时返回None"""
+        if not self.enabled:
+            return None
+        text = self.normalize_text(text)
+        if not text or len(text) > self.max_text_length:
+            return None
+        raw = json.dumps([identity, text], ensure_ascii=False, sort_keys=True)
+        return hashlib.sha1(raw.encode("utf-8")).hexdigest()
+
+    def _disk_path(self, key):
+        return os.path.join(self.disk_dir, key[:2], f"{key}.p3")
+
+    @staticmethod
+    def _frames_bytes(frames):
+        return sum(len(frame) for frame in frames)
+
+    def get(self, key):
+        """查询缓存，命中返回Opus帧列表，未命中返回None并记录访问次数"""
+        if key is None:
+            return None
+        with self._lock:
+            frames = self._memory.get(key)
+            if frames is not None:
+                self._memory.move_to_end(key)
+                self.stats["hits_memory"] += 1
+                self.stats["bytes_saved"] += self._frames_bytes(frames)
+                return frames
+            on_disk = key in self._disk_index
+            if not on_disk:
+                self.stats["misses"] += 1
+                self._frequency[key] = self._frequency.get(key, 0) + 1
+                self._frequency.move_to_end(key)
+                while len(self._frequency) > self._frequency_max:
+                    self._frequency.popitem(last=False)
+                return None
+
+        try:
+            frames, _ = p3.decode_opus_from_file(self._disk_path(key))
+        except Exception as e:
+            logger.bind(tag=TAG).warning(f"读取TTS磁盘缓存失败: {e}")
+            with self._lock:
+                self._disk_bytes -= self._disk_index.pop(key, 0)
+                self.stats["misses"] += 1
+            return None
+
+        with self._lock:
+            if key in self._disk_index:
+                self._disk_index.move_to_end(key)
+            self.stats["hits_disk"] += 1
+            self.stats["bytes_saved"] += self._frames_bytes(frames)
+            self._put_memory(key, frames)
+        return frames
+
+    def put(self, key, frames):
+        """写入缓存，只有访问次数达到阈值的文本才会被收录"""
+        if key is None or not frames:
+            return
+        with self._lock:
+            if key in self._memory:
+                return
+            if self._frequency.get(key, 0) < self.admit_count:
+                return
+            self._frequency.pop(key, None)
+            self.stats["admissions"] += 1
+            self._put_memory(key, frames)
+        if self.disk_dir:
+            self._write_disk(key, frames)
+
+    def _put_memory(self, key, frames):
+        size = self._frames_bytes(frames)
+        if size > self.memory_max_bytes:
+            return
+        self._memory[key] = frames
+        self._memory_bytes += size
+        while self._memory_bytes > self.memory_max_bytes and self._memory:
+            _, evicted = self._memory.popitem(last=False)
+            self._memory_bytes -= self._frames_bytes(evicted)
+            self.stats["evictions"] += 1
+
+    def _write_disk(self, key, frames):
+        path = self._disk_path(key)
+        try:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            data = p3.encode_opus_to_bytes(frames)
+            tmp_path = f"{path}.tmp"
+            with open(tmp_path, "wb") as f:
+                f.write(data)
+            os.replace(tmp_path, path)
+        except Exception as e:
+            logger.bind(tag=TAG).warning(f"写入TTS磁盘缓存失败: {e}")
+            return
+
+        evict = []
+        with self._lock:
+            self._disk_bytes += len(data) - self._disk_index.pop(key, 0)
+            self._disk_index[key] = len(data)
+            while self._disk_bytes > self.disk_max_bytes and len(self._disk_index) > 1:
+                old_key, old_size = self._disk_index.popitem(last=False)
+                self._disk_bytes -= old_size
+                evict.append(old_key)
+        for old_key in evict:
+            try:
+                os.remove(self._disk_path(old_key))
+            except OSError:
+                pass
+
+    def snapshot(self):
+        with self._lock:
+            result = dict(self.stats)
+            lookups = result["hits_memory"] + result["hits_disk"] + result["misses"]
+            result["hit_rate"] = (
+                (result["hits_memory"] + result["hits_disk"]) / lookups if lookups else 0
+            )
+            result["memory_entries"] = len(self._memory)
+            result["memory_bytes"] = self._memory_bytes
+            result["disk_entries"] = len(self._disk_index)
+            result["disk_bytes"] = self._disk_bytes
+        return result
+
+
+# 全局TTS缓存，所有连接共享
+tts_cache = TTSCache()
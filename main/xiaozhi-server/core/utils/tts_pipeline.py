@@ -0,0 +1,149 @@
+import queue
+import threading
+import traceback
+from concurrent.futures import ThreadPoolExecutor
+
+from config.logger import setup_logging
+from core.utils.llm_latency import LatencyTracker
+from core.utils.metrics import metrics
+
+TAG = __name__
+logger = setup_logging()
+
+_DONE = object()
+
+# 句间播放间隙统计（秒），按TTS类型区分
+gap_tracker = LatencyTracker(window_size=500)
+
+
+def _gap_snapshot():
+    result = {}
+    for name, stats in gap_tracker.snapshot().items():
+        result[f"{name}_count"] = stats["count"]
+        for key in ("p50", "p95"):
+            if stats[key] is not None:
+                result[f"{name}_{key}_ms"] = round(stats[key] * 1000, 1)
+    return result
+
+
+metrics.register_collector("tts_gap", _gap_snapshot)
+
+# 每个TTS服务（类型+配置）的全局并发限制，所有连接共享
+_provider_slots = {}
+_provider_slots_lock = threading.Lock()
+
+
+def get_provider_slot(key, max_concurrency):
+    """获取TTS服务的并发信号量，max_concurrency<=0时不限制"""
+    if not max_concurrency or max_concurrency <= 0:
+        return None
+    with _provider_slots_lock:
+        slot = _provider_slots.get(key)
+        if slot is None:
+            slot = threading.BoundedSemaphore(max_concurrency)
+            _provider_slots[key] = slot
+        return slot
+
+
+def record_gap(name, seconds):
+    """记录一次句间间隙"""
+    gap_tracker.record(name, seconds)
+    metrics.inc("tts_sentence_gaps")
+    if seconds > 0.1:
+        metrics.inc("tts_sentence_stalls")
+
+
+class _SegmentJob:
+    """一段文本的合成结果，按提交顺序转发到播放队列"""
+
+    def __init__(self, pipeline, epoch):
+        self.pipeline = pipeline
+        self.epoch = epoch
+        self.items = queue.Queue()
+
+    @property
+    def cancelled(self):
+        return self.pipeline.is_stale(self)
+
+    def put(self, item):
+        self.items.put(item)
+
+    def done(self):
+        self.items.put(_DONE)
+
+
+class TTSPipeline:
+    """
+    非流式TTS的预合成流水线：同一连接最多lookahead段文本同时合成，
+    结果按提交顺序写入播放队列；打断或新一轮对话开始后，旧的任务结果直接丢弃。
+    """
+
+    def __init__(self, tts, lookahead, slot=None):
+        self.tts = tts
+        self.slot = slot
+        self.epoch = 0
+        self.jobs = queue.Queue()
+        self.executor = ThreadPoolExecutor(
+            max_workers=lookahead, thread_name_prefix="tts-lookahead"
+        )
+        self.forward_thread = threading.Thread(target=self._forward_loop, daemon=True)
+        self.forward_thread.start()
+
+    def new_epoch(self):
+        """新一轮对话开始，之前未完成的任务全部作废"""
+        self.epoch += 1
+
+    def is_stale(self, job):
+        return job.epoch != self.epoch or self.tts.conn.client_abort
+
+    def submit(self, func, *args):
+        """提交合成任务，func需接受output关键字参数，结果写入output"""
+        job = _SegmentJob(self, self.epoch)
+        self.jobs.put(job)
+        self.executor.submit(self._run, job, func, args)
+
+    def put(self, item):
+        """不需要合成的音频（文件、结束标记）也按顺序排队"""
+        job = _SegmentJob(self, self.epoch)
+        job.put(item)
+        job.done()
+        self.jobs.put(job)
+
+    def _run(self, job, func, args):
+        try:
+            if job.cancelled:
+                return
+            if self.slot is None:
+                func(*args, output=job)
+                return
+            with self.slot:
+                if not job.cancelled:
+                    func(*args, output=job)
+        except Exception as e:
+            logger.bind(tag=TAG).error(
+                f"预合成任务失败: {e}, 堆栈: {traceback.format_exc()}"
+            )
+        finally:
+            job.done()
+
+    def _forward_loop(self):
+        conn = self.tts.conn
+        while not conn.stop_event.is_set():
+            try:
+                job = self.jobs.get(timeout=1)
+            except queue.Empty:
+                continue
+            while not conn.stop_event.is_set():
+                if job.cancelled:
+                    break
+                try:
+                    item = job.items.get(timeout=0.1)
+                except queue.Empty:
+                    continue
+                if item is _DONE:
+                    break
+                self.tts.tts_audio_queue.put(item)
+
+    def close(self):
+        self.new_epoch()
+        self.executor.shutdown(wait=False, cancel_futures=True)
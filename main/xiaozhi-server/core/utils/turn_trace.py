@@ -0,0 +1,235 @@
+import json
+import os
+import queue
+import threading
+import time
+import uuid
+from collections import deque
+from datetime import datetime
+
+from config.logger import setup_logging
+
+TAG = __name__
+logger = setup_logging()
+
+
+class TurnTrace:
+    """单轮对话的耗时追踪，记录各阶段相对于语音结束的单调时间戳"""
+
+    def __init__(self, session_id, device_id=None, source="voice"):
+        self.turn_id = uuid.uuid4().hex[:12]
+        self.session_id = session_id
+        self.device_id = device_id
+        self.source = source
+        self.start = time.monotonic()
+        self.wall_start = time.time()
+        self.marks = []
+        self.finished = False
+        self._seen = set()
+        self._lock = threading.Lock()
+
+    def mark(self, stage, once=False, **extra):
+        """记录阶段时间点，once为True时同一阶段只记录第一次"""
+        with self._lock:
+            if self.finished or (once and stage in self._seen):
+                return
+            self._seen.add(stage)
+            item = {"stage": stage, "t_ms": self._elapsed_ms()}
+            if extra:
+                item.update(extra)
+            self.marks.append(item)
+
+    def _elapsed_ms(self):
+        return round((time.monotonic() - self.start) * 1000, 1)
+
+    def has(self, stage):
+        return stage in self._seen
+
+    def offset(self, stage):
+        """获取某阶段第一次出现的时间偏移（毫秒）"""
+        for item in self.marks:
+            if item["stage"] == stage:
+                return item["t_ms"]
+        return None
+
+    def finish(self, reason="done"):
+        with self._lock:
+            if self.finished:
+                return
+            self.marks.append(
+                {"stage": "finish", "t_ms": self._elapsed_ms(), "reason": reason}
+            )
+            self.finished = True
+        trace_recorder.record(self)
+
+    def to_dict(self):
+        return {
+            "turn_id": self.turn_id,
+            "session_id": self.session_id,
+            "device_id": self.device_id,
+            "source": self.source,
+            "start_time": datetime.fromtimestamp(self.wall_start).isoformat(
+                timespec="milliseconds"
+            ),
+            "stages": list(self.marks),
+        }
+
+
+class TraceRecorder:
+    """保存已完成的追踪：内存环形缓冲供HTTP查询，后台线程写入滚动JSONL文件"""
+
+    def __init__(self):
+        self.enabled = True
+        self.ring = deque(maxlen=500)
+        self.file_path = None
+        self.max_bytes = 10 * 1024 * 1024
+        self.backup_count = 3
+        self._queue = queue.Queue(maxsize=10000)
+        self._writer = None
+        self._lock = threading.Lock()
+
+    def configure(self, config):
+        """根据turn_trace配置初始化"""
+        config = config or {}
+        self.enabled = config.get("enabled", True)
+        self.ring = deque(self.ring, maxlen=int(config.get("ring_size", 500)))
+        self.file_path = config.get("file", "tmp/turn_trace.jsonl") or None
+        self.max_bytes = int(config.get("max_bytes", 10 * 1024 * 1024))
+        self.backup_count = int(config.get("backup_count", 3))
+
+    def record(self, trace):
+        if not self.enabled:
+            return
+        data = trace.to_dict()
+        self.ring.append(data)
+        if not self.file_path:
+            return
+        self._ensure_writer()
+        try:
+            self._queue.put_nowait(data)
+        except queue.Full:
+            pass
+
+    def recent(self, limit=50, session_id=None, device_id=None):
+        items = list(self.ring)
+        if session_id:
+            items = [item for item in items if item["session_id"] == session_id]
+        if device_id:
+            items = [item for item in items if item["device_id"] == device_id]
+        return items[-limit:] if limit else items
+
+    def summary(self, items=None):
+        """统计各阶段时间偏移的p50/p95（毫秒）"""
+        items = self.recent(limit=0) if items is None else items
+        stages = {}
+        for item in items:
+            seen = set()
+            for mark in item["stages"]:
+                if mark["stage"] in seen:
+                    continue
+                seen.add(mark["stage"])
+                stages.setdefault(mark["stage"], []).append(mark["t_ms"])
+        result = {}
+        for stage, values in stages.items():
+            values.sort()
+            result[stage] = {
+                "count": len(values),
+                "p50": values[len(values) // 2],
+                "p95": values[min(len(values) - 1, int(len(values) * 0.95))],
+            }
+        return result
+
+    def _ensure_writer(self):
+        if self._writer is not None:
+            return
+        with self._lock:
+            if self._writer is None:
+                self._writer = threading.Thread(target=self._write_loop, daemon=True)
+                self._writer.start()
+
+    def _rotate(self):
+        for i in range(self.backup_count - 1, 0, -1):
+            src = f"{self.file_path}.{i}"
+            if os.path.exists(src):
+                os.replace(src, f"{self.file_path}.{i + 1}")
+        if self.backup_count > 0:
+            os.replace(self.file_path, f"{self.file_path}.1")
+        else:
+            os.remove(self.file_path)
+
+    def _write_loop(self):
+        while True:
+            data = self._queue.get()
+            try:
+                directory = os.path.dirname(self.file_path)
+                if directory:
+                    os.makedirs(directory, exist_ok=True)
+                if (
+                    os.path.exists(self.file_path)
+                    and os.path.getsize(self.file_path) >= self.max_bytes
+                ):
+                    self._rotate()
+                with open(self.file_path, "a", encoding="utf-8") as f:
+                    f.write(json.dumps(data, ensure_ascii=False) + "\n")
+                    # 顺便写入队列中积压的记录
+                    while not self._queue.empty():
+                        pending = self._queue.get_nowait()
+                        f.write(json.dumps(pending, ensure_ascii=False) + "\n")
+            except Exception as e:
+                logger.bind(tag=TAG).error(f"写入耗时追踪文件失败: {e}")
+
+
+# 全局追踪记录器
+trace_recorder = TraceRecorder()
+
+
+def start_turn(conn, source="voice"):
+    """开始新一轮追踪，上一轮未结束的追踪标记为被打断"""
+    previous = getattr(conn, "turn_trace", None)
+    if previous is not None and not previous.finished:
+        previous.finish("interrupted")
+    trace = TurnTrace(
+        conn.session_id,
+        conn.headers.get("device-id") if getattr(conn, "headers", None) else None,
+        source,
+    )
+    conn.turn_trace = trace
+    return trace
+
+
+def ensure_turn(conn, source="text"):
+    """文本输入等没有经过语音结束的对话，在开始聊天时创建追踪"""
+    trace = getattr(conn, "turn_trace", None)
+    if trace is None or trace.finished or trace.has("chat_start"):
+        trace = start_turn(conn, source)
+    return trace
+
+
+def mark(conn, stage, once=False, **extra):
+    """在连接当前的追踪上记录阶段时间点"""
+    trace = getattr(conn, "turn_trace", None)
+    if trace is not None:
+        trace.mark(stage, once=once, **extra)
+
+
+def abort_turn(conn):
+    """打断时结束正在播报的追踪，尚未开始聊天的新一轮不受影响"""
+    trace = getattr(conn, "turn_trace", None)
+    if trace is not None and not trace.finished and trace.has("chat_start"):
+        trace.mark("abort")
+        trace.finish("abort")
+
+
+def finish_turn(conn, reason="done"):
+    """结束当前追踪并输出各阶段耗时"""
+    trace = getattr(conn, "turn_trace", None)
+    if trace is None or trace.finished:
+        return
+    trace.finish(reason)
+    first_audio = trace.offset("first_audio_sent")
+    if first_audio is not None:
+        logger.bind(tag=TAG).info(
+            f"本轮耗时({trace.turn_id}): asr={trace.offset('asr_done')}ms, "
+            f"llm首token={trace.offset('llm_first_token')}ms, "
+            f"首个音频={trace.offset('tts_audio_ready')}ms, 首帧发送={first_audio}ms"
+        )
@@ -0,0 +1,205 @@
+"""
+流式TTS上游连接的进程级管理：同一账号的访问Token全局共享，过期前统一刷新；
+会话正常结束的websocket连接归还到连接池，供任意设备的下一轮对话复用，
+避免每个设备各自占用一条空闲连接，也省去新一轮对话的建连和鉴权耗时。
+火山引擎和阿里云的双流式协议同一连接同时只能进行一个会话，连接在会话之间复用。
+"""
+
+import asyncio
+import threading
+import time
+
+from websockets.protocol import State
+
+from config.logger import setup_logging
+from core.utils.metrics import metrics
+
+TAG = __name__
+logger = setup_logging()
+
+
+class TokenManager:
+    """按账号缓存访问Token，同一账号的所有连接共用，过期前refresh_margin秒刷新"""
+
+    def __init__(self, refresh_margin=60):
+        self.refresh_margin = refresh_margin
+        self._tokens = {}
+        self._refreshing = {}
+        self._lock = threading.Lock()
+        self.stats = {"refreshed": 0, "shared": 0}
+
+    def _valid(self, entry):
+        if entry is None:
+            return False
+        expire_at = entry[1]
+        return expire_at is None or time.time() < expire_at - self.refresh_margin
+
+    def get(self, key, fetch):
+        """
+        获取账号的Token，fetch()返回(token, 过期时间戳或None)。
+        同一账号同时只有一个线程在刷新，其余线程等待后直接使用刷新结果
+        """
+        with self._lock:
+            entry = self._tokens.get(key)
+            if self._valid(entry):
+                self.stats["shared"] += 1
+                return entry[0]
+            refreshing = self._refreshing.setdefault(key, threading.Lock())
+        with refreshing:
+            with self._lock:
+                entry = self._tokens.get(key)
+                if self._valid(entry):
+                    self.stats["shared"] += 1
+                    return entry[0]
+            token, expire_at = fetch()
+            if not token:
+                raise ValueError("无法获取有效的访问Token")
+            with self._lock:
+                self._tokens[key] = (token, expire_at)
+                self.stats["refreshed"] += 1
+            return token
+
+    def invalidate(self, key):
+        """Token被上游拒绝时丢弃，下次重新获取"""
+        with self._lock:
+            self._tokens.pop(key, None)
+
+    def snapshot(self):
+        with self._lock:
+            result = dict(self.stats)
+            result["accounts"] = len(self._tokens)
+        return result
+
+
+class _IdleConnection:
+    __slots__ = ("ws", "loop", "expires")
+
+    def __init__(self, ws, loop, expires):
+        self.ws = ws
+        self.loop = loop
+        self.expires = expires
+
+
+class UpstreamPool:
+    """按账号（服务地址+凭据）缓存空闲的上游websocket连接"""
+
+    def __init__(self):
+        self.enabled = True
+        self.max_idle = 4
+        self.idle_timeout = 30.0
+        self._idle = {}
+        self._closing = set()
+        self._lock = threading.Lock()
+        self.stats = {"created": 0, "reused": 0, "released": 0, "discarded": 0}
+        metrics.register_collector("upstream_pool", self.snapshot)
+
+    def configure(self, config):
+        """根据upstream_pool配置初始化"""
+        config = config or {}
+        self.enabled = config.get("enabled", True)
+        self.max_idle = int(config.get("max_idle_per_account", 4))
+        self.idle_timeout = float(config.get("idle_timeout", 30))
+
+    @staticmethod
+    def _is_open(ws):
+        return getattr(ws, "state", None) is State.OPEN
+
+    async def acquire(self, key, connect):
+        """取一条可用连接：优先复用当前事件循环中空闲未超时的连接，否则调用connect()新建"""
+        loop = asyncio.get_running_loop()
+        now = time.monotonic()
+        expired = []
+        reused = None
+        with self._lock:
+            idle = self._idle.get(key, [])
+            while idle:
+                entry = idle.pop()
+                if (
+                    entry.loop is loop
+                    and now < entry.expires
+                    and self._is_open(entry.ws)
+                ):
+                    reused = entry.ws
+                    self.stats["reused"] += 1
+                    break
+                expired.append(entry)
+            if reused is None:
+                self.stats["created"] += 1
+        for entry in expired:
+            self._close(entry.ws, entry.loop)
+        if reused is not None:
+            return reused
+        return await connect()
+
+    def release(self, key, ws, idle_timeout=None):
+        """
+        会话正常结束后归还连接，连接池已满或连接已断开时直接关闭。
+        idle_timeout为上游服务的空闲断开时间，不传则使用配置值
+        """
+        if ws is None:
+            return
+        loop = asyncio.get_running_loop()
+        if not self.enabled or not self._is_open(ws):
+            self.discard(ws)
+            return
+        timeout = self.idle_timeout if idle_timeout is None else idle_timeout
+        now = time.monotonic()
+        evicted = []
+        with self._lock:
+            idle = self._idle.setdefault(key, [])
+            idle.append(_IdleConnection(ws, loop, now + timeout))
+            self.stats["released"] += 1
+            if len(idle) > self.max_idle:
+                evicted.append(idle.pop(0))
+            # 顺便清理所有账号中已超时的空闲连接，不再占用上游资源
+            for connections in self._idle.values():
+                alive = [entry for entry in connections if now < entry.expires]
+                if len(alive) != len(connections):
+                    evicted.extend(
+                        entry for entry in connections if now >= entry.expires
+                    )
+                    connections[:] = alive
+        for entry in evicted:
+            self._close(entry.ws, entry.loop)
+
+    def discard(self, ws):
+        """关闭不能复用的连接（会话异常、打断等）"""
+        with self._lock:
+            self.stats["discarded"] += 1
+        try:
+            self._close(ws, asyncio.get_running_loop())
+        except RuntimeError:
+            pass
+
+    def _close(self, ws, loop):
+        if loop.is_closed():
+            return
+        try:
+            if loop is asyncio.get_running_loop():
+                task = loop.create_task(self._close_quietly(ws))
+                self._closing.add(task)
+                task.add_done_callback(self._closing.discard)
+                return
+        except RuntimeError:
+            pass
+        asyncio.run_coroutine_threadsafe(self._close_quietly(ws), loop)
+
+    @staticmethod
+    async def _close_quietly(ws):
+        try:
+            await ws.close()
+        except Exception:
+            pass
+
+    def snapshot(self):
+        with self._lock:
+            result = dict(self.stats)
+            result["idle"] = sum(len(idle) for idle in self._idle.values())
+        for name, value in upstream_tokens.snapshot().items():
+            result[f"token_{name}"] = value
+        return result
+
+
+# 全局上游Token管理和连接池，所有设备共享
+upstream_tokens = TokenManager()
+upstream_pool = UpstreamPool()
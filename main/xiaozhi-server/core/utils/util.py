@@ -6,10 +6,10 @@ import os
 import wave
 from io import BytesIO
 from core.utils import p3
-import numpy as np
 import requests
 import opuslib_next
-from pydub import AudioSegment
+from core.utils.audio_decode import decode_audio_bytes, decode_audio_file
+from core.utils.opus_encoder_utils import OpusEncoderUtils
 import copy
 
 TAG = __name__
@@ -211,74 +211,82 @@ def extract_json_from_string(input_string):
     return None
 
 
-def audio_to_data(audio_file_path, is_opus=True):
-    # 获取文件后缀名
-    file_type = os.path.splitext(audio_file_path)[1]
-    if file_type:
-        file_type = file_type.lstrip(".")
-    # 读取音频文件，-nostdin 参数：不要从标准输入读取数据，否则FFmpeg会阻塞
-    audio = AudioSegment.from_file(
-        audio_file_path, format=file_type, parameters=["-nostdin"]
-    )
-
-    # 转换为单声道/16kHz采样率/16位小端编码（确保与编码器匹配）
-    audio = audio.set_channels(1).set_frame_rate(16000).set_sample_width(2)
+def audio_to_data(audio_file_path, is_opus=True, trim_silence=False):
+    # 解码为单声道/16kHz采样率/16位小端编码（确保与编码器匹配），wav/mp3在进程内完成，其余格式使用ffmpeg
+    raw_data = decode_audio_file(audio_file_path)
 
     # 音频时长(秒)
-    duration = len(audio) / 1000.0
-
-    # 获取原始PCM数据（16位小端）
-    raw_data = audio.raw_data
-    return pcm_to_data(raw_data, is_opus), duration
+    duration = len(raw_data) / 2 / 16000
+    return pcm_to_data(raw_data, is_opus, trim_silence), duration
 
 
-def audio_bytes_to_data(audio_bytes, file_type, is_opus=True):
+def audio_bytes_to_data(
+    audio_bytes, file_type, is_opus=True, sample_rate=None, trim_silence=False
+):
     """
-    直接用音频二进制数据转为opus/pcm数据，支持wav、mp3、p3
+    直接用音频二进制数据转为opus/pcm数据，支持wav、mp3、p3、pcm
+    file_type为pcm时，sample_rate为裸PCM的采样率（16位单声道）
+    trim_silence为True时按silence_trim配置裁剪静音帧（仅Opus）
     """
     if file_type == "p3":
         # 直接用p3解码
         return p3.decode_opus_from_bytes(audio_bytes)
-    else:
-        # 其他格式用pydub
-        audio = AudioSegment.from_file(
-            BytesIO(audio_bytes), format=file_type, parameters=["-nostdin"]
-        )
-        audio = audio.set_channels(1).set_frame_rate(16000).set_sample_width(2)
-        duration = len(audio) / 1000.0
-        raw_data = audio.raw_data
-        return pcm_to_data(raw_data, is_opus), duration
-
+    raw_data = decode_audio_bytes(audio_bytes, file_type, sample_rate)
+    duration = len(raw_data) / 2 / 16000
+    return pcm_to_data(raw_data, is_opus, trim_silence), duration
 
-def pcm_to_data(raw_data, is_opus=True):
-    # 初始化Opus编码器
-    encoder = opuslib_next.Encoder(16000, 1, opuslib_next.APPLICATION_AUDIO)
 
-    # 编码参数
-    frame_duration = 60  # 60ms per frame
-    frame_size = int(16000 * frame_duration / 1000)  # 960 samples/frame
-
-    datas = []
-    # 按帧处理所有音频数据（包括最后一帧可能补零）
-    for i in range(0, len(raw_data), frame_size * 2):  # 16bit=2bytes/sample
-        # 获取当前帧的二进制数据
-        chunk = raw_data[i : i + frame_size * 2]
+def pcm_to_data(raw_data, is_opus=True, trim_silence=False):
+    """把16kHz单声道PCM按60ms分帧，编码为Opus或保留PCM，最后一帧补零"""
+    encoder = PcmFrameEncoder(is_opus, trim_silence=trim_silence)
+    try:
+        return encoder.encode(raw_data) + encoder.flush()
+    finally:
+        encoder.close()
 
-        # 如果最后一帧不足，补零
-        if len(chunk) < frame_size * 2:
-            chunk += b"\x00" * (frame_size * 2 - len(chunk))
 
-        if is_opus:
-            # 转换为numpy数组处理
-            np_frame = np.frombuffer(chunk, dtype=np.int16)
-            # 编码Opus数据
-            frame_data = encoder.encode(np_frame.tobytes(), frame_size)
-        else:
-            frame_data = chunk if isinstance(chunk, bytes) else bytes(chunk)
+class PcmFrameEncoder:
+    """增量编码：累积16kHz单声道PCM，按60ms帧输出Opus/PCM帧，结束时最后一帧补零"""
 
-        datas.append(frame_data)
+    frame_size = 960  # 60ms per frame
 
-    return datas
+    def __init__(self, is_opus=True, signal="voice", trim_silence=False):
+        self.is_opus = is_opus
+        # Opus编码器从全局池中取用，close时归还
+        self.encoder = (
+            OpusEncoderUtils(16000, 1, 60, signal=signal, trim_silence=trim_silence)
+            if is_opus
+            else None
+        )
+        self._pending = bytearray()
+
+    def encode(self, raw_data):
+        """输入PCM数据，返回已凑满的完整帧"""
+        if self.is_opus:
+            return self.encoder.encode_pcm_to_opus(raw_data, False)
+        self._pending += raw_data
+        frame_bytes = self.frame_size * 2
+        usable = len(self._pending) - len(self._pending) % frame_bytes
+        datas = [
+            bytes(self._pending[i : i + frame_bytes])
+            for i in range(0, usable, frame_bytes)
+        ]
+        del self._pending[:usable]
+        return datas
+
+    def flush(self):
+        """输出剩余不足一帧的数据（补零）"""
+        if self.is_opus:
+            return self.encoder.encode_pcm_to_opus(b"", True)
+        if not self._pending:
+            return []
+        chunk = bytes(self._pending) + b"\x00" * (self.frame_size * 2 - len(self._pending))
+        self._pending.clear()
+        return [chunk]
+
+    def close(self):
+        if self.encoder is not None:
+            self.encoder.close()
 
 
 def opus_datas_to_wav_bytes(opus_datas, sample_rate=16000, channels=1):
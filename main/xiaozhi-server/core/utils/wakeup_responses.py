@@ -0,0 +1,216 @@
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from config.logger import setup_logging
+from core.utils.audio_assets import audio_assets
+from core.utils.llm_scheduler import Priority, use_priority
+from core.utils.metrics import metrics
+from core.utils.util import audio_to_data, opus_datas_to_wav_bytes
+from core.utils.wakeup_word import WakeupWordsConfig
+
+TAG = __name__
+logger = setup_logging()
+
+WAKEUP_WORDS = ["你好", "你好啊", "嘿，你好", "嗨"]
+
+DEFAULT_FILE = "config/assets/wakeup_words.wav"
+DEFAULT_TEXT = "哈啰啊，我是小智啦，声音好听的台湾女孩一枚，超开心认识你耶，最近在忙啥，别忘了给我来点有趣的料哦，我超爱听八卦的啦"
+
+
+class _Response:
+    __slots__ = ("voice", "text", "frames", "time")
+
+    def __init__(self, voice, text, frames, created):
+        self.voice = voice
+        self.text = text
+        self.frames = frames
+        self.time = created
+
+
+def voice_of(tts):
+    """TTS当前使用的音色，作为唤醒词回复的缓存键"""
+    voice = getattr(tts, "voice", None)
+    return str(voice) if voice not in (None, "") else "default"
+
+
+def create_tts(config):
+    """
+    创建后台合成专用的TTS实例。连接的TTS实例的编码器等状态由播放线程使用，连接关闭后还会归还，
+    不能在后台线程里调用；这里固定删除音频文件，使to_tts返回Opus帧列表
+    """
+    from core.utils import tts
+
+    select_tts_module = config["selected_module"]["TTS"]
+    tts_config = config["TTS"][select_tts_module]
+    return tts.create_instance(
+        tts_config.get("type", select_tts_module), tts_config, True
+    )
+
+
+def synthesize(tts, text):
+    """用专用TTS实例合成一句话，返回Opus帧列表"""
+    frames = tts.to_tts(text)
+    if not isinstance(frames, list) or not frames:
+        raise ValueError("TTS未返回音频")
+    return frames
+
+
+class WakeupResponseCache:
+    """
+    唤醒词回复的内存缓存：每个音色一条已编码为Opus帧的回复。
+    启动时加载已保存的回复并为默认配置的音色合成，连接的音色首次出现或回复超过refresh_interval时
+    在后台线程重新生成（LLM生成文本+TTS合成）并写回磁盘。播放时只做一次字典查找，没有文件读写和锁。
+    """
+
+    def __init__(self):
+        self.enabled = True
+        self.refresh_interval = 300.0
+        self.default_file = DEFAULT_FILE
+        self.default_text = DEFAULT_TEXT
+        self._responses = {}
+        self._default = _Response("default", DEFAULT_TEXT, [], 0)
+        self._pending = set()
+        # 按音色缓存的后台合成专用TTS实例
+        self._tts = {}
+        self._lock = threading.Lock()
+        self._executor = ThreadPoolExecutor(
+            max_workers=2, thread_name_prefix="wakeup-response"
+        )
+        self._store = None
+        self.stats = {"hits": 0, "fallbacks": 0, "generated": 0, "failed": 0}
+        metrics.register_collector("wakeup_responses", self.snapshot)
+
+    def configure(self, config):
+        """根据wakeup_response配置初始化，在后台加载已保存的回复并为默认音色预合成"""
+        settings = config.get("wakeup_response") or {}
+        self.enabled = bool(config.get("enable_wakeup_words_response_cache", True))
+        self.refresh_interval = float(settings.get("refresh_interval", 300))
+        self.default_file = settings.get("default_file") or DEFAULT_FILE
+        self.default_text = settings.get("default_text") or DEFAULT_TEXT
+        self._default = _Response(
+            "default", self.default_text, audio_assets.get(self.default_file), 0
+        )
+        if not self.enabled:
+            return
+        self._store = WakeupWordsConfig()
+        self._executor.submit(self._warm_up, config)
+
+    def _warm_up(self, config):
+        started = time.monotonic()
+        for entry in self._store.all_responses():
+            voice = str(entry.get("voice", ""))
+            if not voice or voice in self._responses:
+                continue
+            try:
+                frames, _ = audio_to_data(entry["file_path"])
+            except Exception as e:
+                logger.bind(tag=TAG).warning(f"加载唤醒词回复失败: {voice}, {e}")
+                continue
+            self._responses[voice] = _Response(
+                voice, entry.get("text", ""), frames, entry.get("time", 0)
+            )
+        logger.bind(tag=TAG).info(
+            f"唤醒词回复已加载: {len(self._responses)}个音色, "
+            f"耗时{time.monotonic() - started:.2f}s"
+        )
+
+        # 默认配置的音色还没有回复时，先用默认文本合成一条，LLM生成的回复等设备连接后再替换
+        try:
+            tts = create_tts(config)
+        except Exception as e:
+            logger.bind(tag=TAG).warning(f"初始化TTS失败，跳过唤醒词回复预合成: {e}")
+            return
+        voice = voice_of(tts)
+        self._tts.setdefault(voice, tts)
+        if voice in self._responses or not self._claim(voice):
+            return
+        self._generate(config, None, None, voice)
+
+    def get(self, voice):
+        """获取音色的唤醒词回复，没有时返回默认回复"""
+        response = self._responses.get(voice)
+        if response is not None and response.frames:
+            self.stats["hits"] += 1
+            return response
+        self.stats["fallbacks"] += 1
+        return self._default
+
+    def ensure(self, conn):
+        """连接的音色没有回复或回复已过期时，在后台为该音色生成新的回复"""
+        if not self.enabled or self._store is None or conn.tts is None:
+            return
+        voice = voice_of(conn.tts)
+        response = self._responses.get(voice)
+        if response is not None and time.time() - response.time < self.refresh_interval:
+            return
+        if not self._claim(voice):
+            return
+        # 只传配置，合成用专用的TTS实例，不使用连接的conn.tts
+        self._executor.submit(
+            self._generate, conn.config, conn.llm, conn.config.get("prompt"), voice
+        )
+
+    def _claim(self, voice):
+        with self._lock:
+            if voice in self._pending:
+                return False
+            self._pending.add(voice)
+            return True
+
+    def _generate(self, config, llm, prompt, voice):
+        try:
+            text = self._response_text(llm, prompt)
+            tts = self._tts.get(voice)
+            if tts is None:
+                tts = self._tts[voice] = create_tts(config)
+            frames = synthesize(tts, text)
+            # 默认文本的回复标记为已过期，设备连接后由LLM生成的回复替换
+            created = time.time() if llm is not None else 0
+            self._responses[voice] = _Response(voice, text, frames, created)
+            self.stats["generated"] += 1
+            logger.bind(tag=TAG).info(f"唤醒词回复已更新: {voice}, {text}")
+            self._persist(voice, text, frames)
+        except Exception as e:
+            self.stats["failed"] += 1
+            logger.bind(tag=TAG).warning(f"生成唤醒词回复失败: {voice}, {e}")
+        finally:
+            with self._lock:
+                self._pending.discard(voice)
+
+    def _response_text(self, llm, prompt):
+        if llm is None or not prompt:
+            return self.default_text
+        wakeup_word = random.choice(WAKEUP_WORDS)
+        question = (
+            "此刻用户正在和你说```"
+            + wakeup_word
+            + "```。\n请你根据以上用户的内容进行20-30字回复。要符合系统设置的角色情感和态度，不要像机器人一样说话。\n"
+            + "请勿对这条内容本身进行任何解释和回应，请勿返回表情符号，仅返回对用户的内容的回复。"
+        )
+        # 后台生成，不占用用户对话的LLM配额
+        with use_priority(Priority.BACKGROUND):
+            result = llm.response_no_stream(prompt, question)
+        return result or self.default_text
+
+    def _persist(self, voice, text, frames):
+        """写回磁盘，重启后无需重新生成"""
+        try:
+            file_path = self._store.generate_file_path(voice)
+            with open(file_path, "wb") as f:
+                f.write(opus_datas_to_wav_bytes(frames, sample_rate=16000))
+            self._store.update_wakeup_response(voice, file_path, text)
+        except Exception as e:
+            logger.bind(tag=TAG).warning(f"保存唤醒词回复失败: {voice}, {e}")
+
+    def snapshot(self):
+        result = dict(self.stats)
+        result["voices"] = len(self._responses)
+        with self._lock:
+            result["pending"] = len(self._pending)
+        return result
+
+
+# 全局唤醒词回复缓存
+wakeup_responses = WakeupResponseCache()
@@ -4,7 +4,7 @@ import yaml
 import time
 import hashlib
 import portalocker
-from typing import Dict
+from typing import Dict, List
 
 
 class FileLock:
@@ -100,6 +100,15 @@ class WakeupWordsConfig:
 
         return config[voice]
 
+    def all_responses(self) -> List[Dict]:
+        """获取所有音色的有效唤醒词回复配置"""
+        config = self._load_config() or {}
+        return [
+            entry
+            for entry in config.values()
+            if entry and self.get_wakeup_response(str(entry.get("voice", "")))
+        ]
+
     def update_wakeup_response(self, voice: str, file_path: str, text: str):
         """更新唤醒词回复配置"""
         try:
@@ -0,0 +1,73 @@
+import argparse
+import logging
+import os
+import time
+
+from tabulate import tabulate
+
+from core.utils.audio_decode import decode_audio_bytes, decode_with_ffmpeg
+from core.utils.util import pcm_to_data
+
+# 设置全局日志级别为WARNING，抑制INFO级别日志
+logging.basicConfig(level=logging.WARNING)
+
+
+def load_samples(asset_dir):
+    """读取资源目录下的wav/mp3作为测试句子"""
+    samples = []
+    for file_name in sorted(os.listdir(asset_dir)):
+        file_type = os.path.splitext(file_name)[1].lstrip(".").lower()
+        if file_type not in ("wav", "mp3"):
+            continue
+        with open(os.path.join(asset_dir, file_name), "rb") as f:
+            samples.append((file_name, file_type, f.read()))
+    return samples
+
+
+def bench(decode, data, file_type, rounds):
+    """返回每秒可处理的句子数（单核），包含解码与Opus编码"""
+    start = time.process_time()
+    for _ in range(rounds):
+        pcm_to_data(decode(data, file_type), is_opus=True)
+    # 子进程的CPU时间不计入process_time，ffmpeg路径同时统计墙钟时间
+    return rounds / max(time.process_time() - start, 1e-9)
+
+
+def bench_wall(decode, data, file_type, rounds):
+    start = time.perf_counter()
+    for _ in range(rounds):
+        pcm_to_data(decode(data, file_type), is_opus=True)
+    return rounds / max(time.perf_counter() - start, 1e-9)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="TTS音频解码性能测试")
+    parser.add_argument("--dir", default="config/assets", help="测试音频目录")
+    parser.add_argument("--rounds", type=int, default=20, help="每个文件的测试轮数")
+    args = parser.parse_args()
+
+    rows = []
+    for name, file_type, data in load_samples(args.dir):
+        in_process = bench_wall(decode_audio_bytes, data, file_type, args.rounds)
+        in_process_cpu = bench(decode_audio_bytes, data, file_type, args.rounds)
+        ffmpeg = bench_wall(decode_with_ffmpeg, data, file_type, args.rounds)
+        rows.append(
+            [
+                name,
+                f"{in_process:.1f}",
+                f"{in_process_cpu:.1f}",
+                f"{ffmpeg:.1f}",
+                f"{in_process / ffmpeg:.1f}x",
+            ]
+        )
+    print(
+        tabulate(
+            rows,
+            headers=["文件", "进程内(句/秒)", "进程内(句/秒/核)", "ffmpeg(句/秒)", "提升"],
+            tablefmt="github",
+        )
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,108 @@
+import argparse
+import statistics
+import threading
+import time
+
+from tabulate import tabulate
+
+from config.settings import load_config
+from core.providers.tts.sherpa_onnx_local import get_engine
+
+SENTENCES = [
+    "你好，我是小智。",
+    "今天天气不错，适合出去走走。",
+    "请用一百字概括量子计算的基本原理和应用前景，并举一个实际的例子。",
+    "好的，已经帮你把客厅的灯打开了。",
+]
+
+
+def run(engine, concurrency, rounds):
+    """concurrency个连接同时发起合成，每个连接依次合成rounds句"""
+    first_chunk = []
+    audio_seconds = [0.0]
+    lock = threading.Lock()
+
+    def client(index):
+        for i in range(rounds):
+            text = SENTENCES[(index + i) % len(SENTENCES)]
+            started = time.monotonic()
+            marked = []
+
+            def on_chunk(pcm):
+                if not marked:
+                    marked.append(time.monotonic() - started)
+
+            request = engine.submit(text, on_chunk=on_chunk)
+            pcm = request.future.result()
+            with lock:
+                first_chunk.extend(marked)
+                audio_seconds[0] += len(pcm) / 2 / engine.sample_rate
+
+    threads = [
+        threading.Thread(target=client, args=(i,)) for i in range(concurrency)
+    ]
+    wall_start = time.monotonic()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    wall = time.monotonic() - wall_start
+    first_chunk.sort()
+    return {
+        "audio": audio_seconds[0],
+        "wall": wall,
+        "p50": statistics.median(first_chunk),
+        "p95": first_chunk[min(len(first_chunk) - 1, int(len(first_chunk) * 0.95))],
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="本地sherpa-onnx TTS实时率测试")
+    parser.add_argument("--tts", default="SherpaOnnxTTS", help="config.yaml中TTS的名称")
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 4, 16])
+    parser.add_argument("--rounds", type=int, default=4, help="每个连接合成的句数")
+    args = parser.parse_args()
+
+    config = load_config()["TTS"][args.tts]
+    engine = get_engine(config)
+    # 预热
+    engine.submit(SENTENCES[0]).future.result()
+
+    rows = []
+    for concurrency in args.concurrency:
+        before = dict(engine.stats)
+        result = run(engine, concurrency, args.rounds)
+        after = dict(engine.stats)
+        compute = after["compute_seconds"] - before["compute_seconds"]
+        audio = after["audio_seconds"] - before["audio_seconds"]
+        rows.append(
+            [
+                concurrency,
+                f"{result['audio']:.1f}",
+                f"{result['wall']:.2f}",
+                # 单句实时率：每句的合成耗时/音频时长；整体实时率：墙钟/全部音频时长
+                f"{compute / audio:.3f}",
+                f"{result['wall'] / result['audio']:.3f}",
+                f"{result['p50'] * 1000:.0f}",
+                f"{result['p95'] * 1000:.0f}",
+            ]
+        )
+    print(
+        tabulate(
+            rows,
+            headers=[
+                "并发数",
+                "音频时长(s)",
+                "墙钟(s)",
+                "单句实时率",
+                "整体实时率",
+                "首句p50(ms)",
+                "首句p95(ms)",
+            ],
+            tablefmt="github",
+        )
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,121 @@
+import argparse
+import time
+
+import numpy as np
+import opuslib_next
+from tabulate import tabulate
+
+from core.utils.opus_encoder_utils import OpusEncoderUtils, encoder_pool
+
+SAMPLE_RATE = 16000
+FRAME_SIZE = 960  # 60ms
+
+
+def make_pcm(seconds, seed=0):
+    """生成带噪声的扫频信号，模拟语音的频谱变化"""
+    rng = np.random.default_rng(seed)
+    t = np.arange(int(seconds * SAMPLE_RATE)) / SAMPLE_RATE
+    signal = np.sin(2 * np.pi * (200 + 300 * np.sin(t)) * t) * 8000
+    signal += rng.normal(0, 500, len(t))
+    return signal.astype(np.int16).tobytes()
+
+
+def legacy_pcm_to_data(raw_data):
+    """改造前的pcm_to_data：每次新建编码器，逐帧经过numpy转换"""
+    encoder = opuslib_next.Encoder(SAMPLE_RATE, 1, opuslib_next.APPLICATION_AUDIO)
+    datas = []
+    for i in range(0, len(raw_data), FRAME_SIZE * 2):
+        chunk = raw_data[i : i + FRAME_SIZE * 2]
+        if len(chunk) < FRAME_SIZE * 2:
+            chunk += b"\x00" * (FRAME_SIZE * 2 - len(chunk))
+        np_frame = np.frombuffer(chunk, dtype=np.int16)
+        datas.append(encoder.encode(np_frame.tobytes(), FRAME_SIZE))
+    return datas
+
+
+def legacy_stream(chunks):
+    """改造前的流式编码：np.append累积缓冲区，每帧tobytes"""
+    encoder = opuslib_next.Encoder(SAMPLE_RATE, 1, opuslib_next.APPLICATION_AUDIO)
+    encoder.bitrate = 24000
+    encoder.complexity = 10
+    buffer = np.array([], dtype=np.int16)
+    datas = []
+    for chunk in chunks:
+        buffer = np.append(buffer, np.frombuffer(chunk, dtype=np.int16))
+        offset = 0
+        while offset <= len(buffer) - FRAME_SIZE:
+            frame = buffer[offset : offset + FRAME_SIZE].tobytes()
+            datas.append(encoder.encode(frame, FRAME_SIZE))
+            offset += FRAME_SIZE
+        buffer = buffer[offset:]
+    return datas
+
+
+def pooled_stream(chunks):
+    encoder = OpusEncoderUtils(SAMPLE_RATE, 1, 60)
+    datas = []
+    for index, chunk in enumerate(chunks):
+        datas.extend(encoder.encode_pcm_to_opus(chunk, index == len(chunks) - 1))
+    encoder.close()
+    return datas
+
+
+def pooled_pcm_to_data(raw_data):
+    return pooled_stream([raw_data])
+
+
+def measure(func, data, audio_seconds, rounds):
+    """返回每CPU秒编码的音频秒数"""
+    start = time.process_time()
+    for _ in range(rounds):
+        func(data)
+    cpu = time.process_time() - start
+    return audio_seconds * rounds / cpu
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Opus编码性能测试")
+    parser.add_argument("--seconds", type=float, default=30, help="测试音频时长（秒）")
+    parser.add_argument("--rounds", type=int, default=3, help="每项测试轮数")
+    parser.add_argument(
+        "--chunk", type=int, default=4096, help="流式编码时每次输入的字节数"
+    )
+    args = parser.parse_args()
+
+    pcm = make_pcm(args.seconds)
+    chunks = [pcm[i : i + args.chunk] for i in range(0, len(pcm), args.chunk)]
+
+    rows = []
+    for complexity in (10, 5, 2):
+        encoder_pool.configure({"bitrate": 24000, "complexity": complexity})
+        legacy_whole = measure(legacy_pcm_to_data, pcm, args.seconds, args.rounds)
+        pooled_whole = measure(pooled_pcm_to_data, pcm, args.seconds, args.rounds)
+        legacy_chunks = measure(legacy_stream, chunks, args.seconds, args.rounds)
+        pooled_chunks = measure(pooled_stream, chunks, args.seconds, args.rounds)
+        rows.append(
+            [
+                complexity,
+                f"{legacy_whole:.0f}",
+                f"{pooled_whole:.0f}",
+                f"{legacy_chunks:.0f}",
+                f"{pooled_chunks:.0f}",
+            ]
+        )
+    print(f"单位：每CPU秒编码的音频秒数（越大越好），测试音频{args.seconds}秒")
+    print(
+        tabulate(
+            rows,
+            headers=[
+                "编码复杂度",
+                "整段-原方式(默认参数)",
+                "整段-编码器池",
+                "流式-原方式(复杂度10)",
+                "流式-编码器池",
+            ],
+            tablefmt="github",
+        )
+    )
+
+
+if __name__ == "__main__":
+    main()
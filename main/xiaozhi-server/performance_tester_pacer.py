@@ -0,0 +1,117 @@
+import argparse
+import asyncio
+import random
+import time
+
+from tabulate import tabulate
+
+from core.utils.audio_pacer import audio_pacer
+
+FRAME = b"\x00" * 120  # 一个约120字节的Opus帧
+
+
+class FakeWebSocket:
+    def __init__(self):
+        self.frames = 0
+
+    async def send(self, data):
+        self.frames += 1
+
+
+class FakeConn:
+    def __init__(self):
+        self.websocket = FakeWebSocket()
+        self.client_abort = False
+        self.last_activity_time = 0
+
+
+async def legacy_send_audio(conn, audios, pre_buffer=True):
+    """改造前的sendAudio：每个连接每帧一次asyncio.sleep"""
+    frame_duration = 60
+    start_time = time.perf_counter()
+    play_position = 0
+    if pre_buffer:
+        pre_buffer_frames = min(3, len(audios))
+        for i in range(pre_buffer_frames):
+            await conn.websocket.send(audios[i])
+        remaining_audios = audios[pre_buffer_frames:]
+    else:
+        remaining_audios = audios
+    for opus_packet in remaining_audios:
+        if conn.client_abort:
+            break
+        conn.last_activity_time = time.time() * 1000
+        expected_time = start_time + (play_position / 1000)
+        delay = expected_time - time.perf_counter()
+        if delay > 0:
+            await asyncio.sleep(delay)
+        await conn.websocket.send(opus_packet)
+        play_position += frame_duration
+
+
+async def run(play, connections, seconds):
+    """返回(墙钟耗时, CPU耗时, 循环唤醒次数)，各连接在一秒内随机开始播放"""
+    frames = [FRAME] * int(seconds / 0.06)
+    conns = [FakeConn() for _ in range(connections)]
+    rng = random.Random(0)
+
+    async def play_later(conn):
+        await asyncio.sleep(rng.random())
+        await play(conn, frames, True)
+
+    loop = asyncio.get_running_loop()
+    wakeups = 0
+    original_run_once = loop._run_once
+
+    def counting_run_once():
+        nonlocal wakeups
+        wakeups += 1
+        original_run_once()
+
+    loop._run_once = counting_run_once
+    cpu_start = time.process_time()
+    wall_start = time.perf_counter()
+    await asyncio.gather(*(play_later(conn) for conn in conns))
+    wall = time.perf_counter() - wall_start
+    cpu = time.process_time() - cpu_start
+    loop._run_once = original_run_once
+    assert all(conn.websocket.frames == len(frames) for conn in conns)
+    return wall, cpu, wakeups
+
+
+def main():
+    parser = argparse.ArgumentParser(description="音频发送节拍性能测试")
+    parser.add_argument("--seconds", type=float, default=6, help="每个连接播放的音频时长")
+    parser.add_argument(
+        "--connections", type=int, nargs="+", default=[100, 500, 1000]
+    )
+    args = parser.parse_args()
+
+    rows = []
+    for connections in args.connections:
+        streamed = connections * args.seconds
+        for name, play in (
+            ("每帧sleep", legacy_send_audio),
+            ("全局节拍", audio_pacer.play),
+        ):
+            wall, cpu, wakeups = asyncio.run(run(play, connections, args.seconds))
+            rows.append(
+                [
+                    connections,
+                    name,
+                    f"{wall:.2f}",
+                    f"{cpu / streamed * 1000:.3f}",
+                    f"{wakeups / wall:.0f}",
+                ]
+            )
+    print(
+        tabulate(
+            rows,
+            headers=["连接数", "方式", "墙钟(s)", "每播放1秒的CPU(ms)", "循环唤醒/秒"],
+            tablefmt="github",
+        )
+    )
+
+
+if __name__ == "__main__":
+    main()
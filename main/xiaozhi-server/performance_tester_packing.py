@@ -0,0 +1,89 @@
+import argparse
+import asyncio
+import time
+
+import websockets
+from tabulate import tabulate
+
+from core.utils.audio_pacer import pack_frames
+
+FRAME = b"\x00" * 120  # 一个约120字节的Opus帧
+
+
+def unpack_frames(message):
+    frames = []
+    offset = 0
+    while offset < len(message):
+        length = int.from_bytes(message[offset : offset + 2], "big")
+        frames.append(message[offset + 2 : offset + 2 + length])
+        offset += 2 + length
+    return frames
+
+
+async def run(connections, frames_per_connection, packing):
+    """本机回环上不限速地发送音频帧，返回(墙钟耗时, CPU耗时, 消息数)"""
+
+    async def handler(websocket):
+        frames = [FRAME] * frames_per_connection
+        if packing > 1:
+            for i in range(0, len(frames), packing):
+                await websocket.send(pack_frames(frames[i : i + packing]))
+        else:
+            for frame in frames:
+                await websocket.send(frame)
+        await websocket.close()
+
+    async def client(port):
+        received = messages = 0
+        async with websockets.connect(f"ws://127.0.0.1:{port}") as websocket:
+            async for message in websocket:
+                messages += 1
+                received += len(unpack_frames(message)) if packing > 1 else 1
+        assert received == frames_per_connection
+        return messages
+
+    async with websockets.serve(handler, "127.0.0.1", 0) as server:
+        port = server.sockets[0].getsockname()[1]
+        cpu_start = time.process_time()
+        wall_start = time.perf_counter()
+        messages = await asyncio.gather(*(client(port) for _ in range(connections)))
+        wall = time.perf_counter() - wall_start
+        cpu = time.process_time() - cpu_start
+    return wall, cpu, sum(messages)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="多帧打包发送性能测试")
+    parser.add_argument("--connections", type=int, default=50)
+    parser.add_argument(
+        "--frames", type=int, default=1000, help="每个连接发送的帧数"
+    )
+    args = parser.parse_args()
+
+    total_frames = args.connections * args.frames
+    rows = []
+    baseline = None
+    for packing in (1, 2, 4, 8):
+        wall, cpu, messages = asyncio.run(run(args.connections, args.frames, packing))
+        throughput = total_frames / wall
+        baseline = baseline or cpu
+        rows.append(
+            [
+                packing,
+                messages,
+                f"{throughput:.0f}",
+                f"{cpu / total_frames * 1e6:.1f}",
+                f"{baseline / cpu:.2f}x",
+            ]
+        )
+    print(
+        tabulate(
+            rows,
+            headers=["每条消息帧数", "消息数", "帧/秒", "每帧CPU(us)", "CPU节省"],
+            tablefmt="github",
+        )
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,140 @@
+import argparse
+import random
+import time
+
+from tabulate import tabulate
+
+from core.utils.text_segmenter import StreamingSegmenter
+from core.utils.textUtils import get_string_no_punctuation_or_emoji
+from core.utils.tts import MarkdownCleaner
+
+PUNCTUATIONS = ("。", "？", "?", "！", "!", "；", ";", "：", "~")
+FIRST_PUNCTUATIONS = ("，", "～", "~", "、", ",", "。", "？", "?", "！", "!", "；", ";", "：")
+
+PARAGRAPH = (
+    "## 第{n}部分\n"
+    "这是一段**比较长**的回答，用来模拟大模型的流式输出。它包含*强调*、[链接](http://example.com/{n})，"
+    "以及一些列表：\n- 第一点，说明情况；\n- 第二点，给出建议。\n"
+    "| 名称 | 数值 |\n|---|---|\n| 温度 | {n}度 |\n"
+    "最后总结一下，今天的内容就到这里！\n"
+)
+
+# 正确性检查：输入文本及期望的分段，逐字符输入和一次性输入的结果都要一致
+CASES = [
+    ("3*4=12。", ["3*4=12"]),
+    ("a * b等于多少。", ["a * b等于多少"]),
+    ("这是*强调*和**粗体**。", ["这是强调和粗体"]),
+    ("价格是$5，很便宜。", ["价格是$5", "很便宜"]),
+]
+
+
+def legacy_segments(deltas):
+    """改造前的做法：每次都拼接全部文本，从已处理位置起按每个标点rfind，再逐段正则清理"""
+    buff = []
+    processed = 0
+    first = True
+    segments = []
+    for delta in deltas:
+        buff.append(delta)
+        full_text = "".join(buff)
+        current = full_text[processed:]
+        last = -1
+        for punct in FIRST_PUNCTUATIONS if first else PUNCTUATIONS:
+            pos = current.rfind(punct)
+            if pos != -1 and (last == -1 or pos < last):
+                last = pos
+        if last != -1:
+            raw = current[: last + 1]
+            processed += len(raw)
+            first = False
+            segment = get_string_no_punctuation_or_emoji(raw)
+            if segment:
+                segments.append(MarkdownCleaner.clean_markdown(segment))
+    remaining = "".join(buff)[processed:]
+    if remaining:
+        segments.append(MarkdownCleaner.clean_markdown(remaining))
+    return segments
+
+
+def streaming_segments(deltas):
+    segmenter = StreamingSegmenter(FIRST_PUNCTUATIONS, PUNCTUATIONS)
+    segments = []
+    for delta in deltas:
+        segments.extend(segmenter.feed(delta))
+    segments.extend(segmenter.flush())
+    return segments
+
+
+def check_cases():
+    """返回与期望不一致的用例"""
+    failures = []
+    for text, expected in CASES:
+        for deltas in (list(text), [text]):
+            result = streaming_segments(deltas)
+            if result != expected:
+                failures.append([text, len(deltas), expected, result])
+    return failures
+
+
+def make_deltas(paragraphs, seed=0):
+    """把长回答切成2~6个字符的增量，模拟LLM逐token输出"""
+    text = "".join(PARAGRAPH.format(n=i) for i in range(paragraphs))
+    rng = random.Random(seed)
+    deltas = []
+    i = 0
+    while i < len(text):
+        step = rng.randint(2, 6)
+        deltas.append(text[i : i + step])
+        i += step
+    return text, deltas
+
+
+def timed(func, deltas, rounds):
+    start = time.perf_counter()
+    for _ in range(rounds):
+        func(deltas)
+    return (time.perf_counter() - start) / rounds * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description="TTS流式分段性能测试")
+    parser.add_argument("--rounds", type=int, default=5, help="每种长度的测试轮数")
+    args = parser.parse_args()
+
+    failures = check_cases()
+    if failures:
+        print(
+            tabulate(
+                failures,
+                headers=["输入", "增量数", "期望", "实际"],
+                tablefmt="github",
+            )
+        )
+        raise SystemExit(1)
+    print(f"正确性检查通过: {len(CASES)}个用例")
+
+    rows = []
+    for paragraphs in (5, 20, 80, 200):
+        text, deltas = make_deltas(paragraphs)
+        legacy = timed(legacy_segments, deltas, args.rounds)
+        streaming = timed(streaming_segments, deltas, args.rounds)
+        rows.append(
+            [
+                len(text),
+                len(deltas),
+                f"{legacy:.2f}",
+                f"{streaming:.2f}",
+                f"{legacy / streaming:.1f}x",
+            ]
+        )
+    print(
+        tabulate(
+            rows,
+            headers=["字符数", "增量数", "原方式(ms)", "流式分段(ms)", "提升"],
+            tablefmt="github",
+        )
+    )
+
+
+if __name__ == "__main__":
+    main()
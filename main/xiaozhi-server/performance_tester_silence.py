@@ -0,0 +1,114 @@
+import argparse
+import os
+
+from tabulate import tabulate
+
+from core.utils.silence import FRAME_MS, SilenceTrimmer, silence_settings
+from core.utils.audio_decode import decode_audio_file
+
+FRAME_BYTES = 960 * 2
+
+
+def first_audible_ms(frames, trimmer):
+    for i, frame in enumerate(frames):
+        if not trimmer.is_silent(frame):
+            return i * FRAME_MS
+    return None
+
+
+def measure(path, trimmer):
+    """返回(原始帧数, 裁剪后帧数, 原始首个有声帧时间ms, 裁剪后首个有声帧时间ms)"""
+    pcm = decode_audio_file(path)
+    pcm += bytes(-len(pcm) % FRAME_BYTES)
+    frames = [pcm[i : i + FRAME_BYTES] for i in range(0, len(pcm), FRAME_BYTES)]
+    kept = [frame for frame in frames if trimmer.keep(frame)]
+    trimmer.finish()
+    return (
+        len(frames),
+        len(kept),
+        first_audible_ms(frames, trimmer),
+        first_audible_ms(kept, trimmer),
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description="出站音频静音裁剪效果测试")
+    parser.add_argument("paths", nargs="+", help="TTS生成的音频文件或目录")
+    parser.add_argument("--threshold-db", type=float, default=-50)
+    parser.add_argument("--max-leading-ms", type=int, default=0)
+    parser.add_argument("--max-gap-ms", type=int, default=300)
+    args = parser.parse_args()
+
+    silence_settings.configure(
+        {
+            "threshold_db": args.threshold_db,
+            "max_leading_ms": args.max_leading_ms,
+            "max_gap_ms": args.max_gap_ms,
+        }
+    )
+    trimmer = SilenceTrimmer()
+
+    files = []
+    for path in args.paths:
+        if os.path.isdir(path):
+            files.extend(
+                os.path.join(path, name) for name in sorted(os.listdir(path))
+            )
+        else:
+            files.append(path)
+
+    rows = []
+    total_before = total_after = total_saved = 0
+    for path in files:
+        try:
+            before, after, first_before, first_after = measure(path, trimmer)
+        except Exception as e:
+            print(f"跳过 {path}: {e}")
+            continue
+        saved = (
+            first_before - first_after
+            if first_before is not None and first_after is not None
+            else 0
+        )
+        total_before += before
+        total_after += after
+        total_saved += saved
+        rows.append(
+            [
+                os.path.basename(path),
+                before,
+                after,
+                first_before,
+                first_after,
+                saved,
+            ]
+        )
+    if rows:
+        rows.append(
+            [
+                "平均",
+                f"{total_before / len(rows):.1f}",
+                f"{total_after / len(rows):.1f}",
+                "",
+                "",
+                f"{total_saved / len(rows):.0f}",
+            ]
+        )
+    print(
+        tabulate(
+            rows,
+            headers=[
+                "文件",
+                "原始帧数",
+                "发送帧数",
+                "首个有声帧(ms)",
+                "裁剪后首个有声帧(ms)",
+                "提前(ms)",
+            ],
+            tablefmt="github",
+        )
+    )
+
+
+if __name__ == "__main__":
+    main()
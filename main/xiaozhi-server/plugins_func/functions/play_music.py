@@ -1,18 +1,22 @@
+import asyncio
 import os
 import re
 import time
 import random
-import difflib
+import threading
 import traceback
-from pathlib import Path
 from core.handle.sendAudioHandle import send_stt_message
 from plugins_func.register import register_function, ToolType, ActionResponse, Action
 from core.utils.dialogue import Message
 from core.providers.tts.dto.dto import TTSMessageDTO, SentenceType, ContentType
+from core.utils.music_index import MusicIndex
+from core.utils.music_library import MusicLibrary
 
 TAG = __name__
 
 MUSIC_CACHE = {}
+# 初始化和刷新音乐索引在线程中执行，多个连接同时触发时只执行一次
+_MUSIC_LOCK = threading.Lock()
 
 play_music_function_desc = {
     "type": "function",
@@ -47,9 +51,9 @@ def play_music(conn, song_name: str):
                 action=Action.RESPONSE, result="系统繁忙", response="请稍后再试"
             )
 
-        # 提交异步任务
-        task = conn.loop.create_task(
-            handle_music_command(conn, music_intent)  # 封装异步逻辑
+        # 提交异步任务（插件可能在线程中执行，需线程安全地提交到事件循环）
+        task = asyncio.run_coroutine_threadsafe(
+            handle_music_command(conn, music_intent), conn.loop  # 封装异步逻辑
         )
 
         # 非阻塞回调处理
@@ -82,67 +86,81 @@ def _extract_song_name(text):
     return None
 
 
-def _find_best_match(potential_song, music_files):
-    """查找最匹配的歌曲"""
-    best_match = None
-    highest_ratio = 0
-
-    for music_file in music_files:
-        song_name = os.path.splitext(music_file)[0]
-        ratio = difflib.SequenceMatcher(None, potential_song, song_name).ratio()
-        if ratio > highest_ratio and ratio > 0.4:
-            highest_ratio = ratio
-            best_match = music_file
-    return best_match
-
-
-def get_music_files(music_dir, music_ext):
-    music_dir = Path(music_dir)
-    music_files = []
-    music_file_names = []
-    for file in music_dir.rglob("*"):
-        # 判断是否是文件
-        if file.is_file():
-            # 获取文件扩展名
-            ext = file.suffix.lower()
-            # 判断扩展名是否在列表中
-            if ext in music_ext:
-                # 添加相对路径
-                music_files.append(str(file.relative_to(music_dir)))
-                music_file_names.append(
-                    os.path.splitext(str(file.relative_to(music_dir)))[0]
-                )
-    return music_files, music_file_names
+def refresh_music_index():
+    """音乐列表过期时增量刷新索引，其他线程正在刷新时直接使用当前索引"""
+    if time.time() - MUSIC_CACHE["scan_time"] <= MUSIC_CACHE["refresh_time"]:
+        return
+    if not _MUSIC_LOCK.acquire(blocking=False):
+        return
+    try:
+        MUSIC_CACHE["index"].refresh()
+        MUSIC_CACHE["scan_time"] = time.time()
+        if MUSIC_CACHE["auto_transcode"]:
+            MUSIC_CACHE["library"].transcode_in_background()
+    finally:
+        _MUSIC_LOCK.release()
+
+
+def _prepare_music_index(conn):
+    initialize_music_handler(conn)
+    refresh_music_index()
+
+
+async def prepare_music_index(conn):
+    """初始化并刷新音乐索引，扫描目录和建立拼音索引较慢，在线程中执行，不阻塞事件循环"""
+    await asyncio.to_thread(_prepare_music_index, conn)
+    return MUSIC_CACHE
 
 
 def initialize_music_handler(conn):
     global MUSIC_CACHE
-    if MUSIC_CACHE == {}:
-        if "play_music" in conn.config["plugins"]:
-            MUSIC_CACHE["music_config"] = conn.config["plugins"]["play_music"]
-            MUSIC_CACHE["music_dir"] = os.path.abspath(
-                MUSIC_CACHE["music_config"].get("music_dir", "./music")  # 默认路径修改
-            )
-            MUSIC_CACHE["music_ext"] = MUSIC_CACHE["music_config"].get(
-                "music_ext", (".mp3", ".wav", ".p3")
-            )
-            MUSIC_CACHE["refresh_time"] = MUSIC_CACHE["music_config"].get(
-                "refresh_time", 60
-            )
-        else:
-            MUSIC_CACHE["music_dir"] = os.path.abspath("./music")
-            MUSIC_CACHE["music_ext"] = (".mp3", ".wav", ".p3")
-            MUSIC_CACHE["refresh_time"] = 60
-        # 获取音乐文件列表
-        MUSIC_CACHE["music_files"], MUSIC_CACHE["music_file_names"] = get_music_files(
-            MUSIC_CACHE["music_dir"], MUSIC_CACHE["music_ext"]
-        )
-        MUSIC_CACHE["scan_time"] = time.time()
+    if MUSIC_CACHE != {}:
+        return MUSIC_CACHE
+    with _MUSIC_LOCK:
+        if MUSIC_CACHE == {}:
+            # 全部准备好后再放入MUSIC_CACHE，其他线程不会看到初始化到一半的状态
+            MUSIC_CACHE.update(_load_music_handler(conn))
     return MUSIC_CACHE
 
 
+def _load_music_handler(conn):
+    cache = {}
+    if "play_music" in conn.config["plugins"]:
+        cache["music_config"] = conn.config["plugins"]["play_music"]
+        cache["music_dir"] = os.path.abspath(
+            cache["music_config"].get("music_dir", "./music")  # 默认路径修改
+        )
+        cache["music_ext"] = cache["music_config"].get(
+            "music_ext", (".mp3", ".wav", ".p3")
+        )
+        cache["refresh_time"] = cache["music_config"].get("refresh_time", 60)
+    else:
+        cache["music_config"] = {}
+        cache["music_dir"] = os.path.abspath("./music")
+        cache["music_ext"] = (".mp3", ".wav", ".p3")
+        cache["refresh_time"] = 60
+    # 预转码的p3音乐库，播放时优先使用
+    cache["library"] = MusicLibrary(
+        cache["music_dir"],
+        cache["music_config"].get("p3_dir", "data/music_p3"),
+        cache["music_ext"],
+    )
+    cache["auto_transcode"] = cache["music_config"].get("auto_transcode", False)
+    if cache["auto_transcode"]:
+        cache["library"].transcode_in_background()
+    # 音乐索引，重启后从清单文件恢复，只重新扫描有变化的目录
+    cache["index"] = MusicIndex(
+        cache["music_dir"],
+        cache["music_ext"],
+        cache["music_config"].get("index_file", "data/music_index.json"),
+    )
+    cache["index"].refresh()
+    cache["scan_time"] = time.time()
+    return cache
+
+
 async def handle_music_command(conn, text):
-    initialize_music_handler(conn)
+    await prepare_music_index(conn)
     global MUSIC_CACHE
 
     """处理音乐播放指令"""
@@ -151,16 +169,9 @@ async def handle_music_command(conn, text):
 
     # 尝试匹配具体歌名
     if os.path.exists(MUSIC_CACHE["music_dir"]):
-        if time.time() - MUSIC_CACHE["scan_time"] > MUSIC_CACHE["refresh_time"]:
-            # 刷新音乐文件列表
-            MUSIC_CACHE["music_files"], MUSIC_CACHE["music_file_names"] = (
-                get_music_files(MUSIC_CACHE["music_dir"], MUSIC_CACHE["music_ext"])
-            )
-            MUSIC_CACHE["scan_time"] = time.time()
-
         potential_song = _extract_song_name(clean_text)
         if potential_song:
-            best_match = _find_best_match(potential_song, MUSIC_CACHE["music_files"])
+            best_match = MUSIC_CACHE["index"].best_match(potential_song)
             if best_match:
                 conn.logger.bind(tag=TAG).info(f"找到最匹配的歌曲: {best_match}")
                 await play_local_music(conn, specific_file=best_match)
@@ -202,15 +213,18 @@ async def play_local_music(conn, specific_file=None):
             selected_music = specific_file
             music_path = os.path.join(MUSIC_CACHE["music_dir"], specific_file)
         else:
-            if not MUSIC_CACHE["music_files"]:
+            music_files = MUSIC_CACHE["index"].files
+            if not music_files:
                 conn.logger.bind(tag=TAG).error("未找到MP3音乐文件")
                 return
-            selected_music = random.choice(MUSIC_CACHE["music_files"])
+            selected_music = random.choice(music_files)
             music_path = os.path.join(MUSIC_CACHE["music_dir"], selected_music)
 
         if not os.path.exists(music_path):
             conn.logger.bind(tag=TAG).error(f"选定的音乐文件不存在: {music_path}")
             return
+        # 已转码的歌曲直接播放p3文件，按帧从共享映射中读取
+        music_path = MUSIC_CACHE["library"].resolve(selected_music)
         text = _get_random_play_prompt(selected_music)
         await send_stt_message(conn, text)
         conn.dialogue.put(Message(role="assistant", content=text))
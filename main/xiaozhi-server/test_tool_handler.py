@@ -0,0 +1,68 @@
+"""
+测试统一工具处理器的多函数调用响应合并
+"""
+
+import sys
+import os
+
+# 添加路径以便导入core模块
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from core.providers.tools.unified_tool_handler import UnifiedToolHandler
+from plugins_func.register import Action, ActionResponse
+
+
+def combine(responses):
+    # _combine_responses不依赖连接状态，无需创建完整的处理器
+    return UnifiedToolHandler._combine_responses(None, responses)
+
+
+def test_combine_reqllm_and_response():
+    """REQLLM和RESPONSE混合时交给LLM处理，结果按调用顺序合并"""
+    result = combine(
+        [
+            ActionResponse(action=Action.REQLLM, result="北京今天晴，25度"),
+            ActionResponse(action=Action.RESPONSE, response="已为你打开客厅的灯"),
+        ]
+    )
+    assert result.action == Action.REQLLM
+    assert result.result == "北京今天晴，25度; 已为你打开客厅的灯"
+    assert result.response == "已为你打开客厅的灯"
+
+
+def test_combine_responses_in_order():
+    """多个直接回复按调用顺序合并"""
+    result = combine(
+        [
+            ActionResponse(action=Action.RESPONSE, result="a", response="第一个"),
+            ActionResponse(action=Action.RESPONSE, result="b", response="第二个"),
+        ]
+    )
+    assert result.action == Action.RESPONSE
+    assert result.result == "a; b"
+    assert result.response == "第一个; 第二个"
+
+
+def test_combine_returns_first_error():
+    """有错误时返回第一个错误"""
+    error = ActionResponse(action=Action.ERROR, result="失败", response="失败")
+    result = combine([ActionResponse(action=Action.REQLLM, result="ok"), error])
+    assert result is error
+
+
+def main():
+    print("=" * 60)
+    print("🚀 工具响应合并测试")
+    print("=" * 60)
+    for test in (
+        test_combine_reqllm_and_response,
+        test_combine_responses_in_order,
+        test_combine_returns_first_error,
+    ):
+        test()
+        print(f"   ✅ {test.__doc__}")
+    print("🏁 所有测试完成！")
+
+
+if __name__ == "__main__":
+    main()